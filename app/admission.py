@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+SHED_IN_FLIGHT = "in_flight"
+SHED_QUEUE_DEPTH = "queue_depth"
+SHED_LATENCY = "latency"
+SHED_DRAINING = "draining"
+
+
+@dataclass(frozen=True)
+class OverloadedError(Exception):
+    reason: str
+
+    def __str__(self) -> str:  # pragma: no cover - defaults to reason
+        return f"shed: {self.reason}"
+
+
+class AdmissionController:
+    # Decides at the door whether an update is taken at all. The in-flight cap shrinks in
+    # proportion when the smoothed latency overshoots its target, so a slow upstream
+    # lowers concurrency instead of growing a backlog that times out later.
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queue_depth: int,
+        latency_target_seconds: float,
+        *,
+        min_in_flight: int = 4,
+        smoothing: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_in_flight < 1:
+            raise ValueError("Admission needs an in-flight limit of at least 1")
+        self._max_in_flight = max_in_flight
+        self._min_in_flight = max(1, min(min_in_flight, max_in_flight))
+        self._max_queue_depth = max_queue_depth
+        self._latency_target = latency_target_seconds
+        self._smoothing = smoothing
+        self._clock = clock
+        self._in_flight = 0
+        self._admitted = 0
+        self._shed = {SHED_IN_FLIGHT: 0, SHED_QUEUE_DEPTH: 0, SHED_LATENCY: 0, SHED_DRAINING: 0}
+        self._latency: Optional[float] = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def limit(self) -> int:
+        with self._lock:
+            return self._limit()
+
+    def admit(self, queue_depth: int = 0) -> float:
+        with self._lock:
+            reason = self._shed_reason(queue_depth)
+            if reason is not None:
+                self._shed[reason] += 1
+                raise OverloadedError(reason)
+            self._in_flight += 1
+            self._admitted += 1
+            return self._clock()
+
+    def release(self, admitted_at: float) -> None:
+        elapsed = max(self._clock() - admitted_at, 0.0)
+        with self._lock:
+            self._in_flight -= 1
+            if self._latency is None:
+                self._latency = elapsed
+            else:
+                self._latency += self._smoothing * (elapsed - self._latency)
+            if not self._in_flight:
+                self._idle.notify_all()
+
+    def close(self) -> None:
+        # Stop admitting; everything already in flight keeps running.
+        with self._lock:
+            self._closed = True
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._in_flight, timeout)
+
+    def stats(self) -> dict[str, object]:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "limit": self._limit(),
+                "admitted": self._admitted,
+                "shed": dict(self._shed),
+                "latency_ms": round(self._latency * 1000, 1) if self._latency is not None else None,
+                "draining": self._closed,
+            }
+
+    def _limit(self) -> int:
+        if self._latency is None or self._latency <= self._latency_target:
+            return self._max_in_flight
+        scaled = int(self._max_in_flight * self._latency_target / self._latency)
+        return max(self._min_in_flight, scaled)
+
+    def _shed_reason(self, queue_depth: int) -> Optional[str]:
+        if self._closed:
+            return SHED_DRAINING
+        if queue_depth >= self._max_queue_depth:
+            return SHED_QUEUE_DEPTH
+        if self._in_flight >= self._max_in_flight:
+            return SHED_IN_FLIGHT
+        if self._in_flight >= self._limit():
+            return SHED_LATENCY
+        return None
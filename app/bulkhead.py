@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+WORK_CLASS_TEXT = "text"
+WORK_CLASS_FEEDBACK = "feedback"
+WORK_CLASS_MEDIA = "media"
+WORK_CLASS_TRANSCRIPTION = "transcription"
+
+
+@dataclass(frozen=True)
+class BulkheadFullError(Exception):
+    work_class: str
+
+    def __str__(self) -> str:  # pragma: no cover - defaults to work_class
+        return f"{self.work_class} lane is full"
+
+
+@dataclass(frozen=True)
+class Lane:
+    limit: int
+    priority: int
+    max_waiting: int = 0
+    timeout: float = 10.0
+
+
+class _Slot:
+    # A plain context manager rather than @contextmanager: generator-based ones rewrite
+    # __traceback__ on the way out, which frozen dataclass errors refuse.
+    def __init__(self, bulkhead: "Bulkhead", work_class: str) -> None:
+        self._bulkhead = bulkhead
+        self._work_class = work_class
+
+    def __enter__(self) -> None:
+        self._bulkhead.acquire(self._work_class)
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._bulkhead.release(self._work_class)
+
+
+class Bulkhead:
+    # Lanes cap their own concurrency and queue length. When the shared limit is the
+    # bottleneck, waiters are admitted by lane priority (lower first), then arrival.
+    def __init__(self, lanes: dict[str, Lane], *, shared_limit: Optional[int] = None) -> None:
+        self._lanes = dict(lanes)
+        self._shared_limit = shared_limit
+        self._active = {name: 0 for name in self._lanes}
+        self._rejected = {name: 0 for name in self._lanes}
+        self._waiting: list[tuple[int, int, str]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def slot(self, work_class: str) -> "_Slot":
+        return _Slot(self, work_class)
+
+    def acquire(self, work_class: str) -> None:
+        lane = self._lanes[work_class]
+        ticket = (lane.priority, next(self._sequence), work_class)
+        with self._condition:
+            if self._has_room(work_class) and not self._admissible_ahead(ticket):
+                self._active[work_class] += 1
+                return
+            if self._waiting_count(work_class) >= lane.max_waiting:
+                self._rejected[work_class] += 1
+                raise BulkheadFullError(work_class)
+
+            bisect.insort(self._waiting, ticket)
+            deadline = time.monotonic() + lane.timeout
+            try:
+                while True:
+                    if self._has_room(work_class) and not self._admissible_ahead(ticket):
+                        self._active[work_class] += 1
+                        return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._rejected[work_class] += 1
+                        raise BulkheadFullError(work_class)
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+
+    def release(self, work_class: str) -> None:
+        with self._condition:
+            self._active[work_class] -= 1
+            self._condition.notify_all()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        with self._condition:
+            return {
+                name: {
+                    "limit": lane.limit,
+                    "active": self._active[name],
+                    "waiting": self._waiting_count(name),
+                    "rejected": self._rejected[name],
+                }
+                for name, lane in self._lanes.items()
+            }
+
+    def _has_room(self, work_class: str) -> bool:
+        if self._active[work_class] >= self._lanes[work_class].limit:
+            return False
+        if self._shared_limit is None:
+            return True
+        return sum(self._active.values()) < self._shared_limit
+
+    def _admissible_ahead(self, ticket: tuple[int, int, str]) -> bool:
+        for waiter in self._waiting:
+            if waiter >= ticket:
+                return False
+            if self._has_room(waiter[2]):
+                return True
+        return False
+
+    def _waiting_count(self, work_class: str) -> int:
+        return sum(1 for waiter in self._waiting if waiter[2] == work_class)
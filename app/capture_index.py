@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from app.models import TelegramMessage
+from app.telegram_normalizer import entity_texts
+
+TRACKING_QUERY_PARAMS = frozenset(
+    {
+        "fbclid",
+        "gclid",
+        "dclid",
+        "gbraid",
+        "wbraid",
+        "msclkid",
+        "yclid",
+        "igshid",
+        "mc_cid",
+        "mc_eid",
+        "ref_src",
+        "ref_url",
+        "spm",
+        "si",
+        "_ga",
+    }
+)
+TRACKING_QUERY_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass(frozen=True)
+class CapturedTask:
+    task_id: str
+    task_url: Optional[str]
+    captured_at: float
+
+
+def canonicalize_url(url: str) -> Optional[str]:
+    candidate = url.strip()
+    if not candidate:
+        return None
+    if "://" not in candidate:
+        candidate = f"https://{candidate}"
+    try:
+        parts = urlsplit(candidate)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if not host:
+        return None
+    if host.startswith("www."):
+        host = host[4:]
+    netloc = host if port in (None, DEFAULT_PORTS.get(scheme)) else f"{host}:{port}"
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_QUERY_PARAMS and not key.lower().startswith(TRACKING_QUERY_PREFIXES)
+    ]
+    path = parts.path.rstrip("/")
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+def message_urls(message: TelegramMessage) -> list[str]:
+    urls: list[str] = []
+    for text, entities in ((message.text, message.entities), (message.caption, message.caption_entities)):
+        if not text or not entities:
+            continue
+        for entity, value in entity_texts(text, entities):
+            if entity.type == "text_link" and entity.url:
+                urls.append(entity.url)
+            elif entity.type == "url":
+                urls.append(value)
+    return urls
+
+
+def capture_keys(
+    message: Optional[TelegramMessage], normalized_text: str, *, content: bool = False
+) -> list[str]:
+    keys: list[str] = []
+    if message is not None:
+        for url in message_urls(message):
+            canonical = canonicalize_url(url)
+            if canonical and f"url:{canonical}" not in keys:
+                keys.append(f"url:{canonical}")
+    # Repeating a short note ("call mom") is usually deliberate, so text matching is opt-in.
+    if not content:
+        return keys
+    # Attachments are part of the content hash, so one caption on different photos differs.
+    attachments = _attachment_ids(message)
+    digest = hashlib.sha1()
+    digest.update(_WHITESPACE.sub(" ", normalized_text).strip().casefold().encode("utf-8"))
+    for attachment in attachments:
+        digest.update(b"\0" + attachment.encode("utf-8"))
+    keys.append(f"content:{digest.hexdigest()}")
+    return keys
+
+
+def _attachment_ids(message: Optional[TelegramMessage]) -> list[str]:
+    if message is None:
+        return []
+    ids: list[str] = []
+    if message.photo:
+        largest = message.photo[-1]
+        ids.append(largest.file_unique_id or largest.file_id)
+    for media in (message.document, message.voice, message.audio):
+        if media is not None:
+            ids.append(media.file_unique_id or media.file_id)
+    return ids
+
+
+class CaptureIndex:
+    def __init__(self, window_seconds: float, max_items: int) -> None:
+        self._window_seconds = window_seconds
+        self._max_items = max_items
+        self._entries: "OrderedDict[str, CapturedTask]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def lookup(self, keys: Iterable[str], now: float) -> Optional[CapturedTask]:
+        # A duplicate only when every key points at the same task: a message that repeats one
+        # link but adds another (or new text under a content key) is new work.
+        found: Optional[CapturedTask] = None
+        with self._lock:
+            self._expire(now)
+            for key in keys:
+                captured = self._entries.get(key)
+                if captured is None or (found is not None and captured.task_id != found.task_id):
+                    return None
+                found = captured
+        return found
+
+    def remember(self, keys: Iterable[str], captured: CapturedTask) -> None:
+        with self._lock:
+            self._expire(captured.captured_at)
+            for key in keys:
+                self._entries.pop(key, None)
+                self._entries[key] = captured
+            while len(self._entries) > self._max_items:
+                self._entries.popitem(last=False)
+
+    def _expire(self, now: float) -> None:
+        expired_before = now - self._window_seconds
+        while self._entries:
+            _, oldest = next(iter(self._entries.items()))
+            if oldest.captured_at >= expired_before:
+                break
+            self._entries.popitem(last=False)
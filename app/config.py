@@ -1,9 +1,15 @@
 from functools import lru_cache
-from typing import Iterable, Optional
+from typing import Any, Iterable, Optional
 
 from pydantic import SecretStr, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+CAPTURE_DEDUPE_MODES = ("off", "skip", "attach")
+TRACING_EXPORTERS = ("stdout", "otlp-file")
+LOG_POLICY_FIELDS = ("rate", "burst", "sample", "key", "dedupe_seconds")
+# Tail of SHUTDOWN_DRAIN_SECONDS kept for flushing replies, traces and recordings.
+SHUTDOWN_FLUSH_RESERVE_SECONDS = 1.5
+
 
 class Settings(BaseSettings):
     telegram_bot_token: SecretStr
@@ -11,15 +17,106 @@ class Settings(BaseSettings):
     todoist_api_token: SecretStr
     todo_later_task_name: str
     todoist_cleanup_days: int = 7
+    todoist_replica_enabled: bool = False
+    todoist_replica_path: Optional[str] = None
+    todoist_replica_sync_interval_seconds: float = 30.0
+    todoist_upload_attachments: bool = False
+    tenant_db_path: Optional[str] = None
+    tenant_reload_interval_seconds: float = 5.0
+    tenant_max_in_flight: int = 4
+    tenant_captures_per_minute: float = 30.0
+    tenant_burst: int = 10
     transcribe_provider: Optional[str] = None
     gemini_api_key: Optional[SecretStr] = None
     telegram_allowed_user_ids: set[int] = set()
     telegram_allowed_chat_ids: set[int] = set()
     telegram_whitelist_reply: bool = False
+    startup_prewarm: bool = True
+    http2_enabled: bool = False
+    http_max_connections: int = 100
+    http_max_connections_per_host: int = 24
+    http2_max_streams_per_connection: int = 50
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
+    http_dns_cache_seconds: float = 300.0
+    dedupe_max_items: int = 100_000
+    shared_state_dir: Optional[str] = None
+    capture_dedupe_mode: str = "off"
+    capture_dedupe_content: bool = False
+    capture_dedupe_window_seconds: float = 3600.0
+    capture_dedupe_max_items: int = 10_000
+    edit_index_max_items: int = 10_000
+    edit_index_path: Optional[str] = None
+    feedback_window_seconds: float = 10.0
+    feedback_rate_per_second: float = 1.0
+    feedback_burst: int = 3
+    feedback_workers: int = 4
+    feedback_flush_timeout_seconds: float = 5.0
+    admission_max_in_flight: int = 64
+    admission_max_queue_depth: int = 32
+    admission_latency_target_seconds: float = 5.0
+    admission_min_in_flight: int = 4
+    admission_retry_after_seconds: int = 5
+    shutdown_drain_seconds: float = 8.0
+    shutdown_spool_path: Optional[str] = None
+    admin_token: Optional[SecretStr] = None
+    trace_buffer_size: int = 256
+    tracing_exporter: Optional[str] = None
+    tracing_otlp_path: str = "spans.otlp.jsonl"
+    tracing_batch_size: int = 256
+    tracing_max_queue_size: int = 2048
+    tracing_flush_interval_seconds: float = 1.0
+    log_policies: dict[str, dict[str, Any]] = {}
+    log_summary_interval_seconds: float = 60.0
+    traffic_record_path: Optional[str] = None
+    traffic_record_sample_rate: float = 1.0
+    traffic_record_max_bytes: int = 50 * 1024 * 1024
+    traffic_record_backups: int = 3
+    traffic_record_text_chars: int = 0
+    chat_scheduler_workers: int = 32
+    chat_max_in_flight: int = 1
+    bulkhead_shared_limit: int = 24
+    bulkhead_text_limit: int = 16
+    bulkhead_feedback_limit: int = 8
+    bulkhead_media_limit: int = 8
+    bulkhead_transcription_limit: int = 4
+    bulkhead_max_waiting: int = 16
+    bulkhead_transcription_max_waiting: int = 4
+    bulkhead_acquire_timeout_seconds: float = 10.0
     environment: str = "development"
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
+    @field_validator("capture_dedupe_mode")
+    @classmethod
+    def _check_capture_dedupe_mode(cls, value: str) -> str:
+        mode = value.strip().lower()
+        if mode not in CAPTURE_DEDUPE_MODES:
+            raise ValueError(f"Capture dedupe mode must be one of {', '.join(CAPTURE_DEDUPE_MODES)}")
+        return mode
+
+    @field_validator("tracing_exporter")
+    @classmethod
+    def _check_tracing_exporter(cls, value: Optional[str]) -> Optional[str]:
+        if value is None or not value.strip():
+            return None
+        exporter = value.strip().lower()
+        if exporter not in TRACING_EXPORTERS:
+            raise ValueError(f"Tracing exporter must be one of {', '.join(TRACING_EXPORTERS)}")
+        return exporter
+
+    @field_validator("log_policies")
+    @classmethod
+    def _check_log_policies(cls, value: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        for event, policy in value.items():
+            unknown = set(policy) - set(LOG_POLICY_FIELDS)
+            if unknown:
+                raise ValueError(f"Log policy for {event} has unknown fields: {', '.join(sorted(unknown))}")
+            sample = policy.get("sample", 1.0)
+            if not isinstance(sample, (int, float)) or not 0 < sample <= 1:
+                raise ValueError(f"Log policy sample for {event} must be in (0, 1]")
+        return value
+
     @field_validator("telegram_allowed_user_ids", "telegram_allowed_chat_ids", mode="before")
     @classmethod
     def _parse_id_set(cls, value: object) -> set[int]:
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import hmac
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field
+
+from app.config import Settings, get_settings
+from app.profiling import PROFILE_CPROFILE, ProfilerBusyError, get_memory_tracker, get_profiler
+from app.responses import error_response, success_response
+from app.tracing import get_flight_recorder
+
+logger = logging.getLogger("gatchan")
+router = APIRouter(prefix="/debug")
+
+
+class ProfileRequest(BaseModel):
+    mode: str = PROFILE_CPROFILE
+    requests: Optional[int] = Field(default=None, ge=1)
+    seconds: Optional[float] = Field(default=None, gt=0, le=600)
+    interval_ms: float = Field(default=5.0, ge=1, le=1000)
+
+
+def _admin_denied(settings: Settings, admin_token: Optional[str]) -> Optional[JSONResponse]:
+    # Without ADMIN_TOKEN the debug surface does not exist at all.
+    expected = settings.admin_token.get_secret_value() if settings.admin_token else ""
+    if not expected:
+        return error_response("Not found", status_code=404)
+    if not admin_token or not hmac.compare_digest(admin_token.encode(), expected.encode()):
+        logger.warning("debug_forbidden")
+        return error_response("Unauthorized", status_code=401)
+    return None
+
+
+@router.post("/profile")
+def start_profile(
+    body: ProfileRequest,
+    settings: Settings = Depends(get_settings),
+    admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+) -> JSONResponse:
+    denied = _admin_denied(settings, admin_token)
+    if denied is not None:
+        return denied
+    requests = body.requests if body.requests is not None or body.seconds is not None else 10
+    try:
+        status = get_profiler().start(
+            body.mode,
+            requests=requests,
+            seconds=body.seconds,
+            interval_seconds=body.interval_ms / 1000,
+        )
+    except ProfilerBusyError:
+        return error_response("A profile is already running", status_code=409)
+    except ValueError as exc:
+        return error_response(str(exc), status_code=400)
+    logger.info("profile_started", extra=status)
+    return success_response(status)
+
+
+@router.get("/profile")
+def get_profile(
+    output: str = "text",
+    limit: int = 50,
+    settings: Settings = Depends(get_settings),
+    admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+) -> Response:
+    denied = _admin_denied(settings, admin_token)
+    if denied is not None:
+        return denied
+    profiler = get_profiler()
+    try:
+        result = profiler.result(output, limit=limit)
+    except LookupError as exc:
+        return error_response(str(exc), status_code=404)
+    if result is None:
+        return success_response(profiler.status(), status_code=202)
+    body, media_type = result
+    return Response(body, media_type=media_type)
+
+
+@router.delete("/profile")
+def stop_profile(
+    settings: Settings = Depends(get_settings),
+    admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+) -> JSONResponse:
+    denied = _admin_denied(settings, admin_token)
+    if denied is not None:
+        return denied
+    return success_response(get_profiler().stop())
+
+
+@router.post("/memory")
+def start_memory(
+    frames: int = 10,
+    settings: Settings = Depends(get_settings),
+    admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+) -> JSONResponse:
+    denied = _admin_denied(settings, admin_token)
+    if denied is not None:
+        return denied
+    get_memory_tracker().start(max(1, min(frames, 100)))
+    return success_response({"tracing": True})
+
+
+@router.get("/memory")
+def memory_snapshot(
+    limit: int = 20,
+    settings: Settings = Depends(get_settings),
+    admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+) -> JSONResponse:
+    denied = _admin_denied(settings, admin_token)
+    if denied is not None:
+        return denied
+    try:
+        return success_response(get_memory_tracker().snapshot(limit))
+    except LookupError as exc:
+        return error_response(str(exc), status_code=409)
+
+
+@router.delete("/memory")
+def stop_memory(
+    settings: Settings = Depends(get_settings),
+    admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+) -> JSONResponse:
+    denied = _admin_denied(settings, admin_token)
+    if denied is not None:
+        return denied
+    get_memory_tracker().stop()
+    return success_response({"tracing": False})
+
+
+@router.get("/traces")
+def traces(
+    limit: int = 20,
+    order: str = "recent",
+    errors: bool = False,
+    chat_id: Optional[int] = None,
+    settings: Settings = Depends(get_settings),
+    admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+) -> JSONResponse:
+    denied = _admin_denied(settings, admin_token)
+    if denied is not None:
+        return denied
+    recorder = get_flight_recorder(settings.trace_buffer_size)
+    try:
+        found = recorder.query(limit=limit, order=order, errors=errors, chat_id=chat_id)
+    except ValueError as exc:
+        return error_response(str(exc), status_code=400)
+    return success_response(found)
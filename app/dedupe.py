@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import threading
+from array import array
+from typing import Optional
+
+_EMPTY = -1
+# Fibonacci hashing: update ids are sequential, and hash(int) is the identity, which would
+# pack live ids into one long probe run that every backward-shift deletion walks.
+_GOLDEN = 0x9E3779B97F4A7C15
+_WORD = (1 << 64) - 1
+
+
+class DedupeRing:
+    # Fixed-size FIFO of (update_id, timestamp) pairs in two array('q') columns plus an
+    # open-addressing index of ring positions. About 24 bytes per entry, O(1) lookups,
+    # and expiry pops the oldest entries, each exactly once.
+    def __init__(self, capacity: int, ttl_seconds: float) -> None:
+        if capacity < 1:
+            raise ValueError("Dedupe capacity must be at least 1")
+        self._capacity = capacity
+        self._ttl_ms = int(ttl_seconds * 1000)
+        bits = max(2 * capacity - 1, 1).bit_length()
+        self._table_size = 1 << bits
+        self._mask = self._table_size - 1
+        self._shift = 64 - bits
+        self._ids: Optional[array] = None
+        self._stamps: Optional[array] = None
+        self._index: Optional[array] = None
+        self._head = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size
+
+    def __contains__(self, update_id: object) -> bool:
+        if not isinstance(update_id, int):
+            return False
+        with self._lock:
+            return self._index is not None and self._find(update_id) >= 0
+
+    def nbytes(self) -> int:
+        if self._index is None:
+            return 0
+        return sum(column.itemsize * len(column) for column in (self._ids, self._stamps, self._index))
+
+    def check_and_add(self, update_id: int, now: float) -> bool:
+        now_ms = int(now * 1000)
+        with self._lock:
+            self._allocate()
+            self._expire(now_ms - self._ttl_ms)
+            if self._find(update_id) >= 0:
+                return True
+            if self._size == self._capacity:
+                self._evict_oldest()
+            position = (self._head + self._size) % self._capacity
+            self._ids[position] = update_id
+            self._stamps[position] = now_ms
+            self._size += 1
+            self._index[self._free_slot(update_id)] = position
+            return False
+
+    def discard(self, update_id: int) -> None:
+        # The ring slot stays until it ages out; only the index entry goes away.
+        with self._lock:
+            if self._index is None:
+                return
+            slot = self._find(update_id)
+            if slot >= 0:
+                self._remove_slot(slot)
+
+    def _allocate(self) -> None:
+        if self._index is not None:
+            return
+        self._ids = array("q", bytes(8 * self._capacity))
+        self._stamps = array("q", bytes(8 * self._capacity))
+        typecode = "i" if self._capacity < 2**31 else "q"
+        self._index = array(typecode, [_EMPTY]) * self._table_size
+
+    def _expire(self, expired_before_ms: int) -> None:
+        while self._size and self._stamps[self._head] < expired_before_ms:
+            self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        position = self._head
+        slot = self._find(self._ids[position])
+        if slot >= 0 and self._index[slot] == position:
+            self._remove_slot(slot)
+        self._head = (self._head + 1) % self._capacity
+        self._size -= 1
+
+    def _home(self, update_id: int) -> int:
+        # Multiplicative (Fibonacci) hashing: the top bits of id * 2^64/phi. Consecutive ids
+        # land far apart, where hash(int) & mask would put them in adjacent slots.
+        return ((update_id * _GOLDEN) & _WORD) >> self._shift
+
+    def _find(self, update_id: int) -> int:
+        index = self._index
+        ids = self._ids
+        slot = self._home(update_id)
+        while True:
+            position = index[slot]
+            if position == _EMPTY:
+                return -1
+            if ids[position] == update_id:
+                return slot
+            slot = (slot + 1) & self._mask
+
+    def _free_slot(self, update_id: int) -> int:
+        slot = self._home(update_id)
+        while self._index[slot] != _EMPTY:
+            slot = (slot + 1) & self._mask
+        return slot
+
+    def _remove_slot(self, slot: int) -> None:
+        # Backward-shift deletion keeps linear probe chains intact without tombstones.
+        index = self._index
+        mask = self._mask
+        hole = slot
+        probe = slot
+        while True:
+            probe = (probe + 1) & mask
+            position = index[probe]
+            if position == _EMPTY:
+                break
+            home = self._home(self._ids[position])
+            if hole <= probe:
+                stays = hole < home <= probe
+            else:
+                stays = home > hole or home <= probe
+            if stays:
+                continue
+            index[hole] = position
+            hole = probe
+        index[hole] = _EMPTY
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+logger = logging.getLogger("gatchan")
+
+# deliver(chat_id, text, message_id) sends a new message when message_id is None and
+# edits it otherwise; it returns the id of the message that now shows the text.
+Deliver = Callable[[int, str, Optional[int]], Optional[int]]
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, burst: int, *, now: float) -> None:
+        if rate_per_second <= 0:
+            raise ValueError("Token bucket rate must be positive")
+        if burst < 1:
+            raise ValueError("Token bucket burst must be at least 1")
+        self._rate = rate_per_second
+        self._burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = now
+
+    def delay(self, now: float) -> float:
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self._rate
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self._tokens >= self._burst
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self._tokens -= 1
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+
+
+@dataclass(frozen=True)
+class _Delivery:
+    chat_id: int
+    text: str
+    message_id: Optional[int]
+    request_id: Optional[str]
+    burst: Optional[int] = None
+
+
+@dataclass
+class _ChatFeedback:
+    bucket: TokenBucket
+    notices: deque[tuple[str, Optional[str]]] = field(default_factory=deque)
+    created: int = 0
+    last_url: Optional[str] = None
+    last_created_at: Optional[float] = None
+    status_message_id: Optional[int] = None
+    status_dirty: bool = False
+    status_request_id: Optional[str] = None
+    burst: int = 0
+    busy: bool = False
+
+    def has_work(self) -> bool:
+        return bool(self.notices) or self.status_dirty
+
+
+def status_text(created: int, task_url: Optional[str]) -> str:
+    if created == 1:
+        return f"已创建 Todoist 任务：{task_url}" if task_url else "已创建 Todoist 任务。"
+    return f"已创建 {created} 个任务"
+
+
+class FeedbackAggregator:
+    # Replies leave the request path: handlers only record what happened and a few
+    # sender threads drain it. Captures in a burst share one status message that is
+    # edited in place, and every chat is paced by its own token bucket, so a flood of
+    # forwards collapses into a handful of edits instead of one reply per message.
+    def __init__(
+        self,
+        deliver: Deliver,
+        *,
+        window_seconds: float = 10.0,
+        rate_per_second: float = 1.0,
+        burst: int = 3,
+        workers: int = 4,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("Feedback needs at least one sender")
+        self._deliver = deliver
+        self._window = window_seconds
+        self._rate = rate_per_second
+        self._burst = burst
+        self._worker_count = workers
+        self._clock = clock
+        self._chats: dict[int, _ChatFeedback] = {}
+        self._pending: dict[int, None] = {}
+        self._condition = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._closed = False
+        self._last_prune = clock()
+
+    def created(self, chat_id: int, task_url: Optional[str], *, request_id: Optional[str] = None) -> None:
+        with self._condition:
+            now = self._clock()
+            chat = self._chat(chat_id, now)
+            if chat.last_created_at is None or now - chat.last_created_at > self._window:
+                chat.created = 0
+                chat.status_message_id = None
+                chat.burst += 1
+            chat.created += 1
+            chat.last_url = task_url
+            chat.last_created_at = now
+            chat.status_dirty = True
+            chat.status_request_id = request_id
+            self._schedule(chat_id)
+
+    def notify(self, chat_id: int, text: str, *, request_id: Optional[str] = None) -> None:
+        with self._condition:
+            self._chat(chat_id, self._clock()).notices.append((text, request_id))
+            self._schedule(chat_id)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or any(chat.busy for chat in self._chats.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        drained = self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        return drained
+
+    def stats(self) -> dict[str, int]:
+        with self._condition:
+            return {
+                "chats": len(self._chats),
+                "pending_chats": len(self._pending),
+                "queued_notices": sum(len(chat.notices) for chat in self._chats.values()),
+            }
+
+    def _chat(self, chat_id: int, now: float) -> _ChatFeedback:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _ChatFeedback(TokenBucket(self._rate, self._burst, now=now))
+        return chat
+
+    def _schedule(self, chat_id: int) -> None:
+        if self._closed:
+            return
+        self._pending[chat_id] = None
+        self._start_workers()
+        self._condition.notify()
+
+    def _start_workers(self) -> None:
+        while len(self._threads) < self._worker_count:
+            thread = threading.Thread(
+                target=self._run,
+                name=f"feedback-sender-{len(self._threads)}",
+                daemon=True,
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                delivery = self._next_ready()
+                while delivery is None:
+                    if self._closed:
+                        return
+                    self._condition.wait(self._next_delay())
+                    delivery = self._next_ready()
+            try:
+                delivered_id = self._deliver(delivery.chat_id, delivery.text, delivery.message_id)
+            except Exception as exc:
+                logger.warning(
+                    "telegram_feedback_failed",
+                    extra={"request_id": delivery.request_id, "error": str(exc)},
+                )
+                delivered_id = None
+            with self._condition:
+                chat = self._chats[delivery.chat_id]
+                chat.busy = False
+                if delivery.burst is not None and delivery.burst == chat.burst:
+                    if delivered_id is None and delivery.message_id is not None:
+                        # The status message is gone or uneditable: post a fresh one.
+                        chat.status_dirty = True
+                    chat.status_message_id = delivered_id
+                if chat.has_work():
+                    self._pending[delivery.chat_id] = None
+                self._prune(self._clock())
+                self._condition.notify_all()
+
+    def _next_ready(self) -> Optional[_Delivery]:
+        now = self._clock()
+        for chat_id in list(self._pending):
+            chat = self._chats[chat_id]
+            if chat.busy:
+                continue
+            if not chat.has_work():
+                del self._pending[chat_id]
+                continue
+            if chat.bucket.delay(now) > 0:
+                continue
+            chat.bucket.take(now)
+            chat.busy = True
+            # Round robin: the chat rejoins at the back once this delivery finishes.
+            del self._pending[chat_id]
+            if chat.notices:
+                text, request_id = chat.notices.popleft()
+                return _Delivery(chat_id, text, None, request_id)
+            chat.status_dirty = False
+            return _Delivery(
+                chat_id,
+                status_text(chat.created, chat.last_url),
+                chat.status_message_id,
+                chat.status_request_id,
+                chat.burst,
+            )
+        return None
+
+    def _next_delay(self) -> Optional[float]:
+        now = self._clock()
+        delays = [
+            self._chats[chat_id].bucket.delay(now)
+            for chat_id in self._pending
+            if not self._chats[chat_id].busy
+        ]
+        return max(min(delays), 0.001) if delays else None
+
+    def _prune(self, now: float) -> None:
+        # Idle chats are dropped once their burst window has passed and their bucket has
+        # refilled, so forgetting them never loosens the rate limit.
+        if now - self._last_prune < self._window:
+            return
+        self._last_prune = now
+        for chat_id, chat in list(self._chats.items()):
+            if chat.busy or chat.has_work() or chat_id in self._pending:
+                continue
+            if chat.last_created_at is not None and now - chat.last_created_at <= self._window:
+                continue
+            if chat.bucket.full(now):
+                del self._chats[chat_id]
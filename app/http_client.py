@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import importlib.util
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import httpcore
+import httpx
+
+DEFAULT_TIMEOUT_SECONDS = 10.0
+TELEGRAM_BASE_URL = "https://api.telegram.org/"
+TODOIST_BASE_URL = "https://api.todoist.com/"
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/"
+
+logger = logging.getLogger("gatchan")
+_client: Optional[httpx.Client] = None
+_transport: Optional["PooledTransport"] = None
+_client_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class HttpClientOptions:
+    http2: bool = False
+    max_connections: int = 100
+    # At least the shared bulkhead limit, or bulkhead-admitted calls queue here and hit PoolTimeout.
+    max_connections_per_host: int = 24
+    max_streams_per_connection: int = 50
+    max_keepalive_connections: int = 20
+    keepalive_expiry_seconds: float = 30.0
+    dns_cache_seconds: float = 300.0
+
+
+_options = HttpClientOptions()
+
+
+class _CachingBackend(httpcore.SyncBackend):
+    # Resolves each host once per TTL instead of on every new connection. TLS still
+    # verifies against the original hostname, which httpcore passes separately.
+    def __init__(self, ttl_seconds: float, resolve: Callable[..., Any] = socket.getaddrinfo) -> None:
+        self._ttl = ttl_seconds
+        self._resolve = resolve
+        self._cache: dict[tuple[str, int], tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options: Optional[Iterable[Any]] = None,
+    ) -> httpcore.NetworkStream:
+        address = self._address(host, port)
+        try:
+            stream = super().connect_tcp(address, port, timeout, local_address, socket_options)
+        except httpcore.ConnectError:
+            with self._lock:
+                self._cache.pop((host, port), None)
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return stream
+
+    def _address(self, host: str, port: int) -> str:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get((host, port))
+            if cached is not None and cached[1] > now:
+                return cached[0]
+        try:
+            infos = self._resolve(host, port, type=socket.SOCK_STREAM)
+        except OSError as exc:
+            raise httpcore.ConnectError(str(exc)) from exc
+        address = infos[0][4][0]
+        with self._lock:
+            self._cache[(host, port)] = (address, now + self._ttl)
+        return address
+
+
+# Most specific first: the first isinstance match wins.
+_HTTPCORE_ERRORS: tuple[tuple[type[Exception], type[httpx.TransportError]], ...] = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.ProxyError, httpx.ProxyError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextmanager
+def _httpx_errors() -> Iterator[None]:
+    try:
+        yield
+    except Exception as exc:
+        for core_error, httpx_error in _HTTPCORE_ERRORS:
+            if isinstance(exc, core_error):
+                raise httpx_error(str(exc)) from exc
+        raise
+
+
+class _CoreStream(httpx.SyncByteStream):
+    def __init__(self, stream: Iterable[bytes]) -> None:
+        self._stream = stream
+
+    def __iter__(self) -> Iterator[bytes]:
+        with _httpx_errors():
+            yield from self._stream
+
+    def close(self) -> None:
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            close()
+
+
+class _CoreTransport(httpx.BaseTransport):
+    # httpx.HTTPTransport has no way to pass a network backend, so this drives an httpcore
+    # pool built through its public constructor, the same way HTTPTransport does internally.
+    def __init__(self, pool: httpcore.ConnectionPool) -> None:
+        self._pool = pool
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _httpx_errors():
+            response = self._pool.handle_request(core_request)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_CoreStream(response.stream),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self._pool.close()
+
+
+class ReleasingStream(httpx.SyncByteStream):
+    # Runs `release` once when the body is closed, which httpx does after reading or on error.
+    def __init__(self, stream: httpx.SyncByteStream, release: Callable[[], None]) -> None:
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class PooledTransport(httpx.BaseTransport):
+    # httpx only caps connections globally. A per-host semaphore bounds requests in flight to
+    # each upstream (connections x streams on HTTP/2), so one slow host cannot take the pool.
+    def __init__(self, options: HttpClientOptions, *, transport: Optional[httpx.BaseTransport] = None) -> None:
+        limits = httpx.Limits(
+            max_connections=options.max_connections,
+            max_keepalive_connections=options.max_keepalive_connections,
+            keepalive_expiry=options.keepalive_expiry_seconds,
+        )
+        http2 = options.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("http2_unavailable", extra={"error": "install httpx[http2] to enable HTTP/2"})
+            http2 = False
+        self.http2 = http2
+        self.backend: Optional[_CachingBackend] = None
+        if transport is not None:
+            self._inner = transport
+        elif options.dns_cache_seconds > 0:
+            self.backend = _CachingBackend(options.dns_cache_seconds)
+            self._inner = _CoreTransport(
+                httpcore.ConnectionPool(
+                    ssl_context=httpx.create_ssl_context(),
+                    max_connections=limits.max_connections,
+                    max_keepalive_connections=limits.max_keepalive_connections,
+                    keepalive_expiry=limits.keepalive_expiry,
+                    http2=http2,
+                    network_backend=self.backend,
+                )
+            )
+        else:
+            self._inner = httpx.HTTPTransport(http2=http2, limits=limits)
+        per_connection = options.max_streams_per_connection if http2 else 1
+        self._host_limit = options.max_connections_per_host * per_connection
+        self._hosts: dict[str, threading.BoundedSemaphore] = {}
+        self._in_flight: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.netloc.decode("ascii")
+        semaphore = self._semaphore(host)
+        pool_timeout = (request.extensions.get("timeout") or {}).get("pool")
+        if not semaphore.acquire(timeout=pool_timeout):
+            raise httpx.PoolTimeout(f"Too many requests in flight to {host}", request=request)
+        self._track(host, 1)
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._track(host, -1)
+                semaphore.release()
+
+        try:
+            response = self._inner.handle_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=ReleasingStream(response.stream, release),
+            extensions=response.extensions,
+        )
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "http2": self.http2,
+                "per_host_limit": self._host_limit,
+                "in_flight": dict(self._in_flight),
+                "connections_opened": self.backend.connections_opened if self.backend else None,
+            }
+
+    def close(self) -> None:
+        self._inner.close()
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._hosts.get(host)
+            if semaphore is None:
+                semaphore = self._hosts[host] = threading.BoundedSemaphore(self._host_limit)
+            return semaphore
+
+    def _track(self, host: str, delta: int) -> None:
+        with self._lock:
+            self._in_flight[host] = self._in_flight.get(host, 0) + delta
+
+
+def configure_http_client(options: HttpClientOptions) -> None:
+    # The next get_http_client() builds a client with these options.
+    global _options
+    with _client_lock:
+        _options = options
+    close_http_client()
+
+
+def get_http_client() -> httpx.Client:
+    global _client, _transport
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _transport = PooledTransport(_options)
+            _client = httpx.Client(timeout=DEFAULT_TIMEOUT_SECONDS, transport=_transport)
+        return _client
+
+
+def get_http_transport() -> "PooledTransport":
+    # For clients that add their own defaults or limits but share this pool's connections.
+    get_http_client()
+    with _client_lock:
+        assert _transport is not None
+        return _transport
+
+
+def http_client_stats() -> Optional[dict[str, Any]]:
+    with _client_lock:
+        transport = _transport if _client is not None and not _client.is_closed else None
+    return transport.stats() if transport is not None else None
+
+
+def close_http_client() -> None:
+    global _client, _transport
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+            _transport = None
+
+
+def prewarm_http_client(urls: Iterable[str], *, client: Optional[httpx.Client] = None) -> int:
+    # A HEAD per host pays DNS and TLS once and leaves a keep-alive connection in the pool.
+    targets = list(urls)
+    if not targets:
+        return 0
+    if client is None:
+        client = get_http_client()
+
+    def warm(url: str) -> bool:
+        try:
+            client.head(url)
+        except httpx.HTTPError as exc:
+            logger.warning("http_prewarm_failed", extra={"url": url, "error": str(exc)})
+            return False
+        return True
+
+    with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="prewarm") as executor:
+        return sum(executor.map(warm, targets))
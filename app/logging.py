@@ -1,4 +1,20 @@
+from __future__ import annotations
+
+import json
 import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Mapping, Optional
+
+from app.feedback import TokenBucket
+
+DEFAULT_MAX_KEYS = 1024
+DEFAULT_SUMMARY_INTERVAL_SECONDS = 60.0
+
+_filter: Optional["RateLimitFilter"] = None
+_filter_lock = threading.Lock()
 
 
 def configure_logging() -> None:
@@ -6,3 +22,172 @@ def configure_logging() -> None:
         level=logging.INFO,
         format="%(asctime)s %(levelname)s %(name)s %(message)s",
     )
+
+
+@dataclass(frozen=True)
+class EventPolicy:
+    # rate_per_second/burst: token bucket per event; sample_every: keep 1 in N records;
+    # key/dedupe_seconds: drop records whose key attributes were logged within the window.
+    rate_per_second: Optional[float] = None
+    burst: int = 1
+    sample_every: int = 1
+    key: tuple[str, ...] = ()
+    dedupe_seconds: float = 0.0
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "EventPolicy":
+        # {"rate": 1, "burst": 10, "sample": 0.1, "key": "chat_id,from_id", "dedupe_seconds": 60}
+        sample = float(config.get("sample", 1.0))
+        key = config.get("key") or ()
+        return cls(
+            rate_per_second=float(config["rate"]) if config.get("rate") else None,
+            burst=int(config.get("burst", 1)),
+            sample_every=max(1, round(1 / sample)) if sample > 0 else 1,
+            key=tuple(part.strip() for part in key.split(",") if part.strip()) if isinstance(key, str) else tuple(key),
+            dedupe_seconds=float(config.get("dedupe_seconds", 0.0)),
+        )
+
+
+# The warning paths that fire once per request under abusive or malformed traffic.
+DEFAULT_EVENT_POLICIES = {
+    "webhook_forbidden": EventPolicy(rate_per_second=1.0, burst=10),
+    "webhook_denied": EventPolicy(rate_per_second=1.0, burst=10, key=("chat_id", "from_id"), dedupe_seconds=60.0),
+    "validation_failed": EventPolicy(rate_per_second=1.0, burst=10),
+}
+
+
+@dataclass
+class _EventState:
+    bucket: Optional[TokenBucket]
+    seen: "OrderedDict[tuple[Any, ...], float]" = field(default_factory=OrderedDict)
+    records: int = 0
+    emitted: int = 0
+    suppressed: int = 0
+    pending: int = 0
+
+
+class RateLimitFilter(logging.Filter):
+    # Events are named by the first word of the log message ("webhook_denied %s" is
+    # "webhook_denied"), which is how every log call in the app is written. Events without
+    # a policy pass untouched. The next record an event does emit carries how many were
+    # dropped before it; counts still pending after summary_interval_seconds are logged as
+    # one log_suppressed line.
+    def __init__(
+        self,
+        policies: Mapping[str, EventPolicy],
+        *,
+        summary_interval_seconds: float = DEFAULT_SUMMARY_INTERVAL_SECONDS,
+        max_keys: int = DEFAULT_MAX_KEYS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self._policies = dict(policies)
+        self._summary_interval = summary_interval_seconds
+        self._max_keys = max_keys
+        self._clock = clock
+        self._states: dict[str, _EventState] = {}
+        self._lock = threading.Lock()
+        self._summarized_at = clock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = _event_name(record)
+        policy = self._policies.get(event) if event else None
+        if policy is None:
+            return True
+        now = self._clock()
+        summary: Optional[dict[str, int]] = None
+        with self._lock:
+            state = self._states.get(event)
+            if state is None:
+                bucket = TokenBucket(policy.rate_per_second, policy.burst, now=now) if policy.rate_per_second else None
+                state = self._states[event] = _EventState(bucket)
+            allowed = self._admit(policy, state, record, now)
+            pending = 0
+            if allowed:
+                state.emitted += 1
+                pending, state.pending = state.pending, 0
+            else:
+                state.suppressed += 1
+                state.pending += 1
+            if now - self._summarized_at >= self._summary_interval:
+                summary = self._take_summary(now)
+        if pending:
+            record.msg = f"{record.getMessage()} suppressed={pending}"
+            record.args = None
+            record.suppressed = pending
+        if summary:
+            logging.getLogger(record.name).warning(
+                "log_suppressed %s", json.dumps(summary, separators=(",", ":"), sort_keys=True)
+            )
+        return allowed
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        with self._lock:
+            return {
+                event: {"emitted": state.emitted, "suppressed": state.suppressed}
+                for event, state in self._states.items()
+            }
+
+    def _admit(self, policy: EventPolicy, state: _EventState, record: logging.LogRecord, now: float) -> bool:
+        if policy.key and policy.dedupe_seconds > 0:
+            key = tuple(getattr(record, name, None) for name in policy.key)
+            seen_at = state.seen.get(key)
+            if seen_at is not None and now - seen_at < policy.dedupe_seconds:
+                return False
+            # Only first sightings refresh the window, so a key reappears once per window.
+            state.seen.pop(key, None)
+            state.seen[key] = now
+            while len(state.seen) > self._max_keys:
+                state.seen.popitem(last=False)
+        state.records += 1
+        if (state.records - 1) % policy.sample_every:
+            return False
+        if state.bucket is not None:
+            if state.bucket.delay(now) > 0:
+                return False
+            state.bucket.take(now)
+        return True
+
+    def _take_summary(self, now: float) -> dict[str, int]:
+        self._summarized_at = now
+        summary = {event: state.pending for event, state in self._states.items() if state.pending}
+        for state in self._states.values():
+            state.pending = 0
+        return summary
+
+
+def _event_name(record: logging.LogRecord) -> Optional[str]:
+    if not isinstance(record.msg, str):
+        return None
+    return record.msg.split(" ", 1)[0]
+
+
+def event_policies(overrides: Mapping[str, Mapping[str, Any]]) -> dict[str, EventPolicy]:
+    # Overrides replace a default per event; an empty mapping turns limiting off for it.
+    policies = dict(DEFAULT_EVENT_POLICIES)
+    for event, config in overrides.items():
+        if config:
+            policies[event] = EventPolicy.from_config(config)
+        else:
+            policies.pop(event, None)
+    return policies
+
+
+def install_log_filter(
+    overrides: Mapping[str, Mapping[str, Any]],
+    *,
+    summary_interval_seconds: float = DEFAULT_SUMMARY_INTERVAL_SECONDS,
+    logger_name: str = "gatchan",
+) -> RateLimitFilter:
+    global _filter
+    target = logging.getLogger(logger_name)
+    with _filter_lock:
+        if _filter is not None:
+            target.removeFilter(_filter)
+        _filter = RateLimitFilter(event_policies(overrides), summary_interval_seconds=summary_interval_seconds)
+        target.addFilter(_filter)
+        return _filter
+
+
+def log_filter_stats() -> Optional[dict[str, dict[str, int]]]:
+    return _filter.stats() if _filter is not None else None
@@ -1,17 +1,47 @@
+import asyncio
 import json
 import logging
+import signal
+import threading
 import time
-from collections import OrderedDict
 from contextlib import asynccontextmanager
-from typing import Optional
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, MutableMapping, Optional, TypeVar
 from uuid import uuid4
 
 from fastapi import Depends, FastAPI, Header, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
+from pydantic import ValidationError
 
-from app.config import Settings, get_settings
-from app.logging import configure_logging
+from app.admission import AdmissionController, OverloadedError
+from app.bulkhead import (
+    WORK_CLASS_FEEDBACK,
+    WORK_CLASS_MEDIA,
+    WORK_CLASS_TEXT,
+    WORK_CLASS_TRANSCRIPTION,
+    Bulkhead,
+    BulkheadFullError,
+    Lane,
+)
+from app.capture_index import CaptureIndex, CapturedTask, capture_keys
+from app.config import SHUTDOWN_FLUSH_RESERVE_SECONDS, Settings, get_settings
+from app.debug import router as debug_router
+from app.dedupe import DedupeRing
+from app.feedback import FeedbackAggregator
+from app.http_client import (
+    GEMINI_BASE_URL,
+    TELEGRAM_BASE_URL,
+    TODOIST_BASE_URL,
+    HttpClientOptions,
+    close_http_client,
+    configure_http_client,
+    http_client_stats,
+    prewarm_http_client,
+)
+from app.logging import configure_logging, install_log_filter, log_filter_stats
+from app.message_index import IndexedMessage, MessageIndex
 from app.models import (
     TelegramAudio,
     TelegramDocument,
@@ -20,41 +50,208 @@ from app.models import (
     TelegramVoice,
     WebhookAck,
 )
+from app.profiling import get_profiler
 from app.responses import error_response, success_response
 from app.telegram_normalizer import (
     FORWARDED_EMPTY_PROMPT,
     DOCUMENT_ONLY_PROMPT,
+    IMAGE_ONLY_PROMPT,
     UNSUPPORTED_MESSAGE_PROMPT,
     VOICE_ONLY_PROMPT,
     normalize_update,
 )
 from app.todoist import (
+    InMemoryCheckpointStore,
     TodoistServiceError,
+    add_task_comment,
     cleanup_completed_subtasks,
     create_subtask,
     ensure_todo_later_task,
+    get_task,
+    update_task_content,
+    update_task_description,
+    upload_file,
+)
+from app.scheduler import ChatScheduler
+from app.spool import UpdateSpool
+from app.tenants import TenantPool, TenantRegistry, TenantSession
+from app.todoist_replica import TodoistReplica
+from app.tracing import (
+    configure_tracing,
+    exporter_for,
+    get_flight_recorder,
+    shutdown_tracing,
+    span,
+    tracing_stats,
+)
+from app.traffic import TrafficRecorder
+from app.telegram import (
+    TelegramFileStream,
+    download_telegram_file,
+    edit_telegram_message,
+    get_telegram_file_url,
+    send_telegram_message,
 )
-from app.telegram import download_telegram_file, get_telegram_file_url, send_telegram_message
 from app.transcribe import TranscriptionError, transcribe_audio_with_gemini
 
 logger = logging.getLogger("gatchan")
 DEDUPE_TTL_SECONDS = 300
-DEDUPE_MAX_ITEMS = 1000
-_dedupe_store: "OrderedDict[int, float]" = OrderedDict()
+_dedupe_store: Optional[DedupeRing] = None
+_dedupe_lock = threading.Lock()
+_bulkhead: Optional[Bulkhead] = None
+_bulkhead_lock = threading.Lock()
+_scheduler: Optional[ChatScheduler] = None
+_scheduler_lock = threading.Lock()
+_parent_cache: MutableMapping[str, Any] = {}
+_shared_parent_cache: Optional[MutableMapping[str, Any]] = None
+_parent_lock = threading.Lock()
+_cleanup_checkpoints = InMemoryCheckpointStore()
+_replica: Optional[TodoistReplica] = None
+_capture_index: Optional[CaptureIndex] = None
+_capture_index_lock = threading.Lock()
+_message_index: Optional[MessageIndex] = None
+_message_index_lock = threading.Lock()
+_replica_lock = threading.Lock()
+_feedback: Optional[FeedbackAggregator] = None
+_admission: Optional[AdmissionController] = None
+_admission_lock = threading.Lock()
+_spool: Optional[UpdateSpool] = None
+_spool_lock = threading.Lock()
+_drain_started: Optional[float] = None
+_drain_deadline: Optional[float] = None
+_drain_lock = threading.Lock()
+_recorder: Optional[TrafficRecorder] = None
+_recorder_lock = threading.Lock()
+_tenant_registry: Optional[TenantRegistry] = None
+_tenant_pool: Optional[TenantPool] = None
+_tenant_lock = threading.Lock()
+DEFER_GRACE_SECONDS = 1.0
+MEDIA_ONLY_PROMPTS = frozenset({IMAGE_ONLY_PROMPT, VOICE_ONLY_PROMPT, DOCUMENT_ONLY_PROMPT})
+_feedback_lock = threading.Lock()
+T = TypeVar("T")
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     configure_logging()
     try:
-        get_settings()
+        settings = get_settings()
         logger.info("settings_loaded")
-        yield
     except Exception as exc:
         logger.error("settings_load_failed", exc_info=exc)
         raise
+    install_log_filter(settings.log_policies, summary_interval_seconds=settings.log_summary_interval_seconds)
+    configure_http_client(
+        HttpClientOptions(
+            http2=settings.http2_enabled,
+            max_connections=settings.http_max_connections,
+            max_connections_per_host=settings.http_max_connections_per_host,
+            max_streams_per_connection=settings.http2_max_streams_per_connection,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry_seconds=settings.http_keepalive_expiry_seconds,
+            dns_cache_seconds=settings.http_dns_cache_seconds,
+        )
+    )
+    if settings.tracing_exporter:
+        configure_tracing(
+            exporter_for(settings.tracing_exporter, path=settings.tracing_otlp_path),
+            max_queue_size=settings.tracing_max_queue_size,
+            max_batch_size=settings.tracing_batch_size,
+            flush_interval_seconds=settings.tracing_flush_interval_seconds,
+        )
+    if settings.tenant_db_path:
+        _get_tenant_registry(settings)
+    if settings.startup_prewarm:
+        threading.Thread(target=_prewarm, args=(settings,), name="startup-prewarm", daemon=True).start()
+    if settings.shutdown_spool_path:
+        threading.Thread(target=_replay_spool, args=(settings,), name="spool-replay", daemon=True).start()
+    _install_drain_signal(settings)
+    yield
+    await _drain(settings)
+
+
+def _install_drain_signal(settings: Settings) -> None:
+    # Chains onto the server's SIGTERM handler so admission closes and the drain clock starts
+    # the moment Cloud Run asks us to stop, not after open connections have finished.
+    if threading.current_thread() is not threading.main_thread():
+        return
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle(signum: int, frame: object) -> None:
+        _begin_drain(settings)
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, handle)
+
+
+def _begin_drain(settings: Settings) -> None:
+    global _drain_started, _drain_deadline
+    with _drain_lock:
+        if _drain_started is not None:
+            return
+        _drain_started = time.time()
+        # Updates may start while there is still time to spool the rest and flush replies.
+        processing = settings.shutdown_drain_seconds - DEFER_GRACE_SECONDS - SHUTDOWN_FLUSH_RESERVE_SECONDS
+        _drain_deadline = _drain_started + max(processing, 0.0)
+    _get_admission(settings).close()
+    logger.info("shutdown_drain_started", extra={"deadline_seconds": settings.shutdown_drain_seconds})
+
+
+def _time_left(until: float) -> float:
+    return max(until - time.time(), 0.0)
+
+
+async def _drain(settings: Settings) -> None:
+    global _drain_deadline
+    _begin_drain(settings)
+    # One budget from SIGTERM: every step below only gets what is left of it.
+    finish_by = (_drain_started or time.time()) + settings.shutdown_drain_seconds
+    admission = _get_admission(settings)
+    drained = await asyncio.to_thread(admission.wait_idle, _time_left(_drain_deadline or 0.0))
+    # Whatever is still queued defers itself (spool or 503); do it here, before replies are flushed,
+    # rather than whenever a worker frees up.
+    _drain_deadline = time.time()
+    if _scheduler is not None:
+        await asyncio.to_thread(_scheduler.run_pending)
+    if not drained:
+        drained = await asyncio.to_thread(
+            admission.wait_idle, _time_left(finish_by - SHUTDOWN_FLUSH_RESERVE_SECONDS)
+        )
+    if _scheduler is not None:
+        _scheduler.shutdown(wait=False)
+    if _feedback is not None:
+        _feedback.close(timeout=min(settings.feedback_flush_timeout_seconds, _time_left(finish_by)))
+    logger.info(
+        "shutdown_drained %s",
+        json.dumps({"drained": drained, **_metrics_snapshot()}, separators=(",", ":"), sort_keys=True, default=str),
+    )
+    shutdown_tracing(_time_left(finish_by))
+    if _recorder is not None:
+        _recorder.close(_time_left(finish_by))
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+    close_http_client()
+
+
+def _prewarm(settings: Settings) -> None:
+    # Runs off the startup path so the instance reports ready before upstreams answer.
+    urls = [TELEGRAM_BASE_URL, TODOIST_BASE_URL]
+    if settings.transcribe_provider == "gemini" and settings.gemini_api_key:
+        urls.append(GEMINI_BASE_URL)
+    started = time.time()
+    warmed = prewarm_http_client(urls)
+    try:
+        _resolve_parent_id(settings)
+    except TodoistServiceError as exc:
+        logger.warning("startup_parent_resolve_failed", extra={"error": exc.user_message})
+    logger.info(
+        "startup_prewarmed",
+        extra={"hosts": warmed, "duration_ms": round((time.time() - started) * 1000)},
+    )
 
 
 app = FastAPI(title="Gatchan Webhook", lifespan=lifespan)
+app.include_router(debug_router)
 
 
 @app.exception_handler(RequestValidationError)
@@ -94,6 +291,56 @@ def _append_file_url(description: str, file_url: str) -> str:
     return f"{description}\nfile_url={file_url}"
 
 
+def _upload_attachment(
+    file_url: str,
+    file_name: Optional[str],
+    content_type: Optional[str],
+    api_token: str,
+    client: Any,
+    request_id: str,
+) -> Optional[dict[str, Any]]:
+    # Pipes the Telegram download into Todoist's uploads endpoint; None falls back to the URL line.
+    try:
+        with TelegramFileStream(file_url) as stream:
+            uploaded = upload_file(
+                stream,
+                file_name or stream.file_name,
+                api_token,
+                content_type=content_type,
+                client=client,
+            )
+    except Exception as exc:
+        logger.warning("todoist_upload_failed", extra={"request_id": request_id, "error": str(exc)})
+        return None
+    logger.info(
+        "todoist_upload_done",
+        extra={"request_id": request_id, "file_name": uploaded.get("file_name"), "bytes": stream.bytes_read},
+    )
+    return uploaded
+
+
+def _attach_uploads(
+    task_id: str,
+    attachments: list[dict[str, Any]],
+    api_token: str,
+    client: Any,
+    request_id: str,
+) -> None:
+    for attachment in attachments:
+        try:
+            with span("attach"):
+                add_task_comment(
+                    task_id,
+                    str(attachment.get("file_name") or "Attachment"),
+                    api_token,
+                    attachment=attachment,
+                    client=client,
+                )
+        except TodoistServiceError as exc:
+            # The task already exists; a missing attachment is not worth a redelivery.
+            logger.warning("todoist_attach_failed", extra={"request_id": request_id, "error": exc.user_message})
+
+
 def _extract_photo_file_id(message: Optional[TelegramMessage]) -> Optional[str]:
     if not message or not message.photo:
         return None
@@ -131,23 +378,347 @@ def _should_transcribe(message: Optional[TelegramMessage]) -> bool:
     return bool(message.voice or message.audio)
 
 
-def _is_duplicate_update(update_id: int, *, now: Optional[float] = None) -> bool:
+def _get_dedupe_store(settings: Settings) -> DedupeRing:
+    global _dedupe_store
+    with _dedupe_lock:
+        if _dedupe_store is None and settings.shared_state_dir:
+            from app.shared_state import SharedDedupeRing
+
+            _dedupe_store = SharedDedupeRing(
+                Path(settings.shared_state_dir) / "dedupe.bin",
+                settings.dedupe_max_items,
+                DEDUPE_TTL_SECONDS,
+            )
+        elif _dedupe_store is None:
+            _dedupe_store = DedupeRing(settings.dedupe_max_items, DEDUPE_TTL_SECONDS)
+        return _dedupe_store
+
+
+def _is_duplicate_update(update_id: int, settings: Settings, *, now: Optional[float] = None) -> bool:
     timestamp = now if now is not None else time.time()
-    expired_before = timestamp - DEDUPE_TTL_SECONDS
+    return _get_dedupe_store(settings).check_and_add(update_id, timestamp)
 
-    while _dedupe_store:
-        _, stored_at = next(iter(_dedupe_store.items()))
-        if stored_at >= expired_before:
-            break
-        _dedupe_store.popitem(last=False)
 
-    if update_id in _dedupe_store:
-        return True
+def _forget_update(update_id: int) -> None:
+    if _dedupe_store is not None:
+        _dedupe_store.discard(update_id)
+
+
+def _get_bulkhead(settings: Settings) -> Bulkhead:
+    global _bulkhead
+    with _bulkhead_lock:
+        if _bulkhead is None:
+            timeout = settings.bulkhead_acquire_timeout_seconds
+            waiting = settings.bulkhead_max_waiting
+            _bulkhead = Bulkhead(
+                {
+                    WORK_CLASS_TEXT: Lane(settings.bulkhead_text_limit, 0, waiting, timeout),
+                    WORK_CLASS_FEEDBACK: Lane(settings.bulkhead_feedback_limit, 1, waiting, timeout),
+                    WORK_CLASS_MEDIA: Lane(settings.bulkhead_media_limit, 2, waiting, timeout),
+                    WORK_CLASS_TRANSCRIPTION: Lane(
+                        settings.bulkhead_transcription_limit,
+                        3,
+                        settings.bulkhead_transcription_max_waiting,
+                        timeout,
+                    ),
+                },
+                shared_limit=settings.bulkhead_shared_limit,
+            )
+        return _bulkhead
+
+
+def _busy_response(update_id: int, request_id: str, work_class: str) -> JSONResponse:
+    # Forget the update so Telegram's redelivery is processed instead of deduped.
+    _forget_update(update_id)
+    logger.warning(
+        "webhook_busy",
+        extra={"request_id": request_id, "update_id": update_id, "work_class": work_class},
+    )
+    return error_response("Service busy", status_code=503, meta={"request_id": request_id})
+
+
+def _resolve_parent_id(settings: Settings, tenant: Optional[TenantSession] = None) -> str:
+    # ensure_todo_later_task also moves the parent's due date to today, so once per day
+    # per instance is enough; failed writes drop the entry to force a fresh lookup.
+    task_name = tenant.tenant.todo_later_task_name if tenant is not None else settings.todo_later_task_name
+    cache_key = tenant.parent_cache_key if tenant is not None else task_name
+    today = date.today().toordinal()
+    with tenant.parent_lock if tenant is not None else _parent_lock:
+        cache = _get_parent_cache(settings)
+        cached = cache.get(cache_key)
+        if cached and cached[1] == today:
+            return cached[0]
+        replica = _get_replica(settings) if tenant is None else None
+        if replica is not None:
+            parent_id = replica.ensure_parent()
+        elif tenant is not None:
+            parent_id = ensure_todo_later_task(task_name, tenant.tenant.todoist_api_token, client=tenant.client)
+        else:
+            parent_id = ensure_todo_later_task(task_name, settings.todoist_api_token.get_secret_value())
+        cache[cache_key] = (parent_id, today)
+        return parent_id
+
+
+def _get_parent_cache(settings: Settings) -> MutableMapping[str, Any]:
+    # Worker processes started by app.serve share the cache through SHARED_STATE_DIR.
+    global _shared_parent_cache
+    if not settings.shared_state_dir:
+        return _parent_cache
+    if _shared_parent_cache is None:
+        from app.shared_state import SharedMap
+
+        _shared_parent_cache = SharedMap(Path(settings.shared_state_dir) / "parent_cache.bin")
+    return _shared_parent_cache
+
+
+def _get_replica(settings: Settings) -> Optional[TodoistReplica]:
+    global _replica
+    if not settings.todoist_replica_enabled:
+        return None
+    with _replica_lock:
+        if _replica is None:
+            _replica = TodoistReplica(
+                settings.todo_later_task_name,
+                settings.todoist_api_token.get_secret_value(),
+                path=settings.todoist_replica_path,
+                sync_interval=settings.todoist_replica_sync_interval_seconds,
+            )
+        return _replica
+
+
+def _cleanup_completed(settings: Settings, parent_id: str, tenant: Optional[TenantSession] = None) -> int:
+    if tenant is not None:
+        return cleanup_completed_subtasks(
+            parent_id,
+            tenant.tenant.todoist_api_token,
+            older_than_days=settings.todoist_cleanup_days,
+            checkpoint=_cleanup_checkpoints,
+            client=tenant.client,
+        )
+    replica = _get_replica(settings)
+    if replica is not None:
+        return replica.cleanup_completed(
+            older_than_days=settings.todoist_cleanup_days,
+            checkpoint=_cleanup_checkpoints,
+        )
+    return cleanup_completed_subtasks(
+        parent_id,
+        settings.todoist_api_token.get_secret_value(),
+        older_than_days=settings.todoist_cleanup_days,
+        checkpoint=_cleanup_checkpoints,
+    )
+
+
+def _get_capture_index(settings: Settings) -> Optional[CaptureIndex]:
+    global _capture_index
+    if settings.capture_dedupe_mode == "off":
+        return None
+    with _capture_index_lock:
+        if _capture_index is None:
+            _capture_index = CaptureIndex(
+                settings.capture_dedupe_window_seconds,
+                settings.capture_dedupe_max_items,
+            )
+        return _capture_index
+
+
+def _get_message_index(settings: Settings) -> Optional[MessageIndex]:
+    global _message_index
+    if settings.edit_index_max_items <= 0:
+        return None
+    with _message_index_lock:
+        if _message_index is None:
+            _message_index = MessageIndex(settings.edit_index_max_items, settings.edit_index_path)
+        return _message_index
+
+
+def _apply_edit(
+    update: TelegramUpdate,
+    entry: IndexedMessage,
+    settings: Settings,
+    request_id: str,
+    api_token: str,
+    client: Any,
+) -> JSONResponse:
+    # An edit rewrites the task it created: one update call, no create and no reply. When the
+    # content is a transcript or file title, the edited caption goes into the description instead.
+    content = normalize_update(update)
+    if content in {UNSUPPORTED_MESSAGE_PROMPT, FORWARDED_EMPTY_PROMPT}:
+        return success_response(
+            WebhookAck(received=True, normalized_text=content).model_dump(),
+            meta={"request_id": request_id},
+        )
+    try:
+        with _get_bulkhead(settings).slot(WORK_CLASS_TEXT), span("edit"):
+            if entry.from_text:
+                update_task_content(entry.task_id, content, api_token, client=client)
+            else:
+                task = get_task(entry.task_id, api_token, client=client)
+                caption = None if content in MEDIA_ONLY_PROMPTS else content
+                description = _with_caption(str(task.get("description") or ""), caption)
+                update_task_description(entry.task_id, description, api_token, client=client)
+    except BulkheadFullError as exc:
+        return _busy_response(update.update_id, request_id, exc.work_class)
+    except TodoistServiceError as exc:
+        logger.warning("todoist_edit_failed", extra={"request_id": request_id, "error": exc.user_message})
+        return error_response(exc.user_message, status_code=502, meta={"request_id": request_id})
+    logger.info(
+        "capture_edited",
+        extra={"request_id": request_id, "update_id": update.update_id, "task_id": entry.task_id},
+    )
+    return success_response(
+        WebhookAck(received=True, normalized_text=content).model_dump(),
+        meta={"request_id": request_id},
+    )
+
+
+def _with_caption(description: str, caption: Optional[str]) -> str:
+    # The caption line is always written last, so an earlier edit is replaced rather than appended to.
+    base = description.split("\ncaption=", 1)[0]
+    return f"{base}\ncaption={caption}" if caption else base
+
+
+def _forget_parent_id(settings: Settings, tenant: Optional[TenantSession] = None) -> None:
+    if tenant is not None:
+        with tenant.parent_lock:
+            _get_parent_cache(settings).pop(tenant.parent_cache_key, None)
+        return
+    with _parent_lock:
+        _get_parent_cache(settings).pop(settings.todo_later_task_name, None)
+
+
+def _get_tenant_registry(settings: Settings) -> Optional[TenantRegistry]:
+    global _tenant_registry, _tenant_pool
+    if not settings.tenant_db_path:
+        return None
+    with _tenant_lock:
+        if _tenant_registry is None:
+            _tenant_registry = TenantRegistry(
+                settings.tenant_db_path,
+                reload_interval_seconds=settings.tenant_reload_interval_seconds,
+            )
+            _tenant_pool = TenantPool(
+                max_in_flight=settings.tenant_max_in_flight,
+                captures_per_minute=settings.tenant_captures_per_minute,
+                burst=settings.tenant_burst,
+            )
+        return _tenant_registry
+
+
+def _resolve_tenant(message: Optional[TelegramMessage], settings: Settings) -> Optional[TenantSession]:
+    # Ids without a registry entry keep using the account configured in Settings.
+    registry = _get_tenant_registry(settings)
+    if registry is None or message is None:
+        return None
+    tenant = registry.lookup(
+        message.chat.id if message.chat else None,
+        message.from_user.id if message.from_user else None,
+    )
+    if tenant is None or _tenant_pool is None:
+        return None
+    return _tenant_pool.session(tenant)
+
+
+def _get_admission(settings: Settings) -> AdmissionController:
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            _admission = AdmissionController(
+                settings.admission_max_in_flight,
+                settings.admission_max_queue_depth,
+                settings.admission_latency_target_seconds,
+                min_in_flight=settings.admission_min_in_flight,
+            )
+        return _admission
+
+
+def _get_scheduler(settings: Settings) -> ChatScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ChatScheduler(
+                settings.chat_scheduler_workers,
+                max_in_flight_per_chat=settings.chat_max_in_flight,
+            )
+        return _scheduler
+
+
+async def _run_for_chat(
+    settings: Settings,
+    message: Optional[TelegramMessage],
+    update_id: int,
+    work: Callable[[], T],
+) -> T:
+    future = _get_scheduler(settings).submit(_chat_key(message, update_id), update_id, work)
+    return await asyncio.wrap_future(future)
 
-    _dedupe_store[update_id] = timestamp
-    if len(_dedupe_store) > DEDUPE_MAX_ITEMS:
-        _dedupe_store.popitem(last=False)
-    return False
+
+def _chat_key(message: Optional[TelegramMessage], update_id: int) -> object:
+    # Updates from one chat run in update_id order; chat-less updates get their own shard.
+    return message.chat.id if message and message.chat else f"update:{update_id}"
+
+
+def _update_message(update: TelegramUpdate) -> Optional[TelegramMessage]:
+    return update.message or update.edited_message or update.channel_post or update.edited_channel_post
+
+
+def _get_spool(settings: Settings) -> Optional[UpdateSpool]:
+    global _spool
+    if not settings.shutdown_spool_path:
+        return None
+    with _spool_lock:
+        if _spool is None:
+            _spool = UpdateSpool(settings.shutdown_spool_path)
+        return _spool
+
+
+def _replay_spool(settings: Settings) -> int:
+    spool = _get_spool(settings)
+    if spool is None:
+        return 0
+    replayed = 0
+    for payload in spool.take():
+        try:
+            update = TelegramUpdate.model_validate(payload)
+        except ValidationError:
+            logger.warning("spool_update_invalid")
+            continue
+        if _is_duplicate_update(update.update_id, settings):
+            continue
+        message = _update_message(update)
+        request_id = str(uuid4())
+        _get_scheduler(settings).submit(
+            _chat_key(message, update.update_id),
+            update.update_id,
+            lambda update=update, message=message, request_id=request_id: _process_or_defer(
+                update, message, settings, request_id
+            ),
+        )
+        replayed += 1
+    logger.info("spool_replayed", extra={"updates": replayed})
+    return replayed
+
+
+def _process_or_defer(
+    update: TelegramUpdate,
+    message: Optional[TelegramMessage],
+    settings: Settings,
+    request_id: str,
+) -> JSONResponse:
+    if _drain_deadline is None or time.time() < _drain_deadline:
+        with get_profiler().request(), span("process"):
+            return _process_update(update, message, settings, request_id)
+    spool = _get_spool(settings)
+    if spool is None:
+        # Nowhere to keep it: let Telegram redeliver to the next instance.
+        _forget_update(update.update_id)
+        logger.warning("webhook_deferred", extra={"request_id": request_id, "update_id": update.update_id})
+        return error_response("Service shutting down", status_code=503, meta={"request_id": request_id})
+    # Replay runs the dedupe check again; with a shared ring the mark would outlive this instance.
+    _forget_update(update.update_id)
+    spool.append(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+    logger.info("webhook_spooled", extra={"request_id": request_id, "update_id": update.update_id})
+    return success_response({"received": True, "deferred": True}, meta={"request_id": request_id})
 
 
 def _is_whitelisted(message: Optional[TelegramMessage], settings: Settings) -> bool:
@@ -169,9 +740,29 @@ def health() -> JSONResponse:
     return success_response({"status": "ok"})
 
 
+@app.get("/metrics")
+def metrics() -> JSONResponse:
+    return success_response(_metrics_snapshot())
+
+
+def _metrics_snapshot() -> dict:
+    return {
+        "admission": _admission.stats() if _admission is not None else None,
+        "scheduler": _scheduler.stats() if _scheduler is not None else None,
+        "bulkhead": _bulkhead.stats() if _bulkhead is not None else None,
+        "feedback": _feedback.stats() if _feedback is not None else None,
+        "http": http_client_stats(),
+        "tenants": _tenant_pool.stats() if _tenant_pool is not None else None,
+        "edits": _message_index.stats() if _message_index is not None else None,
+        "tracing": tracing_stats(),
+        "logging": log_filter_stats(),
+    }
+
+
 @app.post("/webhook")
-def webhook(
+async def webhook(
     update: TelegramUpdate,
+    request: Request,
     settings: Settings = Depends(get_settings),
     telegram_secret: Optional[str] = Header(default=None, alias="X-Telegram-Bot-Api-Secret-Token"),
 ) -> JSONResponse:
@@ -180,33 +771,128 @@ def webhook(
         return error_response("Unauthorized", status_code=401)
 
     request_id = str(uuid4())
-    message = update.message or update.edited_message or update.channel_post or update.edited_channel_post
-    if not _is_whitelisted(message, settings):
+    message = _update_message(update)
+    flight_recorder = get_flight_recorder(settings.trace_buffer_size)
+    trace = flight_recorder.start(request_id, update.update_id, message.chat.id if message and message.chat else None)
+    recorder = _get_recorder(settings)
+    started = time.time()
+    status = 500
+    try:
+        with span("webhook"):
+            response = await _handle_update(update, settings, request_id)
+        status = response.status_code
+    finally:
+        flight_recorder.finish(trace, status)
+    if recorder is not None and recorder.sampled():
+        recorder.record(
+            await request.json(),
+            status=response.status_code,
+            duration_ms=(time.time() - started) * 1000,
+            request_id=request_id,
+        )
+    return response
+
+
+async def _handle_update(update: TelegramUpdate, settings: Settings, request_id: str) -> JSONResponse:
+    message = _update_message(update)
+    if not _is_whitelisted(message, settings) and _resolve_tenant(message, settings) is None:
         metadata = {
             "request_id": request_id,
             "update_id": update.update_id,
             **_message_metadata(message),
         }
-        logger.info("webhook_denied %s", json.dumps(metadata, separators=(",", ":"), sort_keys=True))
+        # chat_id/from_id let the log filter collapse one sender's repeated denials.
+        logger.info(
+            "webhook_denied %s",
+            json.dumps(metadata, separators=(",", ":"), sort_keys=True),
+            extra={"chat_id": metadata.get("chat_id"), "from_id": metadata.get("from_id")},
+        )
         if settings.telegram_whitelist_reply:
-            _send_telegram_feedback(
-                message,
-                "未授权：请联系管理员开通权限。",
-                settings.telegram_bot_token.get_secret_value(),
-                request_id,
-            )
+            _send_telegram_feedback(message, "未授权：请联系管理员开通权限。", settings, request_id)
         return success_response({"received": True, "authorized": False}, meta={"request_id": request_id})
 
-    if _is_duplicate_update(update.update_id):
-        logger.info(
-            "webhook_duplicate",
-            extra={"request_id": request_id, "update_id": update.update_id},
+    # Shedding happens before the dedupe marker is set, so a shed update is processed in
+    # full when Telegram redelivers it.
+    admission = _get_admission(settings)
+    try:
+        admitted_at = admission.admit(_get_scheduler(settings).queue_depth())
+    except OverloadedError as exc:
+        logger.warning(
+            "webhook_shed",
+            extra={"request_id": request_id, "update_id": update.update_id, "reason": exc.reason},
         )
-        return success_response(
-            {"received": True, "duplicate": True},
+        return error_response(
+            "Service overloaded",
+            status_code=503,
             meta={"request_id": request_id},
+            headers={"Retry-After": str(settings.admission_retry_after_seconds)},
         )
+    try:
+        with span("dedupe"):
+            duplicate = _is_duplicate_update(update.update_id, settings)
+        if duplicate:
+            logger.info(
+                "webhook_duplicate",
+                extra={"request_id": request_id, "update_id": update.update_id},
+            )
+            return success_response(
+                {"received": True, "duplicate": True},
+                meta={"request_id": request_id},
+            )
+
+        return await _run_for_chat(
+            settings,
+            message,
+            update.update_id,
+            lambda: _process_or_defer(update, message, settings, request_id),
+        )
+    finally:
+        admission.release(admitted_at)
+
+
+def _get_recorder(settings: Settings) -> Optional[TrafficRecorder]:
+    global _recorder
+    if not settings.traffic_record_path:
+        return None
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = TrafficRecorder(
+                settings.traffic_record_path,
+                sample_rate=settings.traffic_record_sample_rate,
+                max_bytes=settings.traffic_record_max_bytes,
+                backups=settings.traffic_record_backups,
+                text_chars=settings.traffic_record_text_chars if settings.traffic_record_text_chars >= 0 else None,
+                secrets=[
+                    settings.telegram_bot_token.get_secret_value(),
+                    settings.telegram_webhook_secret.get_secret_value(),
+                    settings.todoist_api_token.get_secret_value(),
+                ],
+            )
+        return _recorder
 
+
+def _process_update(
+    update: TelegramUpdate,
+    message: Optional[TelegramMessage],
+    settings: Settings,
+    request_id: str,
+) -> JSONResponse:
+    bulkhead = _get_bulkhead(settings)
+    tenant = _resolve_tenant(message, settings)
+    todoist_token = (
+        tenant.tenant.todoist_api_token if tenant is not None else settings.todoist_api_token.get_secret_value()
+    )
+    todoist_client = tenant.client if tenant is not None else None
+    message_index = _get_message_index(settings)
+    edited = update.edited_message or update.edited_channel_post
+    if message_index is not None and edited is not None and edited.chat is not None:
+        # Edits of messages we never captured (or have since evicted) are captured as new.
+        entry = message_index.lookup(edited.chat.id, edited.message_id)
+        if entry is not None:
+            return _apply_edit(update, entry, settings, request_id, todoist_token, todoist_client)
+    # The budget counts captures; an edit is one task update and does not spend it.
+    if tenant is not None and not tenant.try_acquire():
+        return _busy_response(update.update_id, request_id, "tenant")
     audio_info = _extract_audio_info(message)
     transcript: Optional[str] = None
     if audio_info and _should_transcribe(message):
@@ -214,7 +900,7 @@ def webhook(
             _send_telegram_feedback(
                 message,
                 "转写失败：未配置转写服务。",
-                settings.telegram_bot_token.get_secret_value(),
+                settings,
                 request_id,
             )
             return success_response(
@@ -223,18 +909,21 @@ def webhook(
             )
         file_id, mime_type = audio_info
         try:
-            file_url = get_telegram_file_url(file_id, settings.telegram_bot_token.get_secret_value())
-            audio_bytes = download_telegram_file(file_url)
-            transcript = transcribe_audio_with_gemini(
-                audio_bytes,
-                mime_type,
-                settings.gemini_api_key.get_secret_value(),
-            )
+            with bulkhead.slot(WORK_CLASS_TRANSCRIPTION), span("transcription"):
+                file_url = get_telegram_file_url(file_id, settings.telegram_bot_token.get_secret_value())
+                audio_bytes = download_telegram_file(file_url)
+                transcript = transcribe_audio_with_gemini(
+                    audio_bytes,
+                    mime_type,
+                    settings.gemini_api_key.get_secret_value(),
+                )
+        except BulkheadFullError as exc:
+            return _busy_response(update.update_id, request_id, exc.work_class)
         except TranscriptionError as exc:
             _send_telegram_feedback(
                 message,
                 f"转写失败：{exc.user_message}",
-                settings.telegram_bot_token.get_secret_value(),
+                settings,
                 request_id,
             )
             return success_response(
@@ -246,7 +935,7 @@ def webhook(
             _send_telegram_feedback(
                 message,
                 "转写失败：服务不可用。",
-                settings.telegram_bot_token.get_secret_value(),
+                settings,
                 request_id,
             )
             return success_response(
@@ -254,15 +943,6 @@ def webhook(
                 meta={"request_id": request_id},
             )
 
-    document_info = _extract_document_info(message)
-    document_url: Optional[str] = None
-    if document_info:
-        file_id, file_name = document_info
-        try:
-            document_url = get_telegram_file_url(file_id, settings.telegram_bot_token.get_secret_value())
-        except Exception as exc:  # pragma: no cover - non-critical attachment
-            logger.warning("telegram_document_fetch_failed", extra={"request_id": request_id, "error": str(exc)})
-
     normalized_text = transcript or normalize_update(update)
     metadata = {
         "request_id": request_id,
@@ -271,6 +951,61 @@ def webhook(
     }
     logger.info("webhook_received %s", json.dumps(metadata, separators=(",", ":"), sort_keys=True))
 
+    capture_index = _get_capture_index(settings)
+    keys: list[str] = []
+    duplicate: Optional[CapturedTask] = None
+    if capture_index is not None and normalized_text not in {UNSUPPORTED_MESSAGE_PROMPT, FORWARDED_EMPTY_PROMPT}:
+        keys = capture_keys(message, normalized_text, content=settings.capture_dedupe_content)
+        if tenant is not None:
+            keys = [f"tenant:{tenant.tenant.tenant_id}:{key}" for key in keys]
+        duplicate = capture_index.lookup(keys, time.time())
+    if duplicate is not None and settings.capture_dedupe_mode == "skip":
+        logger.info(
+            "capture_duplicate",
+            extra={"request_id": request_id, "update_id": update.update_id, "task_id": duplicate.task_id},
+        )
+        existing_text = "已存在 Todoist 任务。"
+        if duplicate.task_url:
+            existing_text = f"已存在 Todoist 任务：{duplicate.task_url}"
+        _send_telegram_feedback(
+            message,
+            existing_text,
+            settings,
+            request_id,
+        )
+        return success_response(
+            WebhookAck(
+                received=True,
+                normalized_text=normalized_text,
+                duplicate_of=duplicate.task_id,
+            ).model_dump(),
+            meta={"request_id": request_id},
+        )
+
+    document_info = _extract_document_info(message)
+    document_url: Optional[str] = None
+    document_uploaded = False
+    attachments: list[dict[str, Any]] = []
+    if document_info:
+        file_id, file_name = document_info
+        try:
+            with bulkhead.slot(WORK_CLASS_MEDIA), span("media"):
+                document_url = get_telegram_file_url(file_id, settings.telegram_bot_token.get_secret_value())
+                if settings.todoist_upload_attachments:
+                    uploaded = _upload_attachment(
+                        document_url,
+                        file_name,
+                        message.document.mime_type if message and message.document else None,
+                        todoist_token,
+                        todoist_client,
+                        request_id,
+                    )
+                    if uploaded is not None:
+                        attachments.append(uploaded)
+                        document_uploaded = True
+        except Exception as exc:  # pragma: no cover - non-critical attachment
+            logger.warning("telegram_document_fetch_failed", extra={"request_id": request_id, "error": str(exc)})
+
     content = normalized_text
     if normalized_text in {UNSUPPORTED_MESSAGE_PROMPT, FORWARDED_EMPTY_PROMPT}:
         content = f"[Unsupported] {normalized_text}"
@@ -278,71 +1013,120 @@ def webhook(
     photo_file_id = _extract_photo_file_id(message)
     if photo_file_id:
         try:
-            image_url = get_telegram_file_url(
-                photo_file_id,
-                settings.telegram_bot_token.get_secret_value(),
-            )
-            description = _append_image_url(description, image_url)
+            with bulkhead.slot(WORK_CLASS_MEDIA), span("media"):
+                image_url = get_telegram_file_url(
+                    photo_file_id,
+                    settings.telegram_bot_token.get_secret_value(),
+                )
+                uploaded = (
+                    _upload_attachment(image_url, None, "image/jpeg", todoist_token, todoist_client, request_id)
+                    if settings.todoist_upload_attachments
+                    else None
+                )
+            if uploaded is not None:
+                attachments.append(uploaded)
+            else:
+                description = _append_image_url(description, image_url)
         except Exception as exc:  # pragma: no cover - non-critical attachment
             logger.warning("telegram_file_fetch_failed", extra={"request_id": request_id, "error": str(exc)})
     if document_url:
-        description = _append_file_url(description, document_url)
+        if not document_uploaded:
+            description = _append_file_url(description, document_url)
         if normalized_text == DOCUMENT_ONLY_PROMPT and document_info:
             _, file_name = document_info
             if file_name:
                 content = f"File from Telegram: {file_name}"
 
     try:
-        parent_id = ensure_todo_later_task(
-            settings.todo_later_task_name,
-            settings.todoist_api_token.get_secret_value(),
-        )
-        try:
-            cleanup_completed_subtasks(
-                parent_id,
-                settings.todoist_api_token.get_secret_value(),
-                older_than_days=settings.todoist_cleanup_days,
-            )
-        except TodoistServiceError as exc:
-            logger.warning("todoist_cleanup_failed", extra={"request_id": request_id, "error": exc.user_message})
-        created = create_subtask(
-            content,
-            parent_id,
-            settings.todoist_api_token.get_secret_value(),
-            description=description,
-        )
+        with bulkhead.slot(WORK_CLASS_TEXT), span("capture"):
+            if duplicate is not None:
+                add_task_comment(
+                    duplicate.task_id,
+                    f"{content}\n{description}",
+                    todoist_token,
+                    client=todoist_client,
+                )
+                created = {"id": duplicate.task_id, "url": duplicate.task_url}
+            else:
+                with span("parent"):
+                    parent_id = _resolve_parent_id(settings, tenant)
+                try:
+                    with span("cleanup"):
+                        _cleanup_completed(settings, parent_id, tenant)
+                except TodoistServiceError as exc:
+                    logger.warning(
+                        "todoist_cleanup_failed",
+                        extra={"request_id": request_id, "error": exc.user_message},
+                    )
+                created = create_subtask(
+                    content,
+                    parent_id,
+                    todoist_token,
+                    description=description,
+                    client=todoist_client,
+                )
+                replica = _get_replica(settings) if tenant is None else None
+                if replica is not None and isinstance(created, dict):
+                    replica.record(created)
+    except BulkheadFullError as exc:
+        return _busy_response(update.update_id, request_id, exc.work_class)
     except TodoistServiceError as exc:
         logger.warning("todoist_failed", extra={"request_id": request_id, "error": exc.user_message})
+        _forget_parent_id(settings, tenant)
         _send_telegram_feedback(
             message,
             f"创建失败：{exc.user_message}",
-            settings.telegram_bot_token.get_secret_value(),
+            settings,
             request_id,
         )
         return error_response(exc.user_message, status_code=502, meta={"request_id": request_id})
     except Exception as exc:  # pragma: no cover - safety net
         logger.error("todoist_unexpected", exc_info=exc, extra={"request_id": request_id})
+        _forget_parent_id(settings, tenant)
         _send_telegram_feedback(
             message,
             "创建失败：Todoist unavailable",
-            settings.telegram_bot_token.get_secret_value(),
+            settings,
             request_id,
         )
         return error_response("Todoist unavailable", status_code=500, meta={"request_id": request_id})
 
     task_url = created.get("url") if isinstance(created, dict) else None
-    completion_text = "已创建 Todoist 任务。"
-    if task_url:
-        completion_text = f"已创建 Todoist 任务：{task_url}"
-    _send_telegram_feedback(
-        message,
-        completion_text,
-        settings.telegram_bot_token.get_secret_value(),
-        request_id,
-    )
+    if attachments and isinstance(created, dict) and created.get("id"):
+        _attach_uploads(str(created["id"]), attachments, todoist_token, todoist_client, request_id)
+    if (
+        message_index is not None
+        and duplicate is None
+        and message is not None
+        and message.chat is not None
+        and isinstance(created, dict)
+        and created.get("id")
+    ):
+        message_index.remember(
+            message.chat.id,
+            message.message_id,
+            str(created["id"]),
+            from_text=transcript is None and content == normalized_text and content not in MEDIA_ONLY_PROMPTS,
+        )
+    if capture_index is not None and keys and duplicate is None and isinstance(created, dict) and created.get("id"):
+        capture_index.remember(keys, CapturedTask(str(created["id"]), task_url, time.time()))
+    if duplicate is not None:
+        _send_telegram_feedback(
+            message,
+            f"已附加到 Todoist 任务：{task_url}" if task_url else "已附加到 Todoist 任务。",
+            settings,
+            request_id,
+        )
+    elif message and message.chat:
+        with span("feedback"):
+            _get_feedback(settings).created(message.chat.id, task_url, request_id=request_id)
 
     return success_response(
-        WebhookAck(received=True, normalized_text=normalized_text).model_dump(),
+        WebhookAck(
+            received=True,
+            normalized_text=normalized_text,
+            duplicate_of=duplicate.task_id if duplicate is not None else None,
+        ).model_dump(),
         meta={"request_id": request_id},
     )
 
@@ -350,12 +1134,33 @@ def webhook(
 def _send_telegram_feedback(
     message: Optional[TelegramMessage],
     text: str,
-    api_token: str,
+    settings: Settings,
     request_id: str,
 ) -> None:
     if not message or not message.chat:
         return
-    try:
-        send_telegram_message(message.chat.id, text, api_token)
-    except Exception as exc:  # pragma: no cover - non-critical feedback
-        logger.warning("telegram_feedback_failed", extra={"request_id": request_id, "error": str(exc)})
+    with span("feedback"):
+        _get_feedback(settings).notify(message.chat.id, text, request_id=request_id)
+
+
+def _get_feedback(settings: Settings) -> FeedbackAggregator:
+    global _feedback
+    with _feedback_lock:
+        if _feedback is None:
+            _feedback = FeedbackAggregator(
+                lambda chat_id, text, message_id: _deliver_feedback(settings, chat_id, text, message_id),
+                window_seconds=settings.feedback_window_seconds,
+                rate_per_second=settings.feedback_rate_per_second,
+                burst=settings.feedback_burst,
+                workers=settings.feedback_workers,
+            )
+        return _feedback
+
+
+def _deliver_feedback(settings: Settings, chat_id: int, text: str, message_id: Optional[int]) -> Optional[int]:
+    api_token = settings.telegram_bot_token.get_secret_value()
+    with _get_bulkhead(settings).slot(WORK_CLASS_FEEDBACK):
+        if message_id is None:
+            return send_telegram_message(chat_id, text, api_token)
+        edit_telegram_message(chat_id, message_id, text, api_token)
+        return message_id
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    import sqlite3
+
+logger = logging.getLogger("gatchan")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS message_tasks (
+        chat_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        task_id TEXT NOT NULL,
+        from_text INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (chat_id, message_id)
+    )
+"""
+
+
+@dataclass(frozen=True)
+class IndexedMessage:
+    task_id: str
+    # False when the task content is a transcript or file title rather than the message text;
+    # edits then must not overwrite it.
+    from_text: bool = True
+
+
+class MessageIndex:
+    # Remembers which Todoist task each captured Telegram message became, so an edit can
+    # update that task instead of creating another one. The newest max_items messages are
+    # kept in an LRU; with a path they are also written to SQLite, which survives restarts
+    # and lets worker processes see each other's captures on a memory miss.
+    def __init__(self, max_items: int, path: Optional[str] = None) -> None:
+        self._max_items = max_items
+        self._entries: "OrderedDict[tuple[int, int], IndexedMessage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional["sqlite3.Connection"] = None
+        self.hits = 0
+        self.misses = 0
+        if path:
+            import sqlite3
+
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            with self._db:
+                self._db.execute(SCHEMA)
+            rows = self._db.execute(
+                "SELECT chat_id, message_id, task_id, from_text FROM message_tasks ORDER BY rowid DESC LIMIT ?",
+                (max_items,),
+            ).fetchall()
+            for chat_id, message_id, task_id, from_text in reversed(rows):
+                self._entries[(chat_id, message_id)] = IndexedMessage(task_id, bool(from_text))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def lookup(self, chat_id: int, message_id: int) -> Optional[IndexedMessage]:
+        key = (chat_id, message_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                entry = self._load(key)
+                if entry is not None:
+                    self._entries[key] = entry
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def remember(self, chat_id: int, message_id: int, task_id: str, *, from_text: bool = True) -> None:
+        key = (chat_id, message_id)
+        entry = IndexedMessage(task_id, from_text)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self._max_items:
+                self._entries.popitem(last=False)
+            if self._db is not None:
+                self._store(key, entry)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _load(self, key: tuple[int, int]) -> Optional[IndexedMessage]:
+        import sqlite3
+
+        try:
+            row = self._db.execute(
+                "SELECT task_id, from_text FROM message_tasks WHERE chat_id = ? AND message_id = ?",
+                key,
+            ).fetchone()
+        except sqlite3.Error as exc:
+            logger.warning("message_index_read_failed", extra={"error": str(exc)})
+            return None
+        return IndexedMessage(row[0], bool(row[1])) if row else None
+
+    def _store(self, key: tuple[int, int], entry: IndexedMessage) -> None:
+        # REPLACE gives the row a fresh rowid, so rowid order is capture order and trimming
+        # keeps the file bounded to the same max_items as memory.
+        import sqlite3
+
+        try:
+            with self._db:
+                cursor = self._db.execute(
+                    "INSERT OR REPLACE INTO message_tasks VALUES (?, ?, ?, ?)", (*key, entry.task_id, entry.from_text)
+                )
+                self._db.execute("DELETE FROM message_tasks WHERE rowid <= ?", (cursor.lastrowid - self._max_items,))
+        except sqlite3.Error as exc:
+            # Memory still has the entry; only a restart would forget it.
+            logger.warning("message_index_write_failed", extra={"error": str(exc)})
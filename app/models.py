@@ -22,6 +22,7 @@ class TelegramEntity(BaseModel):
     offset: int
     length: int
     url: Optional[str] = None
+    language: Optional[str] = None
 
     model_config = ConfigDict(extra="ignore")
 
@@ -101,3 +102,4 @@ class TelegramUpdate(BaseModel):
 class WebhookAck(BaseModel):
     received: bool = True
     normalized_text: Optional[str] = None
+    duplicate_of: Optional[str] = None
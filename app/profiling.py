@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import io
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    import cProfile
+    import pstats
+    import tracemalloc
+
+PROFILE_CPROFILE = "cprofile"
+PROFILE_SAMPLE = "sample"
+PROFILE_MODES = (PROFILE_CPROFILE, PROFILE_SAMPLE)
+MAX_STACK_DEPTH = 64
+
+
+@dataclass(frozen=True)
+class ProfilerBusyError(Exception):
+    mode: str
+
+    def __str__(self) -> str:  # pragma: no cover - defaults to mode
+        return f"a {self.mode} profile is already running"
+
+
+class _Session:
+    def __init__(
+        self,
+        mode: str,
+        requests: Optional[int],
+        deadline: Optional[float],
+        interval_seconds: float,
+        started_at: float,
+    ) -> None:
+        self.mode = mode
+        self.remaining = requests
+        self.requests = requests
+        self.deadline = deadline
+        self.interval_seconds = interval_seconds
+        self.started_at = started_at
+        self.finished_at: Optional[float] = None
+        self.profiled = 0
+        self.active = 0
+        self.stats: Optional[pstats.Stats] = None
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.threads: set[int] = set()
+        self.stop = threading.Event()
+
+
+class _RequestScope:
+    def __init__(self, profiler: "RequestProfiler") -> None:
+        self._profiler = profiler
+        self._session: Optional[_Session] = None
+        self._profile: Optional[cProfile.Profile] = None
+
+    def __enter__(self) -> None:
+        self._session = self._profiler._claim()
+        if self._session is not None and self._session.mode == PROFILE_CPROFILE:
+            import cProfile
+
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler per process. This request runs
+                # unprofiled and hands its claim back for a later one.
+                self._profiler._unclaim(self._session)
+                self._session = None
+                return
+            self._profile = profile
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._session is None:
+            return
+        if self._profile is not None:
+            self._profile.disable()
+        self._profiler._release(self._session, self._profile)
+
+
+class RequestProfiler:
+    # Profiles the next N requests and/or every request started within a time window.
+    # On Python 3.11 each cProfile hooks only the thread that enabled it. From 3.12 the hook
+    # is process-wide and a second concurrent enable() fails, so overlapping requests are
+    # skipped and the one profile also counts whatever other threads run meanwhile. The
+    # sampler reads the profiled threads' stacks from sys._current_frames() on a timer and
+    # costs nothing between samples.
+    def __init__(self, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._session: Optional[_Session] = None
+        self._lock = threading.Lock()
+
+    def start(
+        self,
+        mode: str,
+        *,
+        requests: Optional[int] = None,
+        seconds: Optional[float] = None,
+        interval_seconds: float = 0.005,
+    ) -> dict[str, Any]:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        if requests is None and seconds is None:
+            raise ValueError("Profile needs a request count or a time window")
+        with self._lock:
+            if self._session is not None and self._session.finished_at is None:
+                raise ProfilerBusyError(self._session.mode)
+            now = self._clock()
+            session = _Session(
+                mode,
+                requests,
+                now + seconds if seconds is not None else None,
+                interval_seconds,
+                now,
+            )
+            self._session = session
+        if mode == PROFILE_SAMPLE:
+            threading.Thread(target=self._sample, args=(session,), name="profile-sampler", daemon=True).start()
+        return self.status()
+
+    def stop(self) -> dict[str, Any]:
+        with self._lock:
+            if self._session is not None:
+                self._finish(self._session)
+        return self.status()
+
+    def request(self) -> _RequestScope:
+        return _RequestScope(self)
+
+    def status(self) -> dict[str, Any]:
+        with self._lock:
+            session = self._session
+            if session is None:
+                return {"state": "idle"}
+            self._expire(session)
+            ended = session.finished_at if session.finished_at is not None else self._clock()
+            return {
+                "state": "finished" if session.finished_at is not None else "running",
+                "mode": session.mode,
+                "requests": session.requests,
+                "profiled": session.profiled,
+                "in_progress": session.active,
+                "samples": session.samples,
+                "elapsed_seconds": round(ended - session.started_at, 3),
+            }
+
+    def result(self, output: str, *, limit: int = 50) -> Optional[tuple[bytes, str]]:
+        # Returns (body, media type), or None while the profile is still collecting.
+        with self._lock:
+            session = self._session
+            if session is None:
+                raise LookupError("No profile has been started")
+            self._expire(session)
+            if session.finished_at is None:
+                return None
+            stats = session.stats
+            stacks = dict(session.stacks)
+        if session.mode == PROFILE_SAMPLE:
+            lines = [f"{stack} {count}" for stack, count in sorted(stacks.items(), key=lambda item: -item[1])]
+            return ("\n".join(lines) + "\n").encode("utf-8"), "text/plain"
+        if stats is None:
+            return b"", "text/plain"
+        if output == "pstats":
+            # Same bytes pstats.Stats.dump_stats writes; load with pstats.Stats(path).
+            return marshal.dumps(stats.stats), "application/octet-stream"
+        buffer = io.StringIO()
+        stats.stream = buffer
+        stats.sort_stats("cumulative").print_stats(limit)
+        return buffer.getvalue().encode("utf-8"), "text/plain"
+
+    def _claim(self) -> Optional[_Session]:
+        if self._session is None or self._session.finished_at is not None:
+            return None
+        with self._lock:
+            session = self._session
+            if session is None or session.finished_at is not None:
+                return None
+            self._expire(session)
+            if session.finished_at is not None:
+                return None
+            if session.remaining is not None:
+                if session.remaining <= 0:
+                    return None
+                session.remaining -= 1
+            session.active += 1
+            session.threads.add(threading.get_ident())
+            return session
+
+    def _unclaim(self, session: _Session) -> None:
+        with self._lock:
+            session.threads.discard(threading.get_ident())
+            session.active -= 1
+            if session.remaining is not None and session.finished_at is None:
+                session.remaining += 1
+            self._expire(session)
+
+    def _release(self, session: _Session, profile: Optional[cProfile.Profile]) -> None:
+        with self._lock:
+            if profile is not None:
+                if session.stats is None:
+                    import pstats
+
+                    session.stats = pstats.Stats(profile)
+                else:
+                    session.stats.add(profile)
+            session.threads.discard(threading.get_ident())
+            session.active -= 1
+            session.profiled += 1
+            if session.remaining == 0 and not session.active:
+                self._finish(session)
+            else:
+                self._expire(session)
+
+    def _expire(self, session: _Session) -> None:
+        # A window closes once its deadline passes and the requests it admitted are done.
+        if session.finished_at is None and session.deadline is not None and self._clock() >= session.deadline:
+            session.remaining = 0
+            if not session.active:
+                self._finish(session)
+
+    def _finish(self, session: _Session) -> None:
+        if session.finished_at is None:
+            session.finished_at = self._clock()
+            session.stop.set()
+
+    def _sample(self, session: _Session) -> None:
+        while not session.stop.wait(session.interval_seconds):
+            with self._lock:
+                threads = list(session.threads)
+                self._expire(session)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            collected = [_collapse(frames[ident]) for ident in threads if ident in frames]
+            with self._lock:
+                for stack in collected:
+                    session.stacks[stack] += 1
+                    session.samples += 1
+
+
+def _collapse(frame: Any) -> str:
+    names: list[str] = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{Path(code.co_filename).name}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class MemoryTracker:
+    # Thin wrapper over tracemalloc that also reports growth since the previous snapshot.
+    def __init__(self) -> None:
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        import tracemalloc
+
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10) -> None:
+        import tracemalloc
+
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._previous = None
+
+    def stop(self) -> None:
+        import tracemalloc
+
+        with self._lock:
+            tracemalloc.stop()
+            self._previous = None
+
+    def snapshot(self, limit: int = 20) -> dict[str, Any]:
+        import tracemalloc
+
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                raise LookupError("tracemalloc is not running")
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                    tracemalloc.Filter(False, "<unknown>"),
+                )
+            )
+            previous, self._previous = self._previous, snapshot
+            current, peak = tracemalloc.get_traced_memory()
+        top = [
+            {"location": str(stat.traceback[0]), "size_bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:limit]
+        ]
+        growth = None
+        if previous is not None:
+            growth = [
+                {
+                    "location": str(stat.traceback[0]),
+                    "size_diff_bytes": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                    "size_bytes": stat.size,
+                }
+                for stat in snapshot.compare_to(previous, "lineno")[:limit]
+            ]
+        return {"traced_bytes": current, "peak_bytes": peak, "top": top, "growth": growth}
+
+
+_profiler = RequestProfiler()
+_memory = MemoryTracker()
+
+
+def get_profiler() -> RequestProfiler:
+    return _profiler
+
+
+def get_memory_tracker() -> MemoryTracker:
+    return _memory
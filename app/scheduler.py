@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import contextvars
+import heapq
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(order=True)
+class _Job:
+    order_key: int
+    sequence: int
+    work: Callable[[], Any] = field(compare=False)
+    future: Future = field(compare=False)
+    context: contextvars.Context = field(compare=False)
+
+
+class ChatScheduler:
+    # Work is sharded into one ordered queue per chat. Chats with runnable work sit in
+    # a round-robin ring, so a flooding chat only ever holds `max_in_flight_per_chat`
+    # workers while every other chat keeps getting its turn.
+    def __init__(self, workers: int, *, max_in_flight_per_chat: int = 1) -> None:
+        if workers < 1:
+            raise ValueError("Scheduler needs at least one worker")
+        if max_in_flight_per_chat < 1:
+            raise ValueError("Per-chat in-flight cap must be at least 1")
+        self._worker_count = workers
+        self._max_in_flight = max_in_flight_per_chat
+        self._queues: dict[Hashable, list[_Job]] = {}
+        self._in_flight: dict[Hashable, int] = {}
+        self._ready: deque[Hashable] = deque()
+        self._ready_set: set[Hashable] = set()
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._queued = 0
+        self._closed = False
+
+    def submit(self, chat_key: Hashable, order_key: int, work: Callable[[], T]) -> "Future[T]":
+        future: Future = Future()
+        job = _Job(order_key, next(self._sequence), work, future, contextvars.copy_context())
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Scheduler is shut down")
+            self._start_workers()
+            heapq.heappush(self._queues.setdefault(chat_key, []), job)
+            self._queued += 1
+            self._mark_ready(chat_key)
+            self._condition.notify()
+        return future
+
+    def shutdown(self, *, wait: bool = True, cancel_pending: bool = False) -> int:
+        cancelled = 0
+        with self._condition:
+            self._closed = True
+            if cancel_pending:
+                for queue in self._queues.values():
+                    for job in queue:
+                        if job.future.cancel():
+                            cancelled += 1
+                    self._queued -= len(queue)
+                    queue.clear()
+            self._condition.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+        return cancelled
+
+    def run_pending(self) -> int:
+        # Runs every queued job on the calling thread, chat by chat in queue order, instead of
+        # waiting for a worker to come free. Used at shutdown, when queued work only defers itself.
+        with self._condition:
+            jobs: list[_Job] = []
+            for chat_key in list(self._queues):
+                queue = self._queues[chat_key]
+                jobs.extend(sorted(queue))
+                queue.clear()
+                if chat_key not in self._in_flight:
+                    del self._queues[chat_key]
+            self._queued -= len(jobs)
+            self._ready.clear()
+            self._ready_set.clear()
+            self._condition.notify_all()
+        for job in jobs:
+            _run(job)
+        return len(jobs)
+
+    def queue_depth(self) -> int:
+        # Read without the lock: admission control only needs a recent value.
+        return self._queued
+
+    def stats(self) -> dict[str, int]:
+        with self._condition:
+            return {
+                "workers": self._worker_count,
+                "chats": len(self._queues),
+                "queued": self._queued,
+                "in_flight": sum(self._in_flight.values()),
+            }
+
+    def _start_workers(self) -> None:
+        if self._threads:
+            return
+        for index in range(self._worker_count):
+            thread = threading.Thread(target=self._worker, name=f"chat-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _mark_ready(self, chat_key: Hashable) -> None:
+        if chat_key in self._ready_set:
+            return
+        if not self._queues.get(chat_key):
+            return
+        if self._in_flight.get(chat_key, 0) >= self._max_in_flight:
+            return
+        self._ready.append(chat_key)
+        self._ready_set.add(chat_key)
+
+    def _next_job(self) -> Optional[tuple[Hashable, _Job]]:
+        with self._condition:
+            while not self._ready:
+                if self._closed and not any(self._queues.values()):
+                    return None
+                self._condition.wait()
+            chat_key = self._ready.popleft()
+            self._ready_set.discard(chat_key)
+            job = heapq.heappop(self._queues[chat_key])
+            self._queued -= 1
+            self._in_flight[chat_key] = self._in_flight.get(chat_key, 0) + 1
+            self._mark_ready(chat_key)
+            if self._ready:
+                self._condition.notify()
+            return chat_key, job
+
+    def _finish(self, chat_key: Hashable) -> None:
+        with self._condition:
+            self._in_flight[chat_key] -= 1
+            if not self._in_flight[chat_key]:
+                del self._in_flight[chat_key]
+            if not self._queues.get(chat_key) and chat_key not in self._in_flight:
+                self._queues.pop(chat_key, None)
+            self._mark_ready(chat_key)
+            if self._closed:
+                self._condition.notify_all()
+            else:
+                self._condition.notify()
+
+    def _worker(self) -> None:
+        while True:
+            picked = self._next_job()
+            if picked is None:
+                return
+            chat_key, job = picked
+            try:
+                _run(job)
+            finally:
+                self._finish(chat_key)
+
+
+def _run(job: _Job) -> None:
+    if job.future.set_running_or_notify_cancel():
+        try:
+            job.future.set_result(job.context.run(job.work))
+        except BaseException as exc:  # noqa: BLE001 - surfaced through the future
+            job.future.set_exception(exc)
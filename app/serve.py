@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import shutil
+import sys
+import tempfile
+import time
+from typing import Optional
+
+import uvicorn
+from uvicorn.config import STARTUP_FAILURE
+
+from app.config import SHUTDOWN_FLUSH_RESERVE_SECONDS, Settings
+from app.logging import configure_logging
+
+APP = "app.main:app"
+RESTART_BACKOFF_SECONDS = 1.0
+
+logger = logging.getLogger("gatchan")
+
+
+def _default_workers() -> int:
+    # One worker unless asked for more: only the dedupe ring and parent cache are shared, so
+    # duplicate-capture detection, reply batching, the replica and (without EDIT_INDEX_PATH)
+    # edit tracking only see the updates that land on their own worker.
+    configured = os.environ.get("WEB_CONCURRENCY")
+    if configured:
+        return max(1, int(configured))
+    return 1
+
+
+def _graceful_shutdown_seconds() -> float:
+    # Open connections may hold uvicorn up to the flush reserve; the lifespan drain then only
+    # gets what is left of SHUTDOWN_DRAIN_SECONDS, so the whole shutdown stays inside it.
+    configured = os.environ.get("SHUTDOWN_DRAIN_SECONDS")
+    drain = float(configured) if configured else Settings.model_fields["shutdown_drain_seconds"].default
+    return max(drain - SHUTDOWN_FLUSH_RESERVE_SECONDS, 0.0)
+
+
+def _bind(host: str, port: int, *, reuse_port: bool) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket) -> None:
+    config = uvicorn.Config(
+        APP,
+        timeout_graceful_shutdown=_graceful_shutdown_seconds(),
+        log_config=None,
+        access_log=False,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    # Forks one uvicorn process per worker. With SO_REUSEPORT every worker binds its own
+    # listening socket and the kernel balances accepts across them; without it the parent
+    # binds once and the children share that socket.
+    def __init__(self, host: str, port: int, workers: int) -> None:
+        self._host = host
+        self._port = port
+        self._workers = workers
+        self._reuse_port = hasattr(socket, "SO_REUSEPORT")
+        self._shared: Optional[socket.socket] = None
+        self._children: dict[int, int] = {}
+        self._stopping = False
+        self._failed = False
+
+    def run(self) -> int:
+        if not self._reuse_port:
+            self._shared = _bind(self._host, self._port, reuse_port=False)
+        for slot in range(self._workers):
+            self._spawn(slot)
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        logger.info(
+            "serve_started",
+            extra={"workers": self._workers, "port": self._port, "reuse_port": self._reuse_port},
+        )
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:  # pragma: no cover - PEP 475 retries os.wait
+                continue
+            slot = self._children.pop(pid, None)
+            if slot is None or self._stopping:
+                continue
+            logger.warning("serve_worker_exited", extra={"pid": pid, "status": status})
+            if os.waitstatus_to_exitcode(status) == STARTUP_FAILURE:
+                # Bad settings fail every worker the same way; restarting would only loop.
+                self._failed = True
+                self._stop(signal.SIGTERM, None)
+                continue
+            time.sleep(RESTART_BACKOFF_SECONDS)
+            if not self._stopping:
+                self._spawn(slot)
+        return 1 if self._failed else 0
+
+    def _spawn(self, slot: int) -> None:
+        pid = os.fork()
+        if pid:
+            self._children[pid] = slot
+            return
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            sock = self._shared or _bind(self._host, self._port, reuse_port=True)
+            _run_worker(sock)
+        except SystemExit as exc:
+            code = exc.code if isinstance(exc.code, int) else 1
+        except BaseException:
+            logger.exception("serve_worker_failed", extra={"slot": slot})
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _stop(self, signum: int, _frame: object) -> None:
+        # Workers drain on their own SIGTERM handling (see app.main lifespan).
+        self._stopping = True
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the webhook with several worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=_default_workers())
+    parser.add_argument("--shared-state-dir", help="Directory for state shared between workers")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    if args.shared_state_dir:
+        os.environ["SHARED_STATE_DIR"] = args.shared_state_dir
+    if args.workers <= 1:
+        _run_worker(_bind(args.host, args.port, reuse_port=False))
+        return 0
+    logger.warning(
+        "serve_per_worker_state",
+        extra={
+            "workers": args.workers,
+            "per_worker": "capture_index,feedback,replica"
+            + ("" if os.environ.get("EDIT_INDEX_PATH") else ",edit_index"),
+        },
+    )
+    scratch = None
+    if not os.environ.get("SHARED_STATE_DIR"):
+        # Workers must see one dedupe ring, or a retried update can land on a sibling.
+        scratch = os.environ["SHARED_STATE_DIR"] = tempfile.mkdtemp(prefix="gatchan-state-")
+    try:
+        return Supervisor(args.host, args.port, args.workers).run()
+    finally:
+        if scratch is not None:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import mmap
+import os
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, Optional
+
+from app.dedupe import _EMPTY, DedupeRing
+
+_MAGIC = 0x6761746368616E02  # "gatchan" + layout version
+_HEADER_SLOTS = 4  # magic, capacity, head, size
+_SLOT_BYTES = 8
+DEFAULT_MAP_BYTES = 64 * 1024
+
+
+class _FileLock:
+    # flock excludes other processes; it is per open file, so threads also need a mutex.
+    def __init__(self, fd: int) -> None:
+        self._fd = fd
+        self._thread_lock = threading.Lock()
+
+    def __enter__(self) -> None:
+        self._thread_lock.acquire()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info: object) -> None:
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+def _map_file(path: Path, size: int) -> tuple[int, mmap.mmap]:
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    return fd, mmap.mmap(fd, size)
+
+
+class SharedDedupeRing(DedupeRing):
+    # DedupeRing with its columns, index and head/size living in one mmap'd file, so every
+    # worker process on the host checks and records update ids in the same ring.
+    _header: Optional[memoryview] = None
+
+    def __init__(self, path: str | Path, capacity: int, ttl_seconds: float) -> None:
+        super().__init__(capacity, ttl_seconds)
+        typecode = "i" if capacity < 2**31 else "q"
+        index_bytes = array(typecode).itemsize * self._table_size
+        size = (_HEADER_SLOTS + 2 * capacity) * _SLOT_BYTES + index_bytes
+        self._fd, self._map = _map_file(Path(path), size)
+        self._lock = _FileLock(self._fd)
+        view = memoryview(self._map)
+        columns_start = _HEADER_SLOTS * _SLOT_BYTES
+        index_start = columns_start + 2 * capacity * _SLOT_BYTES
+        with self._lock:
+            self._header = view[:columns_start].cast("q")
+            self._ids = view[columns_start : columns_start + capacity * _SLOT_BYTES].cast("q")
+            self._stamps = view[columns_start + capacity * _SLOT_BYTES : index_start].cast("q")
+            self._index = view[index_start:].cast(typecode)
+            if self._header[0] != _MAGIC or self._header[1] != capacity:
+                self._index[:] = array(typecode, [_EMPTY]) * self._table_size
+                self._header[1] = capacity
+                self._header[2] = 0
+                self._header[3] = 0
+                self._header[0] = _MAGIC
+
+    @property
+    def _head(self) -> int:
+        return self._header[2] if self._header is not None else 0
+
+    @_head.setter
+    def _head(self, value: int) -> None:
+        if self._header is not None:
+            self._header[2] = value
+
+    @property
+    def _size(self) -> int:
+        return self._header[3] if self._header is not None else 0
+
+    @_size.setter
+    def _size(self, value: int) -> None:
+        if self._header is not None:
+            self._header[3] = value
+
+    def _allocate(self) -> None:
+        # Mapped in __init__; nothing to allocate lazily.
+        return
+
+
+class SharedMap:
+    # A small JSON mapping in a fixed-size mmap'd file, for hot values every worker should
+    # agree on (such as the resolved parent task). Whole-value rewrites keep it simple.
+    def __init__(self, path: str | Path, size: int = DEFAULT_MAP_BYTES) -> None:
+        self._fd, self._map = _map_file(Path(path), size)
+        self._lock = _FileLock(self._fd)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._read().get(key, default)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        with self._lock:
+            data = self._read()
+            data[key] = value
+            self._write(data)
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            data = self._read()
+            value = data.pop(key, default)
+            self._write(data)
+            return value
+
+    def _read(self) -> dict[str, Any]:
+        length = int.from_bytes(self._map[:_SLOT_BYTES], "little")
+        if not length:
+            return {}
+        try:
+            data = json.loads(self._map[_SLOT_BYTES : _SLOT_BYTES + length])
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, data: dict[str, Any]) -> None:
+        payload = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        if len(payload) > len(self._map) - _SLOT_BYTES:
+            raise ValueError("Shared map is full")
+        self._map[_SLOT_BYTES : _SLOT_BYTES + len(payload)] = payload
+        self._map[:_SLOT_BYTES] = len(payload).to_bytes(_SLOT_BYTES, "little")
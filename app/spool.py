@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import socket
+import threading
+import uuid
+from pathlib import Path
+from typing import IO, Any, Optional
+
+_CLAIM_SUFFIX = ".replaying"
+
+
+class UpdateSpool:
+    # Append-only JSONL of updates an instance accepted but could not finish before shutdown.
+    # The next instance takes the whole file at startup and processes it.
+    #
+    # Several workers, and instances sharing a volume, may call take() at once, so every file
+    # is read under an exclusive flock that its reader holds until the file is unlinked. The
+    # spool is locked before it is renamed to a claim name unique to this call, and appenders
+    # lock too, so a claim never loses a line being written. A claim file nobody holds a lock
+    # on belongs to a reader that died mid-replay and is taken over as is.
+    def __init__(self, path: str | Path) -> None:
+        self._path = Path(path)
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def append(self, payload: dict[str, Any]) -> None:
+        line = json.dumps(payload, separators=(",", ":"), sort_keys=True) + "\n"
+        with self._lock:
+            while True:
+                handle = self._path.open("a", encoding="utf-8")
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                if _is_current(handle, self._path):
+                    break
+                # Claimed while we waited for the lock: start a fresh spool file.
+                handle.close()
+            with handle:
+                handle.write(line)
+                handle.flush()
+                os.fsync(handle.fileno())
+
+    def take(self) -> list[dict[str, Any]]:
+        payloads: list[dict[str, Any]] = []
+        with self._lock:
+            for orphan in sorted(self._path.parent.glob(f"{self._path.name}{_CLAIM_SUFFIX}.*")):
+                handle = _lock_existing(orphan, blocking=False)
+                if handle is not None:
+                    payloads.extend(self._drain(handle, orphan))
+            handle = _lock_existing(self._path, blocking=True)
+            if handle is not None:
+                claimed = self._path.with_name(f"{self._path.name}{_CLAIM_SUFFIX}.{_claim_token()}")
+                os.replace(self._path, claimed)
+                payloads.extend(self._drain(handle, claimed))
+        return payloads
+
+    def _drain(self, handle: IO[str], path: Path) -> list[dict[str, Any]]:
+        # Unlinking before the lock is released keeps a late opener from reading it again.
+        with handle:
+            payloads = _parse(handle)
+            path.unlink()
+        return payloads
+
+
+def _claim_token() -> str:
+    # Containers commonly all run as pid 1, so the pid alone does not tell instances apart.
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex}"
+
+
+def _lock_existing(path: Path, *, blocking: bool) -> Optional[IO[str]]:
+    try:
+        handle = path.open(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.close()
+        return None
+    if not _is_current(handle, path):
+        # Another reader took it (and renamed or unlinked it) between our open and our lock.
+        handle.close()
+        return None
+    return handle
+
+
+def _is_current(handle: IO[str], path: Path) -> bool:
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(handle.fileno())
+    return (opened.st_dev, opened.st_ino) == (current.st_dev, current.st_ino)
+
+
+def _parse(handle: IO[str]) -> list[dict[str, Any]]:
+    payloads: list[dict[str, Any]] = []
+    for line in handle:
+        try:
+            payload = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(payload, dict):
+            payloads.append(payload)
+    return payloads
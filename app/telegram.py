@@ -1,9 +1,16 @@
 from __future__ import annotations
 
-from typing import Optional
+from pathlib import PurePosixPath
+from typing import Iterator, Optional
 
 import httpx
 
+from app.http_client import get_http_client
+from app.tracing import span
+
+TELEGRAM_DOWNLOAD_TIMEOUT_SECONDS = 20.0
+TELEGRAM_STREAM_CHUNK_BYTES = 64 * 1024
+
 
 def get_telegram_file_url(
     file_id: str,
@@ -18,18 +25,13 @@ def get_telegram_file_url(
 
     url = f"https://api.telegram.org/bot{api_token}/getFile"
 
-    close_client = False
     if client is None:
-        client = httpx.Client(timeout=10.0)
-        close_client = True
+        client = get_http_client()
 
-    try:
+    with span("telegram.get_file"):
         response = client.get(url, params={"file_id": file_id})
-        response.raise_for_status()
-        payload = response.json()
-    finally:
-        if close_client:
-            client.close()
+    response.raise_for_status()
+    payload = response.json()
 
     if not isinstance(payload, dict):
         raise ValueError("Telegram response invalid")
@@ -52,18 +54,49 @@ def download_telegram_file(
     if not file_url:
         raise ValueError("Telegram file url is required")
 
-    close_client = False
     if client is None:
-        client = httpx.Client(timeout=20.0)
-        close_client = True
-
-    try:
-        response = client.get(file_url)
-        response.raise_for_status()
-        return response.content
-    finally:
-        if close_client:
-            client.close()
+        client = get_http_client()
+
+    with span("telegram.download"):
+        response = client.get(file_url, timeout=TELEGRAM_DOWNLOAD_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return response.content
+
+
+class TelegramFileStream:
+    # A Telegram download exposed as a read-only file object, so it can be handed to an
+    # httpx multipart upload as is. Only one chunk is held at a time; the socket is read as
+    # the upload asks for more.
+    def __init__(self, file_url: str, *, client: Optional[httpx.Client] = None) -> None:
+        if not file_url:
+            raise ValueError("Telegram file url is required")
+        self._client = client or get_http_client()
+        self._request = self._client.build_request("GET", file_url, timeout=TELEGRAM_DOWNLOAD_TIMEOUT_SECONDS)
+        self._response: Optional[httpx.Response] = None
+        self._chunks: Iterator[bytes] = iter(())
+        self.file_name = PurePosixPath(httpx.URL(file_url).path).name
+        self.bytes_read = 0
+
+    def __enter__(self) -> "TelegramFileStream":
+        with span("telegram.download"):
+            self._response = self._client.send(self._request, stream=True)
+        try:
+            self._response.raise_for_status()
+        except httpx.HTTPError:
+            self._response.close()
+            raise
+        self._chunks = self._response.iter_bytes(TELEGRAM_STREAM_CHUNK_BYTES)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._response is not None:
+            self._response.close()
+
+    def read(self, size: int = -1) -> bytes:
+        # Returns up to one chunk whatever size is asked for; callers loop until b"".
+        chunk = next(self._chunks, b"")
+        self.bytes_read += len(chunk)
+        return chunk
 
 
 def send_telegram_message(
@@ -72,7 +105,7 @@ def send_telegram_message(
     api_token: str,
     *,
     client: Optional[httpx.Client] = None,
-) -> None:
+) -> Optional[int]:
     if not api_token:
         raise ValueError("Telegram API token is required")
     if not text or not text.strip():
@@ -81,14 +114,44 @@ def send_telegram_message(
     url = f"https://api.telegram.org/bot{api_token}/sendMessage"
     payload = {"chat_id": chat_id, "text": text.strip()}
 
-    close_client = False
     if client is None:
-        client = httpx.Client(timeout=10.0)
-        close_client = True
+        client = get_http_client()
 
-    try:
+    with span("telegram.send_message"):
         response = client.post(url, json=payload)
-        response.raise_for_status()
-    finally:
-        if close_client:
-            client.close()
+    response.raise_for_status()
+    return _sent_message_id(response)
+
+
+def edit_telegram_message(
+    chat_id: int,
+    message_id: int,
+    text: str,
+    api_token: str,
+    *,
+    client: Optional[httpx.Client] = None,
+) -> None:
+    if not api_token:
+        raise ValueError("Telegram API token is required")
+    if not text or not text.strip():
+        raise ValueError("Telegram message text is required")
+
+    url = f"https://api.telegram.org/bot{api_token}/editMessageText"
+    payload = {"chat_id": chat_id, "message_id": message_id, "text": text.strip()}
+
+    if client is None:
+        client = get_http_client()
+
+    with span("telegram.edit_message"):
+        response = client.post(url, json=payload)
+    response.raise_for_status()
+
+
+def _sent_message_id(response: httpx.Response) -> Optional[int]:
+    try:
+        payload = response.json()
+    except ValueError:
+        return None
+    result = payload.get("result") if isinstance(payload, dict) else None
+    message_id = result.get("message_id") if isinstance(result, dict) else None
+    return message_id if isinstance(message_id, int) else None
@@ -0,0 +1,404 @@
+from __future__ import annotations
+
+import json
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import Any, Callable, Iterator, Optional, TextIO
+
+import httpx
+
+from app.feedback import TokenBucket
+from app.models import (
+    TelegramAudio,
+    TelegramChat,
+    TelegramDocument,
+    TelegramEntity,
+    TelegramMessage,
+    TelegramPhotoSize,
+    TelegramVoice,
+)
+from app.telegram_normalizer import FORWARDED_EMPTY_PROMPT, UNSUPPORTED_MESSAGE_PROMPT, normalize_message
+from app.todoist import SYNC_COMMANDS_MAX, InMemoryCheckpointStore, TodoistServiceError, add_subtasks
+
+READ_CHUNK_CHARS = 1 << 16
+# Todoist allows 450 sync requests per 15 minutes per user.
+DEFAULT_REQUESTS_PER_MINUTE = 30.0
+DEFAULT_ATTEMPTS = 5
+IMPORT_NAMESPACE = uuid.UUID("5f0c1d8e-4b0a-4c5e-9a43-7d1f3e2b6a10")
+_WHITESPACE = " \t\r\n"
+
+# Telegram Desktop's text_entities types, mapped to Bot API entity types.
+ENTITY_TYPES = {
+    "link": "url",
+    "text_link": "text_link",
+    "mention": "mention",
+    "mention_name": "text_mention",
+    "hashtag": "hashtag",
+    "cashtag": "cashtag",
+    "bot_command": "bot_command",
+    "email": "email",
+    "phone": "phone_number",
+    "bank_card": "bank_card",
+    "bold": "bold",
+    "italic": "italic",
+    "underline": "underline",
+    "strikethrough": "strikethrough",
+    "spoiler": "spoiler",
+    "code": "code",
+    "pre": "pre",
+    "blockquote": "blockquote",
+    "custom_emoji": "custom_emoji",
+}
+
+
+class _Reader:
+    # A sliding window over the export. json's C decoder parses each value; the window only
+    # ever holds the unread tail plus one chunk, so memory stays flat however big the file is.
+    def __init__(self, stream: TextIO, chunk_chars: int) -> None:
+        self._stream = stream
+        self._chunk_chars = chunk_chars
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+        self.chars_read = 0
+
+    def peek(self) -> str:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of export")
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at character {self.chars_read - len(self._buffer) + self._pos}")
+        self._pos += 1
+
+    def skip(self) -> None:
+        self._pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Most likely the value runs past the window; a real syntax error stays one.
+                if not self._fill():
+                    raise
+                continue
+            # A number at the window's edge may continue in the next chunk.
+            if end == len(self._buffer) and not self._eof and isinstance(value, (int, float)):
+                self._fill()
+                continue
+            self._pos = end
+            return value
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._stream.read(self._chunk_chars)
+        if not chunk:
+            self._eof = True
+            return False
+        self.chars_read += len(chunk)
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+
+def iter_export_messages(
+    stream: TextIO,
+    *,
+    chunk_chars: int = READ_CHUNK_CHARS,
+) -> Iterator[tuple[dict[str, Any], dict[str, Any]]]:
+    # Yields (chat, message) for every entry of every "messages" array, whether the file is a
+    # single-chat export or a full account export with chats.list[*].messages. chat holds the
+    # scalar fields (name, type, id) that precede the array, as Telegram Desktop writes them.
+    reader = _Reader(stream, chunk_chars)
+    yield from _walk(reader, {})
+
+
+def _walk(reader: _Reader, chat: dict[str, Any]) -> Iterator[tuple[dict[str, Any], dict[str, Any]]]:
+    char = reader.peek()
+    if char == "{":
+        reader.skip()
+        scalars: dict[str, Any] = {}
+        while True:
+            char = reader.peek()
+            if char == "}":
+                reader.skip()
+                return
+            if char == ",":
+                reader.skip()
+                continue
+            key = reader.value()
+            reader.expect(":")
+            char = reader.peek()
+            if key == "messages" and char == "[":
+                yield from _messages(reader, scalars)
+            elif char in "{[":
+                yield from _walk(reader, scalars)
+            else:
+                scalars[key] = reader.value()
+    elif char == "[":
+        reader.skip()
+        while True:
+            char = reader.peek()
+            if char == "]":
+                reader.skip()
+                return
+            if char == ",":
+                reader.skip()
+                continue
+            yield from _walk(reader, chat)
+    else:
+        reader.value()
+
+
+def _messages(reader: _Reader, chat: dict[str, Any]) -> Iterator[tuple[dict[str, Any], dict[str, Any]]]:
+    reader.expect("[")
+    while True:
+        char = reader.peek()
+        if char == "]":
+            reader.skip()
+            return
+        if char == ",":
+            reader.skip()
+            continue
+        message = reader.value()
+        if isinstance(message, dict):
+            yield chat, message
+
+
+def _utf16_len(value: str) -> int:
+    return len(value.encode("utf-16-le")) // 2
+
+
+def _text_parts(raw: dict[str, Any]) -> list[dict[str, Any]]:
+    parts = raw.get("text_entities")
+    if isinstance(parts, list):
+        return [part for part in parts if isinstance(part, dict)]
+    # Older exports only have "text": a string, or a list mixing strings and entity dicts.
+    text = raw.get("text")
+    if isinstance(text, str):
+        return [{"type": "plain", "text": text}]
+    if isinstance(text, list):
+        return [part if isinstance(part, dict) else {"type": "plain", "text": str(part)} for part in text]
+    return []
+
+
+def _text_and_entities(raw: dict[str, Any]) -> tuple[str, list[TelegramEntity]]:
+    pieces: list[str] = []
+    entities: list[TelegramEntity] = []
+    offset = 0
+    for part in _text_parts(raw):
+        value = str(part.get("text") or "")
+        length = _utf16_len(value)
+        kind = ENTITY_TYPES.get(str(part.get("type")))
+        if kind and length:
+            entities.append(
+                TelegramEntity(
+                    type=kind,
+                    offset=offset,
+                    length=length,
+                    url=part.get("href"),
+                    language=part.get("language"),
+                )
+            )
+        pieces.append(value)
+        offset += length
+    return "".join(pieces), entities
+
+
+def to_telegram_message(chat: dict[str, Any], raw: dict[str, Any]) -> Optional[TelegramMessage]:
+    # Service entries (pins, joins, calls) have no content to capture.
+    if raw.get("type", "message") != "message" or not isinstance(raw.get("id"), int):
+        return None
+    text, entities = _text_and_entities(raw)
+    has_media = bool(raw.get("photo") or raw.get("file"))
+    date = raw.get("date_unixtime")
+    fields: dict[str, Any] = {
+        "message_id": raw["id"],
+        "date": int(date) if isinstance(date, str) and date.isdigit() else None,
+        "chat": TelegramChat(id=chat["id"], type=chat.get("type")) if isinstance(chat.get("id"), int) else None,
+        "forward_sender_name": raw.get("forwarded_from"),
+    }
+    if has_media:
+        fields["caption"] = text or None
+        fields["caption_entities"] = entities or None
+    else:
+        fields["text"] = text or None
+        fields["entities"] = entities or None
+    path = raw.get("photo") or raw.get("file")
+    if raw.get("photo"):
+        fields["photo"] = [
+            TelegramPhotoSize(file_id=str(path), width=raw.get("width") or 0, height=raw.get("height") or 0)
+        ]
+    elif raw.get("media_type") == "voice_message":
+        fields["voice"] = TelegramVoice(file_id=str(path), mime_type=raw.get("mime_type"))
+    elif raw.get("media_type") == "audio_file":
+        fields["audio"] = TelegramAudio(file_id=str(path), mime_type=raw.get("mime_type"))
+    elif raw.get("file"):
+        fields["document"] = TelegramDocument(
+            file_id=str(path),
+            file_name=raw.get("file_name") or PurePosixPath(str(path)).name,
+            mime_type=raw.get("mime_type"),
+        )
+    return TelegramMessage(**fields)
+
+
+def _description(chat: dict[str, Any], raw: dict[str, Any]) -> str:
+    parts = [
+        "source=telegram_export",
+        f"chat_id={chat.get('id')}",
+        f"message_id={raw.get('id')}",
+        f"date={raw.get('date_unixtime') or raw.get('date')}",
+    ]
+    description = "meta: " + " ".join(parts)
+    path = raw.get("photo") or raw.get("file")
+    if path:
+        # Media stays in the export folder; the path tells the user where to find it.
+        description += f"\nexport_file={path}"
+    return description
+
+
+@dataclass
+class ImportReport:
+    read: int = 0
+    imported: int = 0
+    skipped: int = 0
+    resumed: int = 0
+    failed: int = 0
+    batches: int = 0
+    chars_read: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def read_per_second(self) -> float:
+        return self.read / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    @property
+    def imported_per_second(self) -> float:
+        return self.imported / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+
+def import_export(
+    stream: TextIO,
+    parent_id: str,
+    api_token: str,
+    *,
+    batch_size: int = SYNC_COMMANDS_MAX,
+    requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+    attempts: int = DEFAULT_ATTEMPTS,
+    checkpoint: Optional[InMemoryCheckpointStore] = None,
+    chat_id: Optional[int] = None,
+    chat_type: Optional[str] = None,
+    client: Optional[httpx.Client] = None,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+    on_batch: Optional[Callable[[ImportReport], None]] = None,
+) -> ImportReport:
+    # Exports list each chat's messages by ascending id, so the checkpoint is simply the last
+    # id before the chat's first failed command; command uuids derive from (chat, message) and
+    # make a batch resent after a crash or a rerun a no-op on Todoist's side.
+    if batch_size < 1 or batch_size > SYNC_COMMANDS_MAX:
+        raise TodoistServiceError(f"Sync batch size must be between 1 and {SYNC_COMMANDS_MAX}")
+    report = ImportReport()
+    bucket = TokenBucket(requests_per_minute / 60, 1, now=clock())
+    started = clock()
+    pending: list[tuple[str, str, Optional[str]]] = []
+    pending_ids: list[int] = []
+    pending_key: Optional[str] = None
+    stalled: set[str] = set()
+    reader = _Reader(stream, READ_CHUNK_CHARS)
+
+    def flush() -> None:
+        nonlocal pending, pending_ids
+        if not pending:
+            return
+        errors = _send(pending, parent_id, api_token, bucket, attempts, client, clock, sleep)
+        report.batches += 1
+        report.failed += sum(1 for error in errors.values() if error)
+        report.imported += sum(1 for error in errors.values() if not error)
+        if checkpoint is not None and pending_key is not None and pending_key not in stalled:
+            # Stop at the first failure so a rerun retries it; later successes are resent as no-ops.
+            done = 0
+            for (command_uuid, _, _), message_id in zip(pending, pending_ids):
+                if errors.get(command_uuid):
+                    stalled.add(pending_key)
+                    break
+                done = message_id
+            if done:
+                checkpoint.save(pending_key, str(done))
+        pending, pending_ids = [], []
+        report.chars_read = reader.chars_read
+        report.elapsed_seconds = clock() - started
+        if on_batch is not None:
+            on_batch(report)
+
+    resume: dict[str, int] = {}
+    for chat, raw in _walk(reader, {}):
+        if (chat_id is not None and chat.get("id") != chat_id) or (
+            chat_type is not None and chat.get("type") != chat_type
+        ):
+            continue
+        report.read += 1
+        key = f"telegram_export:{chat.get('id')}"
+        if key != pending_key:
+            flush()
+            pending_key = key
+            if key not in resume:
+                saved = checkpoint.load(key) if checkpoint is not None else None
+                resume[key] = int(saved) if saved else 0
+        message = to_telegram_message(chat, raw)
+        if message is None:
+            report.skipped += 1
+            continue
+        if message.message_id <= resume[key]:
+            report.resumed += 1
+            continue
+        content = normalize_message(message)
+        if content in {UNSUPPORTED_MESSAGE_PROMPT, FORWARDED_EMPTY_PROMPT}:
+            report.skipped += 1
+            continue
+        command_uuid = str(uuid.uuid5(IMPORT_NAMESPACE, f"{chat.get('id')}:{message.message_id}"))
+        pending.append((command_uuid, content, _description(chat, raw)))
+        pending_ids.append(message.message_id)
+        if len(pending) >= batch_size:
+            flush()
+    flush()
+    report.chars_read = reader.chars_read
+    report.elapsed_seconds = clock() - started
+    return report
+
+
+def _send(
+    items: list[tuple[str, str, Optional[str]]],
+    parent_id: str,
+    api_token: str,
+    bucket: TokenBucket,
+    attempts: int,
+    client: Optional[httpx.Client],
+    clock: Callable[[], float],
+    sleep: Callable[[float], None],
+) -> dict[str, Optional[str]]:
+    attempt = 0
+    while True:
+        delay = bucket.delay(clock())
+        if delay > 0:
+            sleep(delay)
+        bucket.take(clock())
+        try:
+            return add_subtasks(items, parent_id, api_token, client=client)
+        except TodoistServiceError:
+            attempt += 1
+            if attempt >= attempts:
+                raise
+            # Backing off also covers a 429 from other clients sharing the token's budget.
+            sleep(min(2 ** (attempt - 1), 60))
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import Optional
+import bisect
+import re
+from typing import Callable, Optional
 
 from app.models import TelegramEntity, TelegramMessage, TelegramUpdate
 
@@ -10,6 +12,8 @@ VOICE_ONLY_PROMPT = "Voice memo from Telegram"
 DOCUMENT_ONLY_PROMPT = "File from Telegram"
 FORWARDED_EMPTY_PROMPT = "Forwarded message has no text. Please add a note."
 
+_ASTRAL_CHARS = re.compile("[\U00010000-\U0010ffff]")
+
 
 def normalize_update(update: TelegramUpdate) -> str:
     message = update.message or update.edited_message or update.channel_post or update.edited_channel_post
@@ -40,30 +44,110 @@ def _normalized_text(text: Optional[str], entities: Optional[list[TelegramEntity
         return ""
     if not entities:
         return text.strip()
-    return _apply_text_links(text, entities).strip()
+    return _render_entities(text, entities).strip()
+
+
+class _Utf16Offsets:
+    # Telegram offsets count UTF-16 code units. Only characters outside the BMP take two
+    # units, so their positions are found once per text and each offset is a bisect away.
+    def __init__(self, text: str) -> None:
+        self._length = len(text)
+        self.pair_ends: list[int] = []
+        if not text.isascii():
+            self.pair_ends = [
+                match.start() + shift + 2 for shift, match in enumerate(_ASTRAL_CHARS.finditer(text))
+            ]
+
+    def index(self, offset: int) -> int:
+        if offset <= 0:
+            return 0
+        if self.pair_ends:
+            offset -= bisect.bisect_right(self.pair_ends, offset)
+        return min(offset, self._length)
+
+
+def _render_entities(text: str, entities: list[TelegramEntity], *, ordered: bool = False) -> str:
+    # One left-to-right pass: entities are visited by start (Telegram already sends them
+    # that way; anything else is sorted once and re-rendered) and a stack closes nested
+    # ones innermost first.
+    offsets = _Utf16Offsets(text)
+    pair_ends = offsets.pair_ends
+    length = len(text)
+    parts: list[str] = []
+    open_ends: list[int] = []
+    open_closings: list[str] = []
+    cursor = 0
+    previous = (-1, 0)
+    for entity in entities:
+        markers = _MARKERS.get(entity.type)
+        if markers is None:
+            continue
+        offset = entity.offset
+        end_offset = offset + entity.length
+        if not ordered:
+            order = (offset, -entity.length)
+            if order < previous:
+                return _render_entities(text, sorted(entities, key=_entity_order), ordered=True)
+            previous = order
+        if pair_ends:
+            start = offsets.index(offset)
+            end = offsets.index(end_offset)
+        else:
+            start = offset if 0 < offset < length else (0 if offset <= 0 else length)
+            end = end_offset if end_offset < length else length
+        while open_ends and open_ends[-1] <= start:
+            close_at = open_ends.pop()
+            parts.append(text[cursor:close_at])
+            parts.append(open_closings.pop())
+            cursor = close_at
+        if open_ends and end > open_ends[-1]:
+            # Partial overlaps are clipped to the enclosing entity so markers stay balanced.
+            end = open_ends[-1]
+        if end <= start:
+            continue
+        opening, closing = markers(entity)
+        parts.append(text[cursor:start])
+        parts.append(opening)
+        cursor = start
+        open_ends.append(end)
+        open_closings.append(closing)
+    if not parts and not open_ends:
+        return text
+    while open_ends:
+        close_at = open_ends.pop()
+        parts.append(text[cursor:close_at])
+        parts.append(open_closings.pop())
+        cursor = close_at
+    parts.append(text[cursor:])
+    return "".join(parts)
 
 
-def _apply_text_links(text: str, entities: list[TelegramEntity]) -> str:
-    inserts: list[tuple[int, str]] = []
-    for entity in entities:
-        if entity.type == "text_link" and entity.url:
-            inserts.append((entity.offset + entity.length, f" ({entity.url})"))
+def _entity_order(entity: TelegramEntity) -> tuple[int, int]:
+    return entity.offset, -entity.length
 
-    if not inserts:
-        return text
 
-    inserts.sort(key=lambda item: item[0])
-    result: list[str] = []
-    cursor = 0
-    for position, snippet in inserts:
-        if position < cursor or position > len(text):
-            continue
-        result.append(text[cursor:position])
-        result.append(snippet)
-        cursor = position
+def _pre_markers(entity: TelegramEntity) -> tuple[str, str]:
+    return f"```{entity.language or ''}\n", "\n```"
+
+
+# url, mention and hashtag entities already read correctly as plain text.
+_MARKERS: dict[str, Callable[[TelegramEntity], tuple[str, str]]] = {
+    "text_link": lambda entity: ("", f" ({entity.url})" if entity.url else ""),
+    "code": lambda entity: ("`", "`"),
+    "pre": _pre_markers,
+}
+
+
+def entity_texts(text: str, entities: list[TelegramEntity]) -> list[tuple[TelegramEntity, str]]:
+    offsets = _Utf16Offsets(text)
+    return [
+        (entity, text[offsets.index(entity.offset) : offsets.index(entity.offset + entity.length)])
+        for entity in entities
+    ]
+
 
-    result.append(text[cursor:])
-    return "".join(result)
+def entity_text(text: str, entity: TelegramEntity) -> str:
+    return entity_texts(text, [entity])[0][1]
 
 
 def _is_forwarded(message: TelegramMessage) -> bool:
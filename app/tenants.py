@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import httpx
+
+from app.feedback import TokenBucket
+from app.http_client import DEFAULT_TIMEOUT_SECONDS, ReleasingStream, get_http_transport
+
+logger = logging.getLogger("gatchan")
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS tenants (
+        tenant_id TEXT PRIMARY KEY,
+        todoist_api_token TEXT NOT NULL,
+        todo_later_task_name TEXT NOT NULL,
+        captures_per_minute REAL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tenant_members (
+        telegram_id INTEGER PRIMARY KEY,
+        tenant_id TEXT NOT NULL REFERENCES tenants (tenant_id) ON DELETE CASCADE
+    )
+    """,
+)
+
+
+@dataclass(frozen=True)
+class Tenant:
+    tenant_id: str
+    todoist_api_token: str = field(repr=False)
+    todo_later_task_name: str
+    captures_per_minute: Optional[float] = None
+
+
+class TenantRegistry:
+    # Maps Telegram user and chat ids to Todoist accounts. The whole table is read into
+    # memory; lookups never touch SQLite. Other processes edit the file with plain SQL, and
+    # `PRAGMA data_version` tells us cheaply whether anyone committed since the last load.
+    def __init__(
+        self,
+        path: str,
+        *,
+        reload_interval_seconds: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        import sqlite3
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        with self._db:
+            for statement in SCHEMA:
+                self._db.execute(statement)
+        self._reload_interval = reload_interval_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tenants: dict[str, Tenant] = {}
+        self._members: dict[int, Tenant] = {}
+        self._version: Optional[int] = None
+        self._checked_at = clock()
+        self.reloads = 0
+        self.reload()
+
+    def lookup(self, chat_id: Optional[int], user_id: Optional[int]) -> Optional[Tenant]:
+        # A mapped chat wins over its members, so a shared group files into one account.
+        self._maybe_reload()
+        members = self._members
+        if chat_id is not None and chat_id in members:
+            return members[chat_id]
+        if user_id is not None:
+            return members.get(user_id)
+        return None
+
+    def reload(self) -> bool:
+        with self._lock:
+            version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._version:
+                return False
+            tenants = {
+                row[0]: Tenant(*row)
+                for row in self._db.execute(
+                    "SELECT tenant_id, todoist_api_token, todo_later_task_name, captures_per_minute FROM tenants"
+                )
+            }
+            members = {
+                telegram_id: tenants[tenant_id]
+                for telegram_id, tenant_id in self._db.execute("SELECT telegram_id, tenant_id FROM tenant_members")
+                if tenant_id in tenants
+            }
+            # Readers keep using the old dicts until these two assignments land.
+            self._tenants, self._members = tenants, members
+            self._version = version
+            self.reloads += 1
+        logger.info("tenants_loaded", extra={"tenants": len(tenants), "members": len(members)})
+        return True
+
+    def upsert(self, tenant: Tenant, telegram_ids: list[int]) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO tenants VALUES (?, ?, ?, ?)",
+                (tenant.tenant_id, tenant.todoist_api_token, tenant.todo_later_task_name, tenant.captures_per_minute),
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO tenant_members VALUES (?, ?)",
+                [(telegram_id, tenant.tenant_id) for telegram_id in telegram_ids],
+            )
+        self._force_reload()
+
+    def remove(self, tenant_id: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM tenants WHERE tenant_id = ?", (tenant_id,))
+        self._force_reload()
+
+    def tenants(self) -> list[Tenant]:
+        self._maybe_reload()
+        return list(self._tenants.values())
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _maybe_reload(self) -> None:
+        import sqlite3
+
+        now = self._clock()
+        if now - self._checked_at < self._reload_interval:
+            return
+        self._checked_at = now
+        try:
+            self.reload()
+        except sqlite3.Error as exc:
+            # Keep serving the last good table; the next interval tries again.
+            logger.warning("tenants_reload_failed", extra={"error": str(exc)})
+
+    def _force_reload(self) -> None:
+        # data_version does not change for our own connection's commits.
+        with self._lock:
+            self._version = None
+        self.reload()
+
+
+class _TenantTransport(httpx.BaseTransport):
+    # Caps one tenant's requests in flight on top of the process-wide connection pool, so a
+    # tenant with a burst of captures cannot hold every Todoist connection.
+    def __init__(self, max_in_flight: int) -> None:
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        # The slot is held until the body is closed, not just until the headers arrive.
+        self._slots.acquire()
+        try:
+            response = get_http_transport().handle_request(request)
+        except BaseException:
+            self._slots.release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=ReleasingStream(response.stream, self._slots.release),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        # The shared pool outlives every tenant client.
+        return None
+
+
+class TenantSession:
+    # Per-tenant runtime state: a client over the shared pool and a capture budget.
+    def __init__(self, tenant: Tenant, *, max_in_flight: int, captures_per_minute: float, burst: int) -> None:
+        self.tenant = tenant
+        self.client = httpx.Client(timeout=DEFAULT_TIMEOUT_SECONDS, transport=_TenantTransport(max_in_flight))
+        rate = tenant.captures_per_minute or captures_per_minute
+        self._budget = TokenBucket(rate / 60, burst, now=time.monotonic())
+        self._lock = threading.Lock()
+        # Parent lookups of one tenant never wait on another tenant's Todoist round trip.
+        self.parent_lock = threading.Lock()
+        self.captures = 0
+        self.throttled = 0
+
+    @property
+    def parent_cache_key(self) -> str:
+        return f"tenant:{self.tenant.tenant_id}:{self.tenant.todo_later_task_name}"
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._budget.delay(now) > 0:
+                self.throttled += 1
+                return False
+            self._budget.take(now)
+            self.captures += 1
+            return True
+
+
+class TenantPool:
+    # One session per tenant id, rebuilt when the registry hands back a changed tenant row.
+    def __init__(self, *, max_in_flight: int = 4, captures_per_minute: float = 30.0, burst: int = 10) -> None:
+        self._max_in_flight = max_in_flight
+        self._captures_per_minute = captures_per_minute
+        self._burst = burst
+        self._sessions: dict[str, TenantSession] = {}
+        self._lock = threading.Lock()
+
+    def session(self, tenant: Tenant) -> TenantSession:
+        session = self._sessions.get(tenant.tenant_id)
+        if session is not None and session.tenant == tenant:
+            return session
+        with self._lock:
+            session = self._sessions.get(tenant.tenant_id)
+            if session is None or session.tenant != tenant:
+                session = self._sessions[tenant.tenant_id] = TenantSession(
+                    tenant,
+                    max_in_flight=self._max_in_flight,
+                    captures_per_minute=self._captures_per_minute,
+                    burst=self._burst,
+                )
+            return session
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            "tenants": len(sessions),
+            "captures": sum(session.captures for session in sessions),
+            "throttled": sum(session.throttled for session in sessions),
+        }
@@ -1,16 +1,32 @@
 from __future__ import annotations
 
+import json
+import os
+import threading
+import time
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta, timezone
-from typing import Any, Optional
+from pathlib import Path
+from typing import IO, Any, Iterator, Optional
 
 import httpx
 
+from app.http_client import get_http_client
+from app.tracing import span
+
 TODOIST_TASKS_URL = "https://api.todoist.com/api/v1/tasks"
+TODOIST_COMMENTS_URL = "https://api.todoist.com/api/v1/comments"
+TODOIST_UPLOADS_URL = "https://api.todoist.com/api/v1/uploads"
+TODOIST_UPLOAD_TIMEOUT_SECONDS = 60.0
+TODOIST_TASKS_FILTER_URL = f"{TODOIST_TASKS_URL}/filter"
 TODOIST_SYNC_URL = "https://api.todoist.com/sync/v9"
+TODOIST_PAGE_LIMIT = 200
+FILTER_QUERY_RESERVED_CHARS = frozenset("&|!(),\\")
 DEFAULT_TODO_LATER_DUE_STRING = "every day"
 TODAY_DUE_STRING = "today"
 CLEANUP_MAX_ITEMS = 50
+CLEANUP_PAGE_SIZE = 50
+SYNC_COMMANDS_MAX = 100
 TODOIST_TASK_CONTENT_MAX_CHARS = 500
 CONTENT_TRUNCATION_SUFFIX = "..."
 
@@ -42,7 +58,7 @@ def _normalize_task_content(content: str) -> str:
     return normalized[:max_prefix_length].rstrip() + CONTENT_TRUNCATION_SUFFIX
 
 
-def _validate_task_name(task_name: str, api_token: str) -> None:
+def validate_task_name(task_name: str, api_token: str) -> None:
     if not task_name or not task_name.strip():
         raise TodoistServiceError("Todo later task name is required")
     if not api_token:
@@ -56,7 +72,7 @@ def _validate_parent_id(parent_id: str, api_token: str) -> None:
         raise TodoistServiceError("Todoist API token is required")
 
 
-def _request_json(response: httpx.Response, user_message: str) -> dict[str, Any] | list[dict[str, Any]]:
+def request_json(response: httpx.Response, user_message: str) -> dict[str, Any] | list[dict[str, Any]]:
     try:
         data = response.json()
     except ValueError as exc:
@@ -76,7 +92,56 @@ def _extract_tasks(payload: dict[str, Any] | list[dict[str, Any]]) -> list[dict[
     raise TodoistServiceError("Todoist response invalid")
 
 
-def _is_due_today(due: dict[str, Any] | None) -> bool:
+def _next_cursor(payload: dict[str, Any] | list[dict[str, Any]]) -> Optional[str]:
+    if not isinstance(payload, dict):
+        return None
+    cursor = payload.get("next_cursor")
+    if isinstance(cursor, str) and cursor:
+        return cursor
+    return None
+
+
+def _search_query(task_name: str) -> Optional[str]:
+    # Filter operators cannot be escaped in a search term; such names fall back to a full listing.
+    if any(char in FILTER_QUERY_RESERVED_CHARS for char in task_name):
+        return None
+    return f"search: {task_name}"
+
+
+def iter_tasks(
+    api_token: str,
+    *,
+    query: Optional[str] = None,
+    limit: int = TODOIST_PAGE_LIMIT,
+    client: Optional[httpx.Client] = None,
+) -> Iterator[dict[str, Any]]:
+    if not api_token:
+        raise TodoistServiceError("Todoist API token is required")
+
+    headers = {"Authorization": f"Bearer {api_token}"}
+    if client is None:
+        client = get_http_client()
+    url = TODOIST_TASKS_FILTER_URL if query else TODOIST_TASKS_URL
+    params: dict[str, Any] = {"limit": limit}
+    if query:
+        params["query"] = query
+
+    while True:
+        try:
+            with span("todoist.list_tasks"):
+                response = client.get(url, params=params, headers=headers)
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            raise TodoistServiceError("Todoist request failed") from exc
+        payload = request_json(response, "Todoist response invalid")
+        yield from _extract_tasks(payload)
+        cursor = _next_cursor(payload)
+        if cursor is None:
+            return
+        params["cursor"] = cursor
+
+
+def is_due_today(due: dict[str, Any] | None) -> bool:
     if not due:
         return False
     if due_date := due.get("date"):
@@ -93,16 +158,17 @@ def _is_due_today(due: dict[str, Any] | None) -> bool:
     return False
 
 
-def _set_task_due_today(task_id: str, headers: dict[str, str], client: httpx.Client) -> None:
-    response = client.post(
-        f"{TODOIST_TASKS_URL}/{task_id}",
-        json={"due_string": TODAY_DUE_STRING},
-        headers=headers,
-    )
+def set_task_due_today(task_id: str, headers: dict[str, str], client: httpx.Client) -> None:
+    with span("todoist.update_task"):
+        response = client.post(
+            f"{TODOIST_TASKS_URL}/{task_id}",
+            json={"due_string": TODAY_DUE_STRING},
+            headers=headers,
+        )
     response.raise_for_status()
 
 
-def _parse_completed_at(value: object) -> Optional[datetime]:
+def parse_completed_at(value: object) -> Optional[datetime]:
     if not isinstance(value, str) or not value:
         return None
     try:
@@ -115,77 +181,266 @@ def _parse_completed_at(value: object) -> Optional[datetime]:
     return parsed
 
 
-def cleanup_completed_subtasks(
+class InMemoryCheckpointStore:
+    def __init__(self) -> None:
+        self._cursors: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self, parent_id: str) -> Optional[str]:
+        with self._lock:
+            return self._cursors.get(parent_id)
+
+    def save(self, parent_id: str, cursor: str) -> None:
+        with self._lock:
+            self._cursors[parent_id] = cursor
+
+    def clear(self, parent_id: str) -> None:
+        with self._lock:
+            self._cursors.pop(parent_id, None)
+
+
+class FileCheckpointStore(InMemoryCheckpointStore):
+    def __init__(self, path: str | Path) -> None:
+        super().__init__()
+        self._path = Path(path)
+        if self._path.exists():
+            try:
+                data = json.loads(self._path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            if isinstance(data, dict):
+                self._cursors = {str(key): str(value) for key, value in data.items()}
+
+    def save(self, parent_id: str, cursor: str) -> None:
+        super().save(parent_id, cursor)
+        self._flush()
+
+    def clear(self, parent_id: str) -> None:
+        super().clear(parent_id)
+        self._flush()
+
+    def _flush(self) -> None:
+        with self._lock:
+            payload = json.dumps(self._cursors, sort_keys=True)
+        temp_path = self._path.with_suffix(self._path.suffix + ".tmp")
+        temp_path.write_text(payload, encoding="utf-8")
+        os.replace(temp_path, self._path)
+
+
+@dataclass
+class CleanupReport:
+    scanned: int = 0
+    deleted: int = 0
+    pages: int = 0
+    elapsed_seconds: float = 0.0
+    exhausted: bool = False
+
+    @property
+    def scanned_per_second(self) -> float:
+        return self.scanned / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    @property
+    def deleted_per_second(self) -> float:
+        return self.deleted / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+
+def _archive_page(
+    payload: dict[str, Any] | list[dict[str, Any]],
+) -> tuple[list[dict[str, Any]], Optional[str]]:
+    # Older responses are a bare list with no pagination; paged ones wrap items with a cursor.
+    if isinstance(payload, list):
+        return [item for item in payload if isinstance(item, dict)], None
+    items = payload.get("items")
+    if not isinstance(items, list):
+        raise TodoistServiceError("Todoist response invalid")
+    cursor = _next_cursor(payload) if payload.get("has_more", True) else None
+    return [item for item in items if isinstance(item, dict)], cursor
+
+
+def delete_items(item_ids: list[object], headers: dict[str, str], client: httpx.Client) -> int:
+    commands = [
+        {
+            "type": "item_delete",
+            "uuid": str(item_id),
+            "args": {"id": item_id},
+        }
+        for item_id in item_ids
+    ]
+    with span("todoist.sync"):
+        response = client.post(
+            f"{TODOIST_SYNC_URL}/sync",
+            json={"commands": commands},
+            headers=headers,
+        )
+    response.raise_for_status()
+    result = request_json(response, "Todoist response invalid")
+    statuses = result.get("sync_status") if isinstance(result, dict) else None
+    if not isinstance(statuses, dict):
+        return len(item_ids)
+    return sum(1 for item_id in item_ids if statuses.get(str(item_id), "ok") == "ok")
+
+
+def add_subtasks(
+    items: list[tuple[str, str, Optional[str]]],
+    parent_id: str,
+    api_token: str,
+    *,
+    client: Optional[httpx.Client] = None,
+) -> dict[str, Optional[str]]:
+    # items are (uuid, content, description). Todoist applies a command uuid at most once,
+    # so resending a batch after a timeout cannot create duplicates. Returns the error for
+    # each uuid, None when the task was added.
+    _validate_parent_id(parent_id, api_token)
+    if not items or len(items) > SYNC_COMMANDS_MAX:
+        raise TodoistServiceError(f"Sync batch must hold between 1 and {SYNC_COMMANDS_MAX} commands")
+    commands = []
+    for command_uuid, content, description in items:
+        args: dict[str, Any] = {"content": _normalize_task_content(content), "parent_id": parent_id}
+        if description:
+            args["description"] = description.strip()
+        commands.append({"type": "item_add", "uuid": command_uuid, "temp_id": command_uuid, "args": args})
+    headers = {"Authorization": f"Bearer {api_token}"}
+    if client is None:
+        client = get_http_client()
+
+    try:
+        with span("todoist.sync"):
+            response = client.post(f"{TODOIST_SYNC_URL}/sync", json={"commands": commands}, headers=headers)
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise TodoistServiceError("Todoist request failed") from exc
+    result = request_json(response, "Todoist response invalid")
+    statuses = result.get("sync_status") if isinstance(result, dict) else None
+    if not isinstance(statuses, dict):
+        raise TodoistServiceError("Todoist response invalid")
+    errors: dict[str, Optional[str]] = {}
+    for command_uuid, _, _ in items:
+        status = statuses.get(command_uuid)
+        if status == "ok":
+            errors[command_uuid] = None
+        elif isinstance(status, dict):
+            errors[command_uuid] = str(status.get("error") or status)
+        else:
+            errors[command_uuid] = "missing sync status"
+    return errors
+
+
+def cleanup_archived_subtasks(
     parent_id: str,
     api_token: str,
     *,
     older_than_days: int = 7,
     max_delete: int = CLEANUP_MAX_ITEMS,
+    max_pages: Optional[int] = None,
+    page_size: int = CLEANUP_PAGE_SIZE,
+    chunk_size: int = SYNC_COMMANDS_MAX,
+    checkpoint: Optional[InMemoryCheckpointStore] = None,
     client: Optional[httpx.Client] = None,
     now: Optional[datetime] = None,
-) -> int:
+) -> CleanupReport:
     _validate_parent_id(parent_id, api_token)
     if older_than_days < 1:
         raise TodoistServiceError("Cleanup window must be at least 1 day")
+    if chunk_size < 1 or chunk_size > SYNC_COMMANDS_MAX:
+        raise TodoistServiceError(f"Sync chunk size must be between 1 and {SYNC_COMMANDS_MAX}")
+    report = CleanupReport()
     if max_delete < 1:
-        return 0
+        return report
 
     headers = {"Authorization": f"Bearer {api_token}"}
-    close_client = False
     if client is None:
-        client = httpx.Client(timeout=10.0)
-        close_client = True
+        client = get_http_client()
 
+    started = time.monotonic()
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=older_than_days)
+    cursor = checkpoint.load(parent_id) if checkpoint else None
     try:
-        response = client.get(
-            f"{TODOIST_SYNC_URL}/archive/items",
-            params={"item_id": parent_id, "limit": max_delete},
-            headers=headers,
-        )
-        response.raise_for_status()
-        archive_items = _request_json(response, "Todoist response invalid")
-        if not isinstance(archive_items, list):
-            raise TodoistServiceError("Todoist response invalid")
-
-        cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=older_than_days)
-        delete_ids: list[object] = []
-        for item in archive_items:
-            if not isinstance(item, dict):
-                continue
-            completed_at = _parse_completed_at(item.get("completed_at"))
-            if not completed_at:
-                continue
-            if completed_at <= cutoff:
+        while max_pages is None or report.pages < max_pages:
+            params: dict[str, Any] = {"item_id": parent_id, "limit": page_size}
+            if cursor:
+                params["cursor"] = cursor
+            with span("todoist.archive"):
+                response = client.get(f"{TODOIST_SYNC_URL}/archive/items", params=params, headers=headers)
+            response.raise_for_status()
+            items, next_cursor = _archive_page(request_json(response, "Todoist response invalid"))
+            report.pages += 1
+
+            pending: list[object] = []
+            budget_hit = False
+            for item in items:
+                report.scanned += 1
+                completed_at = parse_completed_at(item.get("completed_at"))
                 item_id = item.get("id")
-                if item_id is not None:
-                    delete_ids.append(item_id)
-            if len(delete_ids) >= max_delete:
+                if completed_at and completed_at <= cutoff and item_id is not None:
+                    pending.append(item_id)
+                if len(pending) >= chunk_size:
+                    report.deleted += delete_items(pending, headers, client)
+                    pending = []
+                if report.deleted + len(pending) >= max_delete:
+                    budget_hit = True
+                    break
+            if pending:
+                report.deleted += delete_items(pending, headers, client)
+
+            # The checkpoint only moves past fully processed pages; a page cut short by the
+            # budget is rescanned next run, and its deleted items no longer show up there.
+            if budget_hit:
                 break
-
-        if not delete_ids:
-            return 0
-
-        commands = [
-            {
-                "type": "item_delete",
-                "uuid": str(item_id),
-                "args": {"id": item_id},
-            }
-            for item_id in delete_ids
-        ]
-        sync_response = client.post(
-            f"{TODOIST_SYNC_URL}/sync",
-            json={"commands": commands},
-            headers=headers,
-        )
-        sync_response.raise_for_status()
-        _request_json(sync_response, "Todoist response invalid")
-        return len(delete_ids)
+            if next_cursor is None:
+                report.exhausted = True
+                if checkpoint:
+                    checkpoint.clear(parent_id)
+                break
+            cursor = next_cursor
+            if checkpoint:
+                checkpoint.save(parent_id, cursor)
     except httpx.HTTPError as exc:
         raise TodoistServiceError("Todoist request failed") from exc
     finally:
-        if close_client:
-            client.close()
+        report.elapsed_seconds = time.monotonic() - started
+    return report
+
+
+def cleanup_completed_subtasks(
+    parent_id: str,
+    api_token: str,
+    *,
+    older_than_days: int = 7,
+    max_delete: int = CLEANUP_MAX_ITEMS,
+    checkpoint: Optional[InMemoryCheckpointStore] = None,
+    client: Optional[httpx.Client] = None,
+    now: Optional[datetime] = None,
+) -> int:
+    report = cleanup_archived_subtasks(
+        parent_id,
+        api_token,
+        older_than_days=older_than_days,
+        max_delete=max_delete,
+        max_pages=1,
+        checkpoint=checkpoint,
+        client=client,
+        now=now,
+    )
+    return report.deleted
+
+
+def find_todo_later_task(
+    task_name: str,
+    api_token: str,
+    *,
+    client: Optional[httpx.Client] = None,
+) -> Optional[str]:
+    # Read-only counterpart of ensure_todo_later_task: never creates the task or moves its due date.
+    validate_task_name(task_name, api_token)
+    task = _find_task(task_name, api_token, client or get_http_client())
+    return str(task["id"]) if task is not None else None
+
+
+def _find_task(task_name: str, api_token: str, client: httpx.Client) -> Optional[dict[str, Any]]:
+    for task in iter_tasks(api_token, query=_search_query(task_name.strip()), client=client):
+        if task.get("content") == task_name and task.get("id"):
+            return task
+    return None
 
 
 def ensure_todo_later_task(
@@ -194,35 +449,26 @@ def ensure_todo_later_task(
     *,
     client: Optional[httpx.Client] = None,
 ) -> str:
-    _validate_task_name(task_name, api_token)
+    validate_task_name(task_name, api_token)
 
     headers = {"Authorization": f"Bearer {api_token}"}
-    close_client = False
     if client is None:
-        client = httpx.Client(timeout=10.0)
-        close_client = True
+        client = get_http_client()
 
+    task = _find_task(task_name, api_token, client)
     try:
-        response = client.get(TODOIST_TASKS_URL, headers=headers)
-        response.raise_for_status()
-        tasks_payload = _request_json(response, "Todoist response invalid")
-        for task in _extract_tasks(tasks_payload):
-            if task.get("content") == task_name:
-                task_id = task.get("id")
-                if task_id:
-                    if not _is_due_today(task.get("due")):
-                        _set_task_due_today(str(task_id), headers, client)
-                    return str(task_id)
+        if task is not None:
+            if not is_due_today(task.get("due")):
+                set_task_due_today(str(task["id"]), headers, client)
+            return str(task["id"])
 
         payload = {"content": task_name.strip(), "due_string": DEFAULT_TODO_LATER_DUE_STRING}
-        create_response = client.post(TODOIST_TASKS_URL, json=payload, headers=headers)
+        with span("todoist.create_task"):
+            create_response = client.post(TODOIST_TASKS_URL, json=payload, headers=headers)
         create_response.raise_for_status()
-        created = _request_json(create_response, "Todoist response invalid")
+        created = request_json(create_response, "Todoist response invalid")
     except httpx.HTTPError as exc:
         raise TodoistServiceError("Todoist request failed") from exc
-    finally:
-        if close_client:
-            client.close()
 
     if not isinstance(created, dict) or "id" not in created:
         raise TodoistServiceError("Todoist response invalid")
@@ -248,24 +494,167 @@ def create_subtask(
         payload["description"] = description.strip()
     headers = {"Authorization": f"Bearer {api_token}"}
 
-    close_client = False
     if client is None:
-        client = httpx.Client(timeout=10.0)
-        close_client = True
+        client = get_http_client()
 
     try:
-        response = client.post(TODOIST_TASKS_URL, json=payload, headers=headers)
+        with span("todoist.create_task"):
+            response = client.post(TODOIST_TASKS_URL, json=payload, headers=headers)
         response.raise_for_status()
         data = response.json()
     except httpx.HTTPError as exc:
         raise TodoistServiceError("Todoist request failed") from exc
     except ValueError as exc:
         raise TodoistServiceError("Todoist response invalid") from exc
-    finally:
-        if close_client:
-            client.close()
 
     if not isinstance(data, dict) or "id" not in data:
         raise TodoistServiceError("Todoist response invalid")
 
     return data
+
+
+def get_task(
+    task_id: str,
+    api_token: str,
+    *,
+    client: Optional[httpx.Client] = None,
+) -> dict[str, Any]:
+    if not task_id:
+        raise TodoistServiceError("Todoist task id is required")
+    if not api_token:
+        raise TodoistServiceError("Todoist API token is required")
+
+    headers = {"Authorization": f"Bearer {api_token}"}
+    if client is None:
+        client = get_http_client()
+
+    try:
+        with span("todoist.get_task"):
+            response = client.get(f"{TODOIST_TASKS_URL}/{task_id}", headers=headers)
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise TodoistServiceError("Todoist request failed") from exc
+    data = request_json(response, "Todoist response invalid")
+    if not isinstance(data, dict):
+        raise TodoistServiceError("Todoist response invalid")
+    return data
+
+
+def update_task_content(
+    task_id: str,
+    content: str,
+    api_token: str,
+    *,
+    client: Optional[httpx.Client] = None,
+) -> dict[str, Any]:
+    if not content or not content.strip():
+        raise TodoistServiceError("Message text is required")
+    return _update_task(task_id, {"content": _normalize_task_content(content)}, api_token, client)
+
+
+def update_task_description(
+    task_id: str,
+    description: str,
+    api_token: str,
+    *,
+    client: Optional[httpx.Client] = None,
+) -> dict[str, Any]:
+    return _update_task(task_id, {"description": description.strip()}, api_token, client)
+
+
+def _update_task(
+    task_id: str,
+    payload: dict[str, Any],
+    api_token: str,
+    client: Optional[httpx.Client],
+) -> dict[str, Any]:
+    if not task_id:
+        raise TodoistServiceError("Todoist task id is required")
+    if not api_token:
+        raise TodoistServiceError("Todoist API token is required")
+
+    headers = {"Authorization": f"Bearer {api_token}"}
+    if client is None:
+        client = get_http_client()
+
+    try:
+        with span("todoist.update_task"):
+            response = client.post(f"{TODOIST_TASKS_URL}/{task_id}", json=payload, headers=headers)
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise TodoistServiceError("Todoist request failed") from exc
+    data = request_json(response, "Todoist response invalid")
+    if not isinstance(data, dict):
+        raise TodoistServiceError("Todoist response invalid")
+    return data
+
+
+def upload_file(
+    file: IO[bytes],
+    file_name: str,
+    api_token: str,
+    *,
+    content_type: Optional[str] = None,
+    client: Optional[httpx.Client] = None,
+) -> dict[str, Any]:
+    # file is read chunk by chunk while the request is sent. When its size cannot be known
+    # up front the body goes out with chunked transfer encoding, so nothing is buffered.
+    if not file_name:
+        raise TodoistServiceError("Upload file name is required")
+    if not api_token:
+        raise TodoistServiceError("Todoist API token is required")
+
+    headers = {"Authorization": f"Bearer {api_token}"}
+    if client is None:
+        client = get_http_client()
+
+    try:
+        with span("todoist.upload"):
+            response = client.post(
+                TODOIST_UPLOADS_URL,
+                files={"file": (file_name, file, content_type or "application/octet-stream")},
+                data={"file_name": file_name},
+                headers=headers,
+                timeout=TODOIST_UPLOAD_TIMEOUT_SECONDS,
+            )
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise TodoistServiceError("Todoist upload failed") from exc
+    data = request_json(response, "Todoist response invalid")
+    if not isinstance(data, dict) or not data.get("file_url"):
+        raise TodoistServiceError("Todoist response invalid")
+    return data
+
+
+def add_task_comment(
+    task_id: str,
+    content: str,
+    api_token: str,
+    *,
+    attachment: Optional[dict[str, Any]] = None,
+    client: Optional[httpx.Client] = None,
+) -> dict[str, Any]:
+    if not task_id:
+        raise TodoistServiceError("Todoist task id is required")
+    if not content or not content.strip():
+        raise TodoistServiceError("Comment text is required")
+    if not api_token:
+        raise TodoistServiceError("Todoist API token is required")
+
+    payload: dict[str, Any] = {"task_id": task_id, "content": content.strip()}
+    if attachment:
+        payload["attachment"] = attachment
+    headers = {"Authorization": f"Bearer {api_token}"}
+    if client is None:
+        client = get_http_client()
+
+    try:
+        with span("todoist.add_comment"):
+            response = client.post(TODOIST_COMMENTS_URL, json=payload, headers=headers)
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise TodoistServiceError("Todoist request failed") from exc
+    data = request_json(response, "Todoist response invalid")
+    if not isinstance(data, dict) or "id" not in data:
+        raise TodoistServiceError("Todoist response invalid")
+    return data
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Optional
+
+import httpx
+
+from app.http_client import get_http_client
+from app.todoist import (
+    CLEANUP_MAX_ITEMS,
+    TODOIST_SYNC_URL,
+    InMemoryCheckpointStore,
+    TodoistServiceError,
+    cleanup_completed_subtasks,
+    ensure_todo_later_task,
+    is_due_today,
+    request_json,
+    set_task_due_today,
+    validate_task_name,
+)
+from app.tracing import span
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    import sqlite3
+
+FULL_SYNC_TOKEN = "*"
+DEFAULT_SYNC_INTERVAL_SECONDS = 30.0
+
+
+class TodoistReplica:
+    # Mirrors the "todo later" parent and its subtasks from /sync. After the first full
+    # sync only deltas travel, and callers answer parent/cleanup questions locally.
+    def __init__(
+        self,
+        task_name: str,
+        api_token: str,
+        *,
+        path: Optional[str] = None,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL_SECONDS,
+    ) -> None:
+        validate_task_name(task_name, api_token)
+        self.task_name = task_name.strip()
+        self._api_token = api_token
+        self._sync_interval = sync_interval
+        self._sync_token = FULL_SYNC_TOKEN
+        self._last_sync: Optional[float] = None
+        self._parent_id: Optional[str] = None
+        self._items: dict[str, dict[str, Any]] = {}
+        self._dirty: set[str] = set()
+        self._reset_store = False
+        # _lock guards the mirrored state and is never held across a request; _sync_lock
+        # serializes the operations that talk to Todoist so readers are not blocked by them.
+        self._lock = threading.RLock()
+        self._sync_lock = threading.RLock()
+        self._db: Optional["sqlite3.Connection"] = None
+        if path:
+            self._open(path)
+
+    @property
+    def sync_token(self) -> str:
+        with self._lock:
+            return self._sync_token
+
+    def parent(self) -> Optional[dict[str, Any]]:
+        with self._lock:
+            if self._parent_id is None:
+                return None
+            return self._items.get(self._parent_id)
+
+    def children(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [item for item in self._items.values() if item.get("parent_id") == self._parent_id]
+
+    def sync(self, *, client: Optional[httpx.Client] = None, force: bool = False) -> bool:
+        with self._sync_lock:
+            with self._lock:
+                if (
+                    not force
+                    and self._last_sync is not None
+                    and time.monotonic() - self._last_sync < self._sync_interval
+                ):
+                    return False
+                sync_token = self._sync_token
+            if client is None:
+                client = get_http_client()
+            try:
+                with span("todoist.sync"):
+                    response = client.post(
+                        f"{TODOIST_SYNC_URL}/sync",
+                        json={"sync_token": sync_token, "resource_types": ["items"]},
+                        headers={"Authorization": f"Bearer {self._api_token}"},
+                    )
+                response.raise_for_status()
+            except httpx.HTTPError as exc:
+                raise TodoistServiceError("Todoist request failed") from exc
+            payload = request_json(response, "Todoist response invalid")
+            if not isinstance(payload, dict) or not isinstance(payload.get("sync_token"), str):
+                raise TodoistServiceError("Todoist response invalid")
+            items = payload.get("items") or []
+            if not isinstance(items, list):
+                raise TodoistServiceError("Todoist response invalid")
+            with self._lock:
+                self._apply(items, full_sync=bool(payload.get("full_sync")))
+                self._sync_token = payload["sync_token"]
+                self._last_sync = time.monotonic()
+                self._persist()
+            return True
+
+    def record(self, task: dict[str, Any]) -> None:
+        # Writes made through REST are folded in right away; the next delta confirms them.
+        with self._lock:
+            self._apply([task], full_sync=False)
+            self._persist()
+
+    def ensure_parent(self, *, client: Optional[httpx.Client] = None) -> str:
+        if client is None:
+            client = get_http_client()
+        with self._sync_lock:
+            self.sync(client=client)
+            parent = self.parent()
+            if parent is None:
+                parent_id = ensure_todo_later_task(self.task_name, self._api_token, client=client)
+                self.sync(client=client, force=True)
+                return parent_id
+            if not is_due_today(parent.get("due")):
+                try:
+                    set_task_due_today(
+                        str(parent["id"]),
+                        {"Authorization": f"Bearer {self._api_token}"},
+                        client,
+                    )
+                except httpx.HTTPError as exc:
+                    raise TodoistServiceError("Todoist request failed") from exc
+                with self._lock:
+                    self._last_sync = None
+            return str(parent["id"])
+
+    def cleanup_completed(
+        self,
+        *,
+        older_than_days: int = 7,
+        max_delete: int = CLEANUP_MAX_ITEMS,
+        checkpoint: Optional[InMemoryCheckpointStore] = None,
+        client: Optional[httpx.Client] = None,
+        now: Optional[datetime] = None,
+    ) -> int:
+        # /sync only returns active items, so subtasks completed before this process (or its
+        # persisted sync token) started never reach the replica. The completed archive decides
+        # what to delete; the replica only supplies the parent id and drops what was removed.
+        parent_id = self.ensure_parent(client=client)
+        deleted = cleanup_completed_subtasks(
+            parent_id,
+            self._api_token,
+            older_than_days=older_than_days,
+            max_delete=max_delete,
+            checkpoint=checkpoint,
+            client=client,
+            now=now,
+        )
+        if deleted:
+            with self._lock:
+                self._last_sync = None
+        return deleted
+
+    def _apply(self, items: list[Any], *, full_sync: bool) -> None:
+        if full_sync:
+            self._items.clear()
+            self._parent_id = None
+            self._reset_store = True
+        tasks = [item for item in items if isinstance(item, dict) and item.get("id") is not None]
+        # Parents first, so children that arrive in the same batch are recognised.
+        for item in tasks:
+            item_id = str(item["id"])
+            if not item.get("is_deleted") and self._is_parent_candidate(item):
+                self._parent_id = item_id
+                self._store(item_id, {**item, "id": item_id})
+            elif item_id == self._parent_id:
+                # The parent was deleted, completed or renamed: its subtree is no longer ours.
+                for child_id in list(self._items):
+                    self._drop(child_id)
+                self._parent_id = None
+        for item in tasks:
+            item_id = str(item["id"])
+            if item_id == self._parent_id:
+                continue
+            if (
+                not item.get("is_deleted")
+                and self._parent_id is not None
+                and str(item.get("parent_id")) == self._parent_id
+            ):
+                self._store(item_id, {**item, "id": item_id, "parent_id": self._parent_id})
+            elif item_id in self._items:
+                self._drop(item_id)
+
+    def _store(self, item_id: str, item: dict[str, Any]) -> None:
+        self._items[item_id] = item
+        self._dirty.add(item_id)
+
+    def _drop(self, item_id: str) -> None:
+        self._items.pop(item_id, None)
+        self._dirty.add(item_id)
+
+    def _is_parent_candidate(self, item: dict[str, Any]) -> bool:
+        if item.get("content") != self.task_name or item.get("parent_id"):
+            return False
+        if item.get("checked"):
+            return False
+        return self._parent_id is None or self._parent_id == str(item["id"])
+
+    def _open(self, path: str) -> None:
+        import sqlite3
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS items (id TEXT PRIMARY KEY, payload TEXT NOT NULL)")
+        rows = dict(self._db.execute("SELECT key, value FROM meta").fetchall())
+        if rows.get("task_name") != self.task_name:
+            return
+        self._sync_token = rows.get("sync_token", FULL_SYNC_TOKEN)
+        self._parent_id = rows.get("parent_id") or None
+        for item_id, payload in self._db.execute("SELECT id, payload FROM items"):
+            self._items[item_id] = json.loads(payload)
+
+    def _persist(self) -> None:
+        if self._db is None:
+            self._dirty.clear()
+            self._reset_store = False
+            return
+        with self._db:
+            if self._reset_store:
+                self._db.execute("DELETE FROM items")
+            for item_id in self._dirty:
+                item = self._items.get(item_id)
+                if item is None:
+                    self._db.execute("DELETE FROM items WHERE id = ?", (item_id,))
+                else:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO items (id, payload) VALUES (?, ?)",
+                        (item_id, json.dumps(item)),
+                    )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [
+                    ("task_name", self.task_name),
+                    ("sync_token", self._sync_token),
+                    ("parent_id", self._parent_id or ""),
+                ],
+            )
+        self._dirty.clear()
+        self._reset_store = False
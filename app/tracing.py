@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import abc
+import itertools
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Optional, TextIO
+
+TRACE_ORDERS = ("recent", "slowest")
+SERVICE_NAME = "gatchan"
+
+logger = logging.getLogger("gatchan")
+_current: ContextVar[Optional["Trace"]] = ContextVar("gatchan_trace", default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar("gatchan_span", default=None)
+# Span ids only need to be unique within a trace; a counter from a random per-process start
+# is far cheaper on the request thread than drawing random bits, and is formatted on export.
+_span_ids = itertools.count(random.getrandbits(63) + 1)
+
+
+class Trace:
+    # One webhook request. Spans are plain tuples appended from whichever thread runs the
+    # stage; list.append is atomic, so recording takes no lock.
+    __slots__ = ("request_id", "update_id", "chat_id", "started_at", "_origin", "duration_ms", "status", "spans")
+
+    def __init__(self, request_id: str, update_id: int, chat_id: Optional[int]) -> None:
+        self.request_id = request_id
+        self.update_id = update_id
+        self.chat_id = chat_id
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status: Optional[int] = None
+        self.spans: list[tuple[str, float, float, Optional[str]]] = []
+
+    @property
+    def trace_id(self) -> str:
+        # request ids are uuid4 strings: 32 hex digits, the width of an OTLP trace id.
+        return self.request_id.replace("-", "")
+
+    @property
+    def failed(self) -> bool:
+        return (self.status is not None and self.status >= 400) or any(span[3] for span in self.spans)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "update_id": self.update_id,
+            "chat_id": self.chat_id,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "spans": [
+                {"name": name, "start_ms": round(start, 3), "duration_ms": round(duration, 3), "error": error}
+                for name, start, duration, error in list(self.spans)
+            ],
+        }
+
+
+class _Span:
+    __slots__ = ("_trace", "_name", "_started", "_id", "_parent", "_token")
+
+    def __init__(self, trace: Trace, name: str) -> None:
+        self._trace = trace
+        self._name = name
+        self._token: Any = None
+
+    def __enter__(self) -> None:
+        if _processor is not None:
+            self._id = next(_span_ids)
+            self._parent = _current_span.get()
+            self._token = _current_span.set(self._id)
+        self._started = time.perf_counter()
+
+    def __exit__(self, exc_type: Optional[type], exc: Optional[BaseException], _tb: object) -> None:
+        ended = time.perf_counter()
+        trace = self._trace
+        error = exc_type.__name__ if exc_type is not None else None
+        trace.spans.append((self._name, (self._started - trace._origin) * 1000, (ended - self._started) * 1000, error))
+        if self._token is None:
+            return
+        _current_span.reset(self._token)
+        processor = _processor
+        if processor is not None:
+            processor.on_end(
+                (trace, self._name, self._id, self._parent, self._started, ended, error, str(exc) if exc else None)
+            )
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *_: object) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str) -> Any:
+    # Times a stage or outbound call of the current request; a shared no-op outside of one.
+    trace = _current.get()
+    return _NOOP if trace is None else _Span(trace, name)
+
+
+def _unix_nanos(trace: Trace, perf: float) -> int:
+    return int((trace.started_at + perf - trace._origin) * 1e9)
+
+
+def _otlp_span(record: tuple) -> dict[str, Any]:
+    # Only runs on the exporter thread, so building dicts never touches the request path.
+    trace, name, span_id, parent_id, started, ended, error, message = record
+    attributes = [
+        {"key": "request_id", "value": {"stringValue": trace.request_id}},
+        {"key": "update_id", "value": {"intValue": str(trace.update_id)}},
+    ]
+    if trace.chat_id is not None:
+        attributes.append({"key": "chat_id", "value": {"intValue": str(trace.chat_id)}})
+    payload: dict[str, Any] = {
+        "traceId": trace.trace_id,
+        "spanId": f"{span_id:016x}",
+        "name": name,
+        "kind": 3 if "." in name else 1,  # CLIENT for upstream calls, INTERNAL for stages
+        "startTimeUnixNano": str(_unix_nanos(trace, started)),
+        "endTimeUnixNano": str(_unix_nanos(trace, ended)),
+        "attributes": attributes,
+        "status": {"code": 2, "message": message or error} if error else {"code": 1},
+    }
+    if parent_id is not None:
+        payload["parentSpanId"] = f"{parent_id:016x}"
+    return payload
+
+
+class SpanExporter(abc.ABC):
+    # Receives finished spans in OTLP/JSON shape, one batch at a time, off the request path.
+    @abc.abstractmethod
+    def export(self, spans: list[dict[str, Any]]) -> None: ...
+
+    def shutdown(self) -> None:
+        return None
+
+
+class StdoutExporter(SpanExporter):
+    def __init__(self, stream: Optional[TextIO] = None) -> None:
+        self._stream = stream
+
+    def export(self, spans: list[dict[str, Any]]) -> None:
+        stream = self._stream or sys.stdout
+        stream.write("".join(json.dumps(item, separators=(",", ":")) + "\n" for item in spans))
+        stream.flush()
+
+
+class OtlpFileExporter(SpanExporter):
+    # One ExportTraceServiceRequest per line, the OpenTelemetry collector's file format, so
+    # the file can be replayed into any OTLP backend later.
+    def __init__(self, path: str | Path) -> None:
+        self._path = Path(path)
+
+    def export(self, spans: list[dict[str, Any]]) -> None:
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                    "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": spans}],
+                }
+            ]
+        }
+        line = json.dumps(request, separators=(",", ":")) + "\n"
+        with self._path.open("a", encoding="utf-8") as handle:
+            handle.write(line)
+
+
+class BatchSpanProcessor:
+    # Finished spans go into a bounded deque (dropped, and counted, when it is full); a
+    # background thread exports them in batches every flush interval or when a batch fills.
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        *,
+        max_queue_size: int = 2048,
+        max_batch_size: int = 256,
+        flush_interval_seconds: float = 1.0,
+    ) -> None:
+        self._exporter = exporter
+        self._max_queue_size = max_queue_size
+        self._max_batch_size = max_batch_size
+        self._interval = flush_interval_seconds
+        self._queue: deque[tuple] = deque()
+        self._wake = threading.Event()
+        self._flushed = threading.Condition()
+        self._closed = False
+        self._exporting = False
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def on_end(self, record: tuple) -> None:
+        if len(self._queue) >= self._max_queue_size:
+            self.dropped += 1
+            return
+        self._queue.append(record)
+        if len(self._queue) >= self._max_batch_size:
+            self._wake.set()
+
+    def force_flush(self, timeout: float = 5.0) -> bool:
+        self._wake.set()
+        with self._flushed:
+            return self._flushed.wait_for(lambda: not self._queue and not self._exporting, timeout)
+
+    def shutdown(self, timeout: float = 5.0) -> bool:
+        flushed = self.force_flush(timeout)
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout)
+        self._exporter.shutdown()
+        return flushed
+
+    def stats(self) -> dict[str, int]:
+        return {"queued": len(self._queue), "exported": self.exported, "dropped": self.dropped, "failed": self.failed}
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self._interval)
+            self._wake.clear()
+            self._drain()
+
+    def _drain(self) -> None:
+        while self._queue:
+            with self._flushed:
+                self._exporting = True
+            batch = []
+            while self._queue and len(batch) < self._max_batch_size:
+                batch.append(self._queue.popleft())
+            try:
+                self._exporter.export([_otlp_span(record) for record in batch])
+                self.exported += len(batch)
+            except Exception as exc:
+                self.failed += len(batch)
+                logger.warning("span_export_failed", extra={"error": str(exc), "spans": len(batch)})
+        with self._flushed:
+            self._exporting = False
+            self._flushed.notify_all()
+
+
+_processor: Optional[BatchSpanProcessor] = None
+
+
+def configure_tracing(exporter: Optional[SpanExporter], **options: Any) -> None:
+    # Spans are exported only while a processor is installed; the flight recorder always runs.
+    global _processor
+    previous, _processor = _processor, None
+    if previous is not None:
+        previous.shutdown()
+    if exporter is not None:
+        _processor = BatchSpanProcessor(exporter, **options)
+
+
+def shutdown_tracing(timeout: float = 5.0) -> None:
+    global _processor
+    processor, _processor = _processor, None
+    if processor is not None:
+        processor.shutdown(timeout)
+
+
+def tracing_stats() -> Optional[dict[str, int]]:
+    processor = _processor
+    return processor.stats() if processor is not None else None
+
+
+def exporter_for(name: str, *, path: str) -> SpanExporter:
+    if name == "stdout":
+        return StdoutExporter()
+    if name == "otlp-file":
+        return OtlpFileExporter(path)
+    raise ValueError(f"Unknown tracing exporter: {name}")
+
+
+class FlightRecorder:
+    # The last `capacity` finished traces in a preallocated ring, for /debug/traces.
+    def __init__(self, capacity: int) -> None:
+        self._capacity = capacity
+        self._ring: list[Optional[Trace]] = [None] * capacity
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def start(self, request_id: str, update_id: int, chat_id: Optional[int]) -> Optional[Trace]:
+        if not self._capacity:
+            return None
+        trace = Trace(request_id, update_id, chat_id)
+        _current.set(trace)
+        return trace
+
+    def finish(self, trace: Optional[Trace], status: int) -> None:
+        if trace is None:
+            return
+        trace.duration_ms = round((time.perf_counter() - trace._origin) * 1000, 3)
+        trace.status = status
+        with self._lock:
+            self._ring[self._next] = trace
+            self._next = (self._next + 1) % self._capacity
+
+    def query(
+        self,
+        *,
+        limit: int = 20,
+        order: str = "recent",
+        errors: bool = False,
+        chat_id: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        if order not in TRACE_ORDERS:
+            raise ValueError(f"Unknown trace order: {order}")
+        with self._lock:
+            traces = self._ring[self._next :] + self._ring[: self._next]
+        selected = [
+            trace
+            for trace in reversed(traces)
+            if trace is not None
+            and (not errors or trace.failed)
+            and (chat_id is None or trace.chat_id == chat_id)
+        ]
+        if order == "slowest":
+            selected.sort(key=lambda trace: trace.duration_ms or 0.0, reverse=True)
+        return [trace.to_dict() for trace in selected[:limit]]
+
+
+_recorder: Optional[FlightRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_flight_recorder(capacity: int) -> FlightRecorder:
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = FlightRecorder(capacity)
+        return _recorder
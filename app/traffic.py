@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import re
+import statistics
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import httpx
+
+REDACTED = "[redacted]"
+# Message bodies keep their length, so entity offsets and normalizer work stay realistic on replay.
+_BODY_KEYS = frozenset({"text", "caption"})
+_BODY_FILLER = "x"
+_SECRET_KEY = re.compile(r"token|secret|password|api_?key|authorization", re.IGNORECASE)
+# Bot API URLs embed the token: https://api.telegram.org/bot<id>:<secret>/... and /file/bot<...>/
+_BOT_TOKEN = re.compile(r"bot\d+:[A-Za-z0-9_-]+")
+
+logger = logging.getLogger("gatchan")
+
+
+def redact(value: Any, secrets: Iterable[str] = (), *, text_chars: Optional[int] = None) -> Any:
+    # text_chars keeps that many leading characters of message text and captions and
+    # overwrites the rest; None keeps bodies whole.
+    literals = [secret for secret in secrets if secret]
+    return _redact(value, literals, text_chars)
+
+
+def _redact(value: Any, secrets: list[str], text_chars: Optional[int] = None) -> Any:
+    if isinstance(value, dict):
+        return {key: _redact_field(key, item, secrets, text_chars) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact(item, secrets, text_chars) for item in value]
+    if isinstance(value, str):
+        value = _BOT_TOKEN.sub("bot" + REDACTED, value)
+        for secret in secrets:
+            value = value.replace(secret, REDACTED)
+    return value
+
+
+def _redact_field(key: Any, value: Any, secrets: list[str], text_chars: Optional[int]) -> Any:
+    if _SECRET_KEY.search(str(key)):
+        return REDACTED
+    if key in _BODY_KEYS and isinstance(value, str) and text_chars is not None:
+        value = _truncate(value, text_chars)
+    return _redact(value, secrets, text_chars)
+
+
+def _truncate(value: str, keep: int) -> str:
+    if len(value) <= keep:
+        return value
+    return value[:keep] + _BODY_FILLER * (len(value) - keep)
+
+
+class TrafficRecorder:
+    # Appends sampled, redacted webhook payloads with their outcome to a JSONL file that
+    # rotates like RotatingFileHandler (path.1 is the newest backup). record() only queues;
+    # a background thread redacts and writes, so the request path never touches the disk.
+    # Entries are dropped (and counted) while the queue is full.
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        sample_rate: float = 1.0,
+        max_bytes: int = 50 * 1024 * 1024,
+        backups: int = 3,
+        secrets: Iterable[str] = (),
+        text_chars: Optional[int] = 0,
+        max_queue_size: int = 1024,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        self._path = Path(path)
+        self._sample_rate = sample_rate
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._secrets = [secret for secret in secrets if secret]
+        self._text_chars = text_chars
+        self._max_queue_size = max_queue_size
+        self._rng = rng
+        self._queue: deque[dict[str, Any]] = deque()
+        self._wake = threading.Event()
+        self._flushed = threading.Condition()
+        self._writing = False
+        self._closed = False
+        self.recorded = 0
+        self.dropped = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="traffic-recorder", daemon=True)
+        self._thread.start()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def sampled(self) -> bool:
+        return self._sample_rate >= 1 or self._rng() < self._sample_rate
+
+    def record(
+        self,
+        payload: Any,
+        *,
+        status: int,
+        duration_ms: float,
+        request_id: Optional[str] = None,
+        timestamp: Optional[float] = None,
+    ) -> None:
+        if self._closed or len(self._queue) >= self._max_queue_size:
+            self.dropped += 1
+            return
+        self._queue.append(
+            {
+                "ts": timestamp if timestamp is not None else time.time(),
+                "request_id": request_id,
+                "status": status,
+                "duration_ms": round(duration_ms, 3),
+                "update": payload,
+            }
+        )
+        self._wake.set()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        self._wake.set()
+        with self._flushed:
+            return self._flushed.wait_for(lambda: not self._queue and not self._writing, timeout)
+
+    def close(self, timeout: float = 5.0) -> bool:
+        flushed = self.flush(timeout)
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout)
+        return flushed
+
+    def stats(self) -> dict[str, int]:
+        return {"queued": len(self._queue), "recorded": self.recorded, "dropped": self.dropped, "failed": self.failed}
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            self._drain()
+
+    def _drain(self) -> None:
+        while self._queue:
+            with self._flushed:
+                self._writing = True
+            lines = []
+            while self._queue:
+                entry = self._queue.popleft()
+                entry["update"] = _redact(entry["update"], self._secrets, self._text_chars)
+                lines.append((json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+            try:
+                self._write(lines)
+            except OSError as exc:
+                self.failed += len(lines)
+                logger.warning("traffic_record_failed", extra={"error": str(exc), "entries": len(lines)})
+        with self._flushed:
+            self._writing = False
+            self._flushed.notify_all()
+
+    def _write(self, lines: list[bytes]) -> None:
+        handle = None
+        try:
+            for data in lines:
+                if self._max_bytes > 0 and self._size() + len(data) > self._max_bytes:
+                    if handle is not None:
+                        handle.close()
+                        handle = None
+                    self._rotate()
+                if handle is None:
+                    handle = self._path.open("ab")
+                handle.write(data)
+                handle.flush()
+                self.recorded += 1
+        finally:
+            if handle is not None:
+                handle.close()
+
+    def _size(self) -> int:
+        try:
+            return self._path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _rotate(self) -> None:
+        if self._backups < 1:
+            self._path.unlink(missing_ok=True)
+            return
+        for index in range(self._backups - 1, 0, -1):
+            source = self._backup(index)
+            if source.exists():
+                source.replace(self._backup(index + 1))
+        if self._path.exists():
+            self._path.replace(self._backup(1))
+
+    def _backup(self, index: int) -> Path:
+        return self._path.with_name(f"{self._path.name}.{index}")
+
+
+def read_recording(paths: Iterable[str | Path]) -> list[dict[str, Any]]:
+    # Accepts rotated files in any order; entries come back sorted by capture time.
+    entries = [entry for path in paths for entry in _read_lines(Path(path))]
+    entries.sort(key=lambda entry: entry.get("ts", 0))
+    return entries
+
+
+def _read_lines(path: Path) -> Iterator[dict[str, Any]]:
+    with path.open(encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and isinstance(entry.get("update"), dict):
+                yield entry
+
+
+@dataclass
+class ReplayReport:
+    requests: int = 0
+    elapsed_seconds: float = 0.0
+    statuses: Counter = field(default_factory=Counter)
+    latencies_ms: list[float] = field(default_factory=list)
+    recorded_latencies_ms: list[float] = field(default_factory=list)
+    max_lag_ms: float = 0.0
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "requests_per_sec": round(self.requests / self.elapsed_seconds, 1) if self.elapsed_seconds else None,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "latency_ms": _percentiles(self.latencies_ms),
+            "recorded_latency_ms": _percentiles(self.recorded_latencies_ms),
+            "max_dispatch_lag_ms": round(self.max_lag_ms, 1),
+        }
+
+
+def _percentiles(values: list[float]) -> Optional[dict[str, float]]:
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def at(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 2)
+
+    return {"p50": round(statistics.median(ordered), 2), "p95": at(0.95), "p99": at(0.99), "max": round(ordered[-1], 2)}
+
+
+async def replay_recording(
+    app: Any,
+    entries: list[dict[str, Any]],
+    *,
+    secret: str,
+    speed: Optional[float] = 1.0,
+    concurrency: int = 64,
+    path: str = "/webhook",
+) -> ReplayReport:
+    # speed=N keeps the recorded gaps divided by N (open loop, so a slow build falls behind
+    # and shows up as lag); speed=None sends as fast as `concurrency` allows.
+    report = ReplayReport()
+    if not entries:
+        return report
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret}
+    first_ts = entries[0].get("ts", 0)
+    limit = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+        started = time.perf_counter()
+
+        async def send(entry: dict[str, Any]) -> None:
+            async with limit:
+                sent = time.perf_counter()
+                response = await client.post(path, json=entry["update"], headers=headers)
+                report.latencies_ms.append((time.perf_counter() - sent) * 1000)
+                report.statuses[response.status_code] += 1
+
+        tasks = []
+        for entry in entries:
+            if speed:
+                offset = (entry.get("ts", first_ts) - first_ts) / speed
+                delay = offset - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    report.max_lag_ms = max(report.max_lag_ms, -delay * 1000)
+            if "duration_ms" in entry:
+                report.recorded_latencies_ms.append(float(entry["duration_ms"]))
+            tasks.append(asyncio.create_task(send(entry)))
+        await asyncio.gather(*tasks)
+        report.elapsed_seconds = time.perf_counter() - started
+    report.requests = len(entries)
+    return report
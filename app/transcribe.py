@@ -7,8 +7,12 @@ from typing import Any, Optional
 
 import httpx
 
+from app.http_client import get_http_client
+from app.tracing import span
+
 GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
 DEFAULT_GEMINI_MODEL = "gemini-2.5-flash-lite"
+GEMINI_TIMEOUT_SECONDS = 30.0
 
 
 @dataclass(frozen=True)
@@ -52,26 +56,23 @@ def transcribe_audio_with_gemini(
         ]
     }
 
-    close_client = False
     if client is None:
-        client = httpx.Client(timeout=30.0)
-        close_client = True
+        client = get_http_client()
 
     try:
-        response = client.post(
-            f"{GEMINI_API_BASE}/models/{model}:generateContent",
-            headers={"x-goog-api-key": api_key},
-            json=payload,
-        )
+        with span("gemini.generate_content"):
+            response = client.post(
+                f"{GEMINI_API_BASE}/models/{model}:generateContent",
+                headers={"x-goog-api-key": api_key},
+                json=payload,
+                timeout=GEMINI_TIMEOUT_SECONDS,
+            )
         response.raise_for_status()
         data = response.json()
     except httpx.HTTPError as exc:
         raise TranscriptionError("Gemini request failed") from exc
     except ValueError as exc:
         raise TranscriptionError("Gemini response invalid") from exc
-    finally:
-        if close_client:
-            client.close()
 
     try:
         candidates = data.get("candidates", []) if isinstance(data, dict) else []
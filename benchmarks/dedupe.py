@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from app.dedupe import DedupeRing  # noqa: E402
+
+TTL_SECONDS = 300
+
+
+class OrderedDictDedupe:
+    # The pre-ring implementation from app.main, kept here as the comparison baseline.
+    def __init__(self, capacity: int, ttl_seconds: float) -> None:
+        self._store: "OrderedDict[int, float]" = OrderedDict()
+        self._capacity = capacity
+        self._ttl_seconds = ttl_seconds
+
+    def check_and_add(self, update_id: int, now: Optional[float] = None) -> bool:
+        timestamp = now if now is not None else time.time()
+        expired_before = timestamp - self._ttl_seconds
+        while self._store:
+            _, stored_at = next(iter(self._store.items()))
+            if stored_at >= expired_before:
+                break
+            self._store.popitem(last=False)
+        if update_id in self._store:
+            return True
+        self._store[update_id] = timestamp
+        if len(self._store) > self._capacity:
+            self._store.popitem(last=False)
+        return False
+
+
+def _drive(store: object, operations: int) -> float:
+    check = store.check_and_add
+    now = 1_000_000.0
+    started = time.perf_counter()
+    for update_id in range(operations):
+        # Every fourth update is a Telegram retry of a recent one.
+        check(update_id - 3 if update_id % 4 == 3 else update_id, now)
+        now += 0.0001
+    return time.perf_counter() - started
+
+
+def run(factory: Callable[[int, float], object], capacity: int, operations: int) -> Dict[str, float]:
+    elapsed = _drive(factory(capacity, TTL_SECONDS), operations)
+
+    # Memory is measured on a separate pass so tracemalloc does not skew the timing.
+    tracemalloc.start()
+    store = factory(capacity, TTL_SECONDS)
+    _drive(store, operations)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "ops_per_sec": round(operations / elapsed),
+        "memory_mb": round(current / 1e6, 1),
+        "bytes_per_entry": round(current / min(capacity, operations), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare DedupeRing against the OrderedDict dedupe store")
+    parser.add_argument("--capacity", type=int, default=1_000_000)
+    parser.add_argument("--operations", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    results = {
+        "capacity": args.capacity,
+        "operations": args.operations,
+        "ordered_dict": run(OrderedDictDedupe, args.capacity, args.operations),
+        "dedupe_ring": run(DedupeRing, args.capacity, args.operations),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
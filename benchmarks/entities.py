@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from app.models import TelegramEntity, TelegramMessage  # noqa: E402
+from app.telegram_normalizer import normalize_message  # noqa: E402
+
+SEGMENTS = (
+    ("text_link", "read this", "https://example.com/a"),
+    ("url", "https://example.org/b", None),
+    ("mention", "@someone", None),
+    ("hashtag", "#later", None),
+    ("code", "make test", None),
+    ("plain", "👍 回头看 𠀋", None),
+)
+
+
+def _apply_text_links(text: str, entities: list[TelegramEntity]) -> str:
+    # The previous text_link-only renderer, kept here as the comparison baseline.
+    inserts: list[tuple[int, str]] = []
+    for entity in entities:
+        if entity.type == "text_link" and entity.url:
+            inserts.append((entity.offset + entity.length, f" ({entity.url})"))
+
+    if not inserts:
+        return text
+
+    inserts.sort(key=lambda item: item[0])
+    result: list[str] = []
+    cursor = 0
+    for position, snippet in inserts:
+        if position < cursor or position > len(text):
+            continue
+        result.append(text[cursor:position])
+        result.append(snippet)
+        cursor = position
+
+    result.append(text[cursor:])
+    return "".join(result)
+
+
+def build_message(entity_count: int) -> TelegramMessage:
+    parts: list[str] = []
+    entities: list[dict[str, object]] = []
+    offset = 0
+    for index in range(entity_count):
+        kind, value, url = SEGMENTS[index % len(SEGMENTS)]
+        if kind != "plain":
+            entity: dict[str, object] = {"type": kind, "offset": offset, "length": len(value.encode("utf-16-le")) // 2}
+            if url:
+                entity["url"] = url
+            entities.append(entity)
+        parts.append(value + " ")
+        offset += len((value + " ").encode("utf-16-le")) // 2
+    return TelegramMessage(message_id=1, text="".join(parts), entities=entities)
+
+
+def run(render: Callable[[TelegramMessage], str], message: TelegramMessage, iterations: int) -> Dict[str, float]:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        render(message)
+    elapsed = time.perf_counter() - started
+    return {"ops_per_sec": round(iterations / elapsed), "us_per_op": round(elapsed / iterations * 1e6, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark entity rendering in normalize_message")
+    parser.add_argument("--entities", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = []
+    for entity_count in args.entities:
+        message = build_message(entity_count)
+        results.append(
+            {
+                "entities": len(message.entities or []),
+                "text_length": len(message.text or ""),
+                "legacy_text_links": run(
+                    lambda item: _apply_text_links(item.text or "", item.entities or []), message, args.iterations
+                ),
+                "normalize_message": run(normalize_message, message, args.iterations),
+            }
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
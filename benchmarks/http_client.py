@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from app.http_client import HttpClientOptions, PooledTransport  # noqa: E402
+
+
+def start_local_server(latency_ms: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:  # noqa: N802 - http.server naming
+            time.sleep(latency_ms / 1000)
+            body = b'{"ok":true}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(url: str, http2: bool, requests: int, concurrency: int) -> Dict[str, Optional[float]]:
+    transport = PooledTransport(HttpClientOptions(http2=http2, max_connections_per_host=concurrency))
+    if http2 and not transport.http2:
+        transport.close()
+        return {"skipped": "h2 is not installed (pip install 'httpx[http2]')"}
+    latencies: list[float] = []
+    with httpx.Client(transport=transport, timeout=30) as client:
+
+        def call(_: int) -> None:
+            started = time.perf_counter()
+            client.get(url)
+            latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(call, range(requests)))
+        elapsed = time.perf_counter() - started
+        stats = transport.stats()
+    latencies.sort()
+    return {
+        "requests_per_sec": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "connections_opened": stats["connections_opened"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare HTTP/1.1 pooling with HTTP/2 multiplexing")
+    parser.add_argument("--url", help="HTTPS endpoint to hit; defaults to a local HTTP/1.1 server")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Local server response delay")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = start_local_server(args.latency_ms)
+        url = f"http://127.0.0.1:{server.server_address[1]}/"
+    results = {
+        "url": url,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "h2_installed": importlib.util.find_spec("h2") is not None,
+        "http1_pooled": run(url, False, args.requests, args.concurrency),
+    }
+    if url.startswith("https://"):
+        results["http2"] = run(url, True, args.requests, args.concurrency)
+    else:
+        results["http2"] = {"skipped": "HTTP/2 is negotiated over TLS; pass an https --url"}
+    if server is not None:
+        server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
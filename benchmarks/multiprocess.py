@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+SECRET = "bench-secret"
+# Updates from a user outside the whitelist are parsed, validated and answered without any
+# upstream call, which isolates the per-request CPU cost that extra workers spread out.
+ENV = {
+    "TELEGRAM_BOT_TOKEN": "bench-telegram",
+    "TELEGRAM_WEBHOOK_SECRET": SECRET,
+    "TELEGRAM_ALLOWED_USER_IDS": "[1]",
+    "TELEGRAM_WHITELIST_REPLY": "false",
+    "TODOIST_API_TOKEN": "bench-todoist",
+    "TODO_LATER_TASK_NAME": "todo later",
+    "STARTUP_PREWARM": "false",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("server did not become ready")
+
+
+def client_loop(url: str, start: int, count: int, results: multiprocessing.Queue) -> None:
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    with httpx.Client(timeout=30) as client:
+        for update_id in range(start, start + count):
+            payload = {
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id,
+                    "from": {"id": 2},
+                    "chat": {"id": 2, "type": "private"},
+                    "text": f"note {update_id} https://example.com/{update_id}",
+                },
+            }
+            client.post(f"{url}/webhook", json=payload, headers=headers)
+    results.put(count)
+
+
+def run(workers: int, requests: int, clients: int) -> Dict[str, float]:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, **ENV}
+    env.pop("SHARED_STATE_DIR", None)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(url)
+        per_client = requests // clients
+        results: multiprocessing.Queue = multiprocessing.Queue()
+        processes: List[multiprocessing.Process] = [
+            multiprocessing.Process(target=client_loop, args=(url, index * per_client, per_client, results))
+            for index in range(clients)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        sent = sum(results.get() for _ in processes)
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return {"workers": workers, "requests": sent, "requests_per_sec": round(sent / elapsed, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare webhook throughput across worker process counts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--clients", type=int, default=8, help="Load-generating processes")
+    args = parser.parse_args()
+
+    results = {
+        "cpu_count": os.cpu_count(),
+        "runs": [run(workers, args.requests, args.clients) for workers in dict.fromkeys(args.workers)],
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+SECRET = "replay-secret"
+PLACEHOLDER_ENV = {
+    "TELEGRAM_BOT_TOKEN": "replay-telegram-token",
+    "TELEGRAM_WEBHOOK_SECRET": SECRET,
+    "TODOIST_API_TOKEN": "replay-todoist-token",
+    "TODO_LATER_TASK_NAME": "todo later",
+    "TRANSCRIBE_PROVIDER": "gemini",
+    "GEMINI_API_KEY": "replay-gemini-key",
+    "STARTUP_PREWARM": "false",
+}
+
+
+def install_upstream_stubs(main: Any, latency_ms: float) -> None:
+    # Every outbound call sleeps for the given latency and returns a canned answer, so a
+    # replay exercises our code paths and concurrency limits without touching the network.
+    delay = latency_ms / 1000
+    ids = itertools.count(1)
+
+    def upstream(result: Any) -> Any:
+        def call(*_: Any, **__: Any) -> Any:
+            time.sleep(delay)
+            return result() if callable(result) else result
+
+        return call
+
+    main.ensure_todo_later_task = upstream("replay-parent")
+    main.create_subtask = upstream(lambda: {"id": str(next(ids))})
+    main.add_task_comment = upstream(lambda: {"id": str(next(ids))})
+    main.cleanup_completed_subtasks = upstream(0)
+    main.send_telegram_message = upstream(lambda: next(ids))
+    main.edit_telegram_message = upstream(None)
+    main.get_telegram_file_url = upstream("https://api.telegram.org/file/botREPLAY/file")
+    main.download_telegram_file = upstream(b"\0" * 1024)
+    main.transcribe_audio_with_gemini = upstream("replayed transcript")
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    def ratio(key: str, *path: str) -> Optional[float]:
+        now, before = current, baseline
+        for part in (key, *path):
+            now = (now or {}).get(part)
+            before = (before or {}).get(part)
+        if not now or not before:
+            return None
+        return round(now / before, 3)
+
+    return {
+        "requests_per_sec": ratio("requests_per_sec"),
+        "latency_p50": ratio("latency_ms", "p50"),
+        "latency_p95": ratio("latency_ms", "p95"),
+        "latency_p99": ratio("latency_ms", "p99"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded webhook traffic into app.main:app")
+    parser.add_argument("recordings", nargs="+", help="JSONL files written by TRAFFIC_RECORD_PATH")
+    parser.add_argument("--speed", default="1", help="Replay speed multiplier (1, 10, ...) or 'max'")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight at 'max' speed")
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0)
+    parser.add_argument("--output", help="Write the summary JSON to this file")
+    parser.add_argument("--baseline", help="Summary JSON from an earlier run to compare against")
+    args = parser.parse_args()
+
+    for key, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(key, value)
+    # Recorded users are whitelisted in production; the replay must not deny them.
+    os.environ["TELEGRAM_ALLOWED_USER_IDS"] = "[]"
+    os.environ["TELEGRAM_ALLOWED_CHAT_IDS"] = "[]"
+    os.environ.pop("TRAFFIC_RECORD_PATH", None)
+
+    from app import main as app_main  # noqa: E402 - env must be set first
+    from app.traffic import read_recording, replay_recording  # noqa: E402
+
+    install_upstream_stubs(app_main, args.upstream_latency_ms)
+    entries = read_recording(args.recordings)
+    speed = None if args.speed == "max" else float(args.speed)
+    report = asyncio.run(
+        replay_recording(
+            app_main.app,
+            entries,
+            secret=os.environ["TELEGRAM_WEBHOOK_SECRET"],
+            speed=speed,
+            concurrency=args.concurrency,
+        )
+    )
+    if app_main._feedback is not None:
+        app_main._feedback.close(timeout=5)
+    summary = {"speed": args.speed, "upstream_latency_ms": args.upstream_latency_ms, **report.summary()}
+    if args.baseline:
+        summary["vs_baseline"] = compare(summary, json.loads(Path(args.baseline).read_text(encoding="utf-8")))
+    if args.output:
+        Path(args.output).write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+TIME_TO_FIRST_RESPONSE_BUDGET_MS = 3000.0
+
+CHILD_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    response = client.get("/health")
+    response.raise_for_status()
+done = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_response_ms": (done - started) * 1000,
+}))
+"""
+
+PLACEHOLDER_ENV = {
+    "TELEGRAM_BOT_TOKEN": "bench-telegram-token",
+    "TELEGRAM_WEBHOOK_SECRET": "bench-secret",
+    "TODOIST_API_TOKEN": "bench-todoist-token",
+    "TODO_LATER_TASK_NAME": "todo later",
+}
+
+
+def measure_once(prewarm: bool) -> Dict[str, float]:
+    env = {**PLACEHOLDER_ENV, **os.environ, "PYTHONPATH": str(ROOT)}
+    env["STARTUP_PREWARM"] = "true" if prewarm else "false"
+    started = time.perf_counter()
+    output = subprocess.check_output(
+        [sys.executable, "-c", CHILD_SCRIPT],
+        cwd=ROOT,
+        env=env,
+        text=True,
+        stderr=subprocess.DEVNULL,
+    )
+    total_ms = (time.perf_counter() - started) * 1000
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_to_first_response_ms"] = total_ms
+    return result
+
+
+def summarize(samples: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    summary: Dict[str, Dict[str, float]] = {}
+    for key in samples[0]:
+        values = sorted(sample[key] for sample in samples)
+        summary[key] = {
+            "min": round(values[0], 1),
+            "median": round(statistics.median(values), 1),
+            "max": round(values[-1], 1),
+        }
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure cold-start time to first response for app.main:app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=TIME_TO_FIRST_RESPONSE_BUDGET_MS)
+    parser.add_argument("--prewarm", action="store_true", help="Let lifespan pre-warm upstream connections")
+    args = parser.parse_args()
+
+    if args.runs < 1:
+        raise SystemExit("--runs must be >= 1")
+
+    samples = [measure_once(args.prewarm) for _ in range(args.runs)]
+    summary = summarize(samples)
+    print(json.dumps({"runs": args.runs, "budget_ms": args.budget_ms, "results": summary}, indent=2))
+
+    median = summary["process_to_first_response_ms"]["median"]
+    if median > args.budget_ms:
+        raise SystemExit(f"time to first response {median}ms exceeds budget {args.budget_ms}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import contextvars
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from benchmarks.replay import PLACEHOLDER_ENV, install_upstream_stubs  # noqa: E402
+
+
+UPSTREAM_CALLS = (
+    "ensure_todo_later_task",
+    "create_subtask",
+    "add_task_comment",
+    "cleanup_completed_subtasks",
+    "send_telegram_message",
+    "edit_telegram_message",
+    "get_telegram_file_url",
+    "download_telegram_file",
+    "transcribe_audio_with_gemini",
+)
+
+
+def _counted(call: Callable[..., Any], counter: List[int]) -> Callable[..., Any]:
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        counter[0] += 1
+        return call(*args, **kwargs)
+
+    return wrapper
+
+
+def span_cost_ns(iterations: int, exporter: Any, batch_size: int) -> Dict[str, float]:
+    # Cost of one `with span(...)` on the request thread, with and without an exporter.
+    from app import tracing
+
+    results: Dict[str, float] = {}
+    for label, configured in (("noop", None), ("recorder", None), ("exported", exporter)):
+        tracing.configure_tracing(
+            configured, max_queue_size=iterations + 1, max_batch_size=iterations + 1, flush_interval_seconds=3600
+        )
+        recorder = tracing.FlightRecorder(capacity=0 if label == "noop" else 1)
+
+        def run() -> float:
+            recorder.start("00000000-0000-4000-8000-000000000000", 1, 1)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                with tracing.span("todoist.create_task"):
+                    pass
+            return time.perf_counter() - started
+
+        elapsed = contextvars.Context().run(run)
+        results[label] = round(elapsed / iterations * 1e9, 1)
+        tracing.shutdown_tracing()
+    # The exporter thread's share: OTLP encoding plus one file append per default-sized batch.
+    trace = tracing.Trace("00000000-0000-4000-8000-000000000000", 1, 1)
+    records = [(trace, "todoist.create_task", index + 1, None, 0.0, 0.0, None, None) for index in range(iterations)]
+    started = time.perf_counter()
+    for offset in range(0, iterations, batch_size):
+        exporter.export([tracing._otlp_span(record) for record in records[offset : offset + batch_size]])
+    results["export_per_span"] = round((time.perf_counter() - started) / iterations * 1e9, 1)
+    return results
+
+
+def webhook_latency(requests: int, latency_ms: float) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+
+    from app import main as app_main
+    from app.tracing import get_flight_recorder
+
+    install_upstream_stubs(app_main, latency_ms)
+    # Each stubbed call stands in for a client function that would open one more span.
+    upstream_calls = [0]
+    for name in UPSTREAM_CALLS:
+        setattr(app_main, name, _counted(getattr(app_main, name), upstream_calls))
+    client = TestClient(app_main.app)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": os.environ["TELEGRAM_WEBHOOK_SECRET"]}
+    durations: List[float] = []
+    spans: List[int] = []
+    for update_id in range(1, requests + 1):
+        payload = {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "chat": {"id": update_id, "type": "private"},
+                "text": f"buy milk #{update_id}",
+            },
+        }
+        client.post("/webhook", json=payload, headers=headers)
+        [trace] = get_flight_recorder(1).query(limit=1)
+        durations.append(trace["duration_ms"])
+        spans.append(len(trace["spans"]))
+    return {
+        "p50_ms": round(statistics.median(durations), 3),
+        "spans": round((sum(spans) + upstream_calls[0]) / requests, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure span overhead relative to webhook request time.")
+    parser.add_argument("--iterations", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--upstream-latency-ms", type=float, default=20.0)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    for key, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ["TELEGRAM_ALLOWED_USER_IDS"] = "[]"
+    os.environ["TELEGRAM_ALLOWED_CHAT_IDS"] = "[]"
+    os.environ.pop("TRACING_EXPORTER", None)
+    from app.tracing import OtlpFileExporter
+
+    with tempfile.TemporaryDirectory() as tmp:
+        costs = span_cost_ns(args.iterations, OtlpFileExporter(Path(tmp) / "spans.otlp.jsonl"), args.batch_size)
+    request = webhook_latency(args.requests, args.upstream_latency_ms)
+    spans_per_request = request["spans"]
+    per_request_ms = spans_per_request * (costs["exported"] + costs["export_per_span"]) / 1e6
+    result = {
+        "python": sys.version.split()[0],
+        "span_ns": costs,
+        "webhook": request,
+        "spans_per_request": spans_per_request,
+        "tracing_ms_per_request": round(per_request_ms, 4),
+        "overhead_pct": round(per_request_ms / request["p50_ms"] * 100, 3),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from app.todoist import (  # noqa: E402
+    CLEANUP_PAGE_SIZE,
+    SYNC_COMMANDS_MAX,
+    FileCheckpointStore,
+    TodoistServiceError,
+    cleanup_archived_subtasks,
+    find_todo_later_task,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Delete old completed subtasks of the todo later task")
+    parser.add_argument("--parent-id", help="Parent task id (resolved from --task-name when omitted)")
+    parser.add_argument("--task-name", default=os.environ.get("TODO_LATER_TASK_NAME"))
+    parser.add_argument("--days", type=int, default=int(os.environ.get("TODOIST_CLEANUP_DAYS", "7")))
+    parser.add_argument("--max-delete", type=int, default=10000)
+    parser.add_argument("--page-size", type=int, default=CLEANUP_PAGE_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=SYNC_COMMANDS_MAX)
+    parser.add_argument("--checkpoint", default=".todoist_cleanup_checkpoint.json")
+    args = parser.parse_args()
+
+    api_token = os.environ.get("TODOIST_API_TOKEN", "")
+    if not api_token:
+        raise SystemExit("TODOIST_API_TOKEN is required")
+    if not args.parent_id and not args.task_name:
+        raise SystemExit("--parent-id or --task-name is required")
+
+    try:
+        parent_id = args.parent_id or find_todo_later_task(args.task_name, api_token)
+        if parent_id is None:
+            raise SystemExit(f"no task named {args.task_name!r}; nothing to clean up")
+        report = cleanup_archived_subtasks(
+            parent_id,
+            api_token,
+            older_than_days=args.days,
+            max_delete=args.max_delete,
+            page_size=args.page_size,
+            chunk_size=args.chunk_size,
+            checkpoint=FileCheckpointStore(args.checkpoint),
+        )
+    except TodoistServiceError as exc:
+        raise SystemExit(f"cleanup failed: {exc.user_message} (rerun to resume from the checkpoint)")
+
+    print(
+        f"scanned={report.scanned} deleted={report.deleted} pages={report.pages} "
+        f"elapsed={report.elapsed_seconds:.1f}s scanned/s={report.scanned_per_second:.1f} "
+        f"deleted/s={report.deleted_per_second:.1f} exhausted={report.exhausted}"
+    )
+
+
+if __name__ == "__main__":
+    main()
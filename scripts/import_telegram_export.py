@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from app.telegram_export import (  # noqa: E402
+    DEFAULT_ATTEMPTS,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    ImportReport,
+    import_export,
+)
+from app.todoist import (  # noqa: E402
+    SYNC_COMMANDS_MAX,
+    FileCheckpointStore,
+    TodoistServiceError,
+    ensure_todo_later_task,
+)
+
+
+def _progress(report: ImportReport) -> None:
+    print(
+        f"read={report.read} imported={report.imported} skipped={report.skipped} failed={report.failed} "
+        f"mb={report.chars_read / 1e6:.1f} read/s={report.read_per_second:.0f} "
+        f"imported/s={report.imported_per_second:.1f}",
+        file=sys.stderr,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import a Telegram Desktop result.json export into Todoist")
+    parser.add_argument("export", help="Path to result.json")
+    parser.add_argument("--parent-id", help="Parent task id (resolved from --task-name when omitted)")
+    parser.add_argument("--task-name", default=os.environ.get("TODO_LATER_TASK_NAME"))
+    parser.add_argument("--chat-id", type=int, help="Only import this chat of a full account export")
+    parser.add_argument("--chat-type", help="Only import chats of this type, e.g. saved_messages")
+    parser.add_argument("--batch-size", type=int, default=SYNC_COMMANDS_MAX)
+    parser.add_argument("--requests-per-minute", type=float, default=DEFAULT_REQUESTS_PER_MINUTE)
+    parser.add_argument("--attempts", type=int, default=DEFAULT_ATTEMPTS)
+    parser.add_argument("--checkpoint", default=".telegram_import_checkpoint.json")
+    args = parser.parse_args()
+
+    api_token = os.environ.get("TODOIST_API_TOKEN", "")
+    if not api_token:
+        raise SystemExit("TODOIST_API_TOKEN is required")
+    parent_id = args.parent_id
+    if not parent_id:
+        if not args.task_name:
+            raise SystemExit("--parent-id or --task-name is required")
+        parent_id = ensure_todo_later_task(args.task_name, api_token)
+
+    with open(args.export, encoding="utf-8") as stream:
+        try:
+            report = import_export(
+                stream,
+                parent_id,
+                api_token,
+                batch_size=args.batch_size,
+                requests_per_minute=args.requests_per_minute,
+                attempts=args.attempts,
+                checkpoint=FileCheckpointStore(args.checkpoint),
+                chat_id=args.chat_id,
+                chat_type=args.chat_type,
+                on_batch=_progress,
+            )
+        except TodoistServiceError as exc:
+            raise SystemExit(f"import failed: {exc.user_message} (rerun to resume from the checkpoint)")
+        except ValueError as exc:
+            raise SystemExit(f"export is not valid JSON: {exc}")
+
+    print(
+        f"read={report.read} imported={report.imported} skipped={report.skipped} resumed={report.resumed} "
+        f"failed={report.failed} batches={report.batches} elapsed={report.elapsed_seconds:.1f}s "
+        f"read/s={report.read_per_second:.1f} imported/s={report.imported_per_second:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,20 +4,37 @@ from __future__ import annotations
 import argparse
 import json
 import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Set
+from typing import Callable, List, Optional, Sequence, Set
+
+# Runs one gcloud command and returns its stdout; raises CalledProcessError on failure.
+Runner = Callable[[List[str]], str]
+
+DEFAULT_JOBS = 8
+DEFAULT_ATTEMPTS = 3
+DEFAULT_IMAGE_BATCH = 20
 
 
 def _run(cmd: List[str]) -> str:
-    return subprocess.check_output(cmd, text=True).strip()
+    return subprocess.check_output(cmd, text=True, stderr=subprocess.PIPE).strip()
+
+
+def _error_message(exc: subprocess.CalledProcessError) -> str:
+    lines = (exc.stderr or exc.output or "").strip().splitlines()
+    return lines[-1] if lines else str(exc)
 
 
 def _parse_time(value: str) -> datetime:
     return datetime.fromisoformat(value.replace("Z", "+00:00"))
 
 
-def _active_image_version(service: str, region: str) -> str | None:
-    image_ref = _run(
+def _active_image_version(service: str, region: str, run: Runner = _run) -> str | None:
+    image_ref = run(
         [
             "gcloud",
             "run",
@@ -34,7 +51,7 @@ def _active_image_version(service: str, region: str) -> str | None:
     return image_ref.split("@", 1)[1]
 
 
-def prune_revisions(service: str, region: str, keep: int) -> None:
+def stale_revisions(service: str, region: str, keep: int, run: Runner = _run) -> List[str]:
     cmd = [
         "gcloud",
         "run",
@@ -48,19 +65,13 @@ def prune_revisions(service: str, region: str, keep: int) -> None:
         "value(metadata.name)",
         "--sort-by=~metadata.creationTimestamp",
     ]
-    result = _run(cmd)
+    result = run(cmd)
     if not result:
-        return
-    names = result.splitlines()
-    remove = names[keep:]
-    for name in remove:
-        subprocess.run(
-            ["gcloud", "run", "revisions", "delete", name, "--region", region, "--quiet"],
-            check=True,
-        )
+        return []
+    return result.splitlines()[keep:]
 
 
-def prune_images(package: str, keep: int, protected_versions: Set[str] | None = None) -> None:
+def stale_images(package: str, keep: int, protected_versions: Set[str] | None = None, run: Runner = _run) -> List[str]:
     cmd = [
         "gcloud",
         "artifacts",
@@ -71,12 +82,12 @@ def prune_images(package: str, keep: int, protected_versions: Set[str] | None =
         "--include-tags",
         "--format=json",
     ]
-    raw = _run(cmd)
+    raw = run(cmd)
     if not raw:
-        return
+        return []
     items = json.loads(raw)
     if not items:
-        return
+        return []
     protected = protected_versions or set()
 
     items.sort(
@@ -84,7 +95,7 @@ def prune_images(package: str, keep: int, protected_versions: Set[str] | None =
         reverse=True,
     )
     kept_count = 0
-    remove: list[dict] = []
+    remove: list[str] = []
     for item in items:
         version = item.get("version")
         if isinstance(version, str) and version in protected:
@@ -92,14 +103,124 @@ def prune_images(package: str, keep: int, protected_versions: Set[str] | None =
         if kept_count < keep:
             kept_count += 1
             continue
-        remove.append(item)
+        remove.append(f"{item['package']}@{item['version']}")
+    return remove
+
+
+@dataclass
+class Plan:
+    revisions: List[str]
+    images: List[str]
+    protected_version: Optional[str] = None
+
+    def describe(self) -> str:
+        lines = [f"revisions to delete: {len(self.revisions)}"]
+        lines += [f"  {name}" for name in self.revisions]
+        lines.append(f"images to delete: {len(self.images)}")
+        lines += [f"  {ref}" for ref in self.images]
+        if self.protected_version:
+            lines.append(f"protected (serving): {self.protected_version}")
+        return "\n".join(lines)
+
+
+def build_plan(service: str, region: str, package: str, keep: int, run: Runner = _run) -> Plan:
+    # Everything is listed before anything is deleted, so a dry run shows exactly what a real
+    # run would remove and a failed listing aborts without side effects.
+    revisions = stale_revisions(service, region, keep, run)
+    active_version = _active_image_version(service, region, run)
+    protected = {active_version} if active_version else set()
+    images = stale_images(package, keep, protected_versions=protected, run=run)
+    return Plan(revisions, images, active_version)
+
 
-    for item in remove:
-        image_ref = f"{item['package']}@{item['version']}"
-        subprocess.run(
-            ["gcloud", "artifacts", "docker", "images", "delete", image_ref, "--quiet"],
-            check=True,
-        )
+@dataclass
+class DeleteReport:
+    deleted: List[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+    calls: int = 0
+
+
+class Deleter:
+    # Runs deletions on a bounded thread pool. Each gcloud call is retried with exponential
+    # backoff; a batched image call that fails is split so every ref gets its own retries and result.
+    def __init__(
+        self,
+        *,
+        region: str,
+        run: Runner = _run,
+        jobs: int = DEFAULT_JOBS,
+        attempts: int = DEFAULT_ATTEMPTS,
+        image_batch: int = DEFAULT_IMAGE_BATCH,
+        backoff_seconds: float = 1.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._region = region
+        self._run = run
+        self._jobs = max(1, jobs)
+        self._attempts = max(1, attempts)
+        self._image_batch = max(1, image_batch)
+        self._backoff_seconds = backoff_seconds
+        self._sleep = sleep
+        self.report = DeleteReport()
+        self._lock = threading.Lock()
+
+    def delete_revisions(self, names: Sequence[str]) -> None:
+        # `gcloud run revisions delete` takes a single revision per call.
+        self._map(self._delete_revision, [[name] for name in names])
+
+    def delete_images(self, refs: Sequence[str]) -> None:
+        batches = [list(refs[start : start + self._image_batch]) for start in range(0, len(refs), self._image_batch)]
+        self._map(self._delete_image_batch, batches)
+
+    def _map(self, work: Callable[[List[str]], None], batches: List[List[str]]) -> None:
+        if not batches:
+            return
+        with ThreadPoolExecutor(max_workers=min(self._jobs, len(batches))) as pool:
+            list(pool.map(work, batches))
+
+    def _delete_revision(self, names: List[str]) -> None:
+        [name] = names
+        self._attempt(names, ["gcloud", "run", "revisions", "delete", name, "--region", self._region, "--quiet"])
+
+    def _delete_image_batch(self, refs: List[str]) -> None:
+        if len(refs) == 1:
+            self._attempt(refs, ["gcloud", "artifacts", "docker", "images", "delete", refs[0], "--quiet"])
+            return
+        # `gcloud container images delete` accepts several digest refs per call, including
+        # Artifact Registry docker repositories.
+        if self._call(["gcloud", "container", "images", "delete", *refs, "--quiet"], attempts=1) is None:
+            self._done(refs)
+            return
+        for ref in refs:
+            self._delete_image_batch([ref])
+
+    def _attempt(self, targets: List[str], cmd: List[str]) -> None:
+        error = self._call(cmd, attempts=self._attempts)
+        if error is None:
+            self._done(targets)
+            return
+        with self._lock:
+            for target in targets:
+                self.report.failed[target] = error
+
+    def _call(self, cmd: List[str], *, attempts: int) -> Optional[str]:
+        # Returns None on success, otherwise the last line gcloud printed on the final attempt.
+        error = ""
+        for attempt in range(attempts):
+            if attempt:
+                self._sleep(self._backoff_seconds * 2 ** (attempt - 1))
+            with self._lock:
+                self.report.calls += 1
+            try:
+                self._run(cmd)
+                return None
+            except subprocess.CalledProcessError as exc:
+                error = _error_message(exc)
+        return error
+
+    def _done(self, targets: List[str]) -> None:
+        with self._lock:
+            self.report.deleted.extend(targets)
 
 
 def main() -> None:
@@ -108,17 +229,33 @@ def main() -> None:
     parser.add_argument("--region", required=True)
     parser.add_argument("--image", required=True, help="Artifact Registry package path")
     parser.add_argument("--keep", type=int, default=3)
+    parser.add_argument("--dry-run", action="store_true", help="Print the deletion plan and exit")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Concurrent gcloud calls")
+    parser.add_argument("--attempts", type=int, default=DEFAULT_ATTEMPTS, help="Tries per gcloud call")
+    parser.add_argument("--image-batch", type=int, default=DEFAULT_IMAGE_BATCH, help="Image refs per gcloud call")
     args = parser.parse_args()
 
     if args.keep < 1:
         raise SystemExit("--keep must be >= 1")
 
-    prune_revisions(args.service, args.region, args.keep)
-    protected_versions: Set[str] = set()
-    active_version = _active_image_version(args.service, args.region)
-    if active_version:
-        protected_versions.add(active_version)
-    prune_images(args.image, args.keep, protected_versions=protected_versions)
+    plan = build_plan(args.service, args.region, args.image, args.keep)
+    print(plan.describe())
+    if args.dry_run:
+        return
+
+    started = time.monotonic()
+    deleter = Deleter(region=args.region, jobs=args.jobs, attempts=args.attempts, image_batch=args.image_batch)
+    deleter.delete_revisions(plan.revisions)
+    deleter.delete_images(plan.images)
+    report = deleter.report
+    for target, error in sorted(report.failed.items()):
+        print(f"failed: {target}: {error}", file=sys.stderr)
+    print(
+        f"deleted={len(report.deleted)} failed={len(report.failed)} calls={report.calls} "
+        f"elapsed={time.monotonic() - started:.1f}s"
+    )
+    if report.failed:
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
@@ -43,6 +43,7 @@ def _stub_todoist(monkeypatch: pytest.MonkeyPatch) -> None:
 
     monkeypatch.setattr("app.main.ensure_todo_later_task", fake_ensure)
     monkeypatch.setattr("app.main.create_subtask", fake_create)
+    monkeypatch.setattr("app.main.cleanup_completed_subtasks", lambda *_, **__: 0)
 
 
 @pytest.fixture(autouse=True)
@@ -55,6 +56,55 @@ def _stub_telegram(monkeypatch: pytest.MonkeyPatch) -> None:
 
 @pytest.fixture(autouse=True)
 def _reset_dedupe_store(monkeypatch: pytest.MonkeyPatch) -> None:
-    from collections import OrderedDict
+    monkeypatch.setattr("app.main._dedupe_store", None)
 
-    monkeypatch.setattr("app.main._dedupe_store", OrderedDict())
+
+@pytest.fixture(autouse=True)
+def _reset_bulkhead(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("app.main._bulkhead", None)
+    monkeypatch.setattr("app.main._admission", None)
+
+
+@pytest.fixture(autouse=True)
+def _reset_drain(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("app.main._spool", None)
+    monkeypatch.setattr("app.main._drain_started", None)
+    monkeypatch.setattr("app.main._drain_deadline", None)
+    monkeypatch.setattr("app.main._recorder", None)
+    monkeypatch.setattr("app.tracing._recorder", None)
+    monkeypatch.setattr("app.tracing._processor", None)
+
+
+@pytest.fixture(autouse=True)
+def _reset_scheduler(monkeypatch: pytest.MonkeyPatch):
+    from app import main
+
+    monkeypatch.setattr("app.main._scheduler", None)
+    yield
+    if main._scheduler is not None:
+        main._scheduler.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def _reset_parent_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("app.main._parent_cache", {})
+    monkeypatch.setattr("app.main._shared_parent_cache", None)
+    monkeypatch.setattr("app.main._replica", None)
+    monkeypatch.setattr("app.main._tenant_registry", None)
+    monkeypatch.setattr("app.main._tenant_pool", None)
+
+
+@pytest.fixture(autouse=True)
+def _reset_capture_index(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("app.main._capture_index", None)
+    monkeypatch.setattr("app.main._message_index", None)
+
+
+@pytest.fixture(autouse=True)
+def _reset_feedback(monkeypatch: pytest.MonkeyPatch):
+    from app import main
+
+    monkeypatch.setattr("app.main._feedback", None)
+    yield
+    if main._feedback is not None:
+        main._feedback.close(timeout=1)
@@ -0,0 +1,43 @@
+import pytest
+
+from app.admission import AdmissionController, OverloadedError
+
+
+def test_admission_sheds_over_in_flight_and_queue_limits() -> None:
+    controller = AdmissionController(2, 10, 5.0)
+
+    first = controller.admit()
+    controller.admit()
+    with pytest.raises(OverloadedError) as in_flight:
+        controller.admit()
+    controller.release(first)
+    with pytest.raises(OverloadedError) as queue_depth:
+        controller.admit(queue_depth=10)
+
+    assert in_flight.value.reason == "in_flight"
+    assert queue_depth.value.reason == "queue_depth"
+    stats = controller.stats()
+    assert stats["in_flight"] == 1
+    assert stats["admitted"] == 2
+    assert stats["shed"] == {"in_flight": 1, "queue_depth": 1, "latency": 0, "draining": 0}
+
+
+def test_admission_scales_limit_down_when_latency_overshoots() -> None:
+    now = [0.0]
+    controller = AdmissionController(40, 100, 2.0, min_in_flight=4, smoothing=1.0, clock=lambda: now[0])
+
+    admitted_at = controller.admit()
+    now[0] = 8.0
+    controller.release(admitted_at)
+
+    assert controller.limit() == 10
+    for _ in range(10):
+        controller.admit()
+    with pytest.raises(OverloadedError) as shed:
+        controller.admit()
+    assert shed.value.reason == "latency"
+
+    now[0] = 20.0
+    for _ in range(10):
+        controller.release(now[0] - 0.5)
+    assert controller.limit() == 40
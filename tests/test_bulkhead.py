@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from app.bulkhead import Bulkhead, BulkheadFullError, Lane
+from app.todoist import TodoistServiceError
+
+
+def test_bulkhead_rejects_when_lane_and_queue_are_full() -> None:
+    bulkhead = Bulkhead({"slow": Lane(limit=1, priority=1, max_waiting=0)})
+
+    bulkhead.acquire("slow")
+    with pytest.raises(BulkheadFullError) as excinfo:
+        bulkhead.acquire("slow")
+
+    assert excinfo.value.work_class == "slow"
+    assert bulkhead.stats()["slow"] == {"limit": 1, "active": 1, "waiting": 0, "rejected": 1}
+
+
+def test_bulkhead_lane_limit_does_not_block_other_lanes() -> None:
+    bulkhead = Bulkhead(
+        {
+            "fast": Lane(limit=2, priority=0),
+            "slow": Lane(limit=1, priority=1),
+        },
+        shared_limit=3,
+    )
+
+    bulkhead.acquire("slow")
+    with bulkhead.slot("fast"):
+        assert bulkhead.stats()["fast"]["active"] == 1
+
+    assert bulkhead.stats()["fast"]["active"] == 0
+
+
+def test_bulkhead_waiter_times_out() -> None:
+    bulkhead = Bulkhead({"slow": Lane(limit=1, priority=1, max_waiting=1, timeout=0.05)})
+    bulkhead.acquire("slow")
+
+    with pytest.raises(BulkheadFullError):
+        bulkhead.acquire("slow")
+
+    assert bulkhead.stats()["slow"]["waiting"] == 0
+
+
+def test_bulkhead_admits_higher_priority_waiter_first() -> None:
+    bulkhead = Bulkhead(
+        {
+            "fast": Lane(limit=1, priority=0, max_waiting=1, timeout=2.0),
+            "slow": Lane(limit=1, priority=1, max_waiting=1, timeout=2.0),
+        },
+        shared_limit=1,
+    )
+    order: list[str] = []
+
+    def worker(work_class: str) -> None:
+        with bulkhead.slot(work_class):
+            order.append(work_class)
+
+    bulkhead.acquire("fast")
+    slow = threading.Thread(target=worker, args=("slow",))
+    slow.start()
+    while bulkhead.stats()["slow"]["waiting"] == 0:
+        time.sleep(0.001)
+    fast = threading.Thread(target=worker, args=("fast",))
+    fast.start()
+    while bulkhead.stats()["fast"]["waiting"] == 0:
+        time.sleep(0.001)
+
+    bulkhead.release("fast")
+    slow.join()
+    fast.join()
+
+    assert order == ["fast", "slow"]
+
+
+def test_bulkhead_slot_lets_frozen_errors_through_and_releases() -> None:
+    bulkhead = Bulkhead({"text": Lane(limit=1, priority=0)})
+
+    with pytest.raises(TodoistServiceError) as excinfo:
+        with bulkhead.slot("text"):
+            raise TodoistServiceError("Todoist request failed")
+
+    assert excinfo.value.user_message == "Todoist request failed"
+    assert bulkhead.stats()["text"]["active"] == 0
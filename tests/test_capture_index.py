@@ -0,0 +1,65 @@
+from app.capture_index import CaptureIndex, CapturedTask, canonicalize_url, capture_keys
+from app.models import TelegramMessage
+
+
+def test_canonicalize_url_strips_tracking_and_normalizes_host() -> None:
+    url = "HTTPS://WWW.Example.com:443/article/?utm_source=tg&id=7&fbclid=abc#comments"
+
+    assert canonicalize_url(url) == "https://example.com/article?id=7"
+    assert canonicalize_url("example.com/article?id=7") == "https://example.com/article?id=7"
+    assert canonicalize_url("http://example.com:8080/") == "http://example.com:8080"
+
+
+def test_capture_keys_use_entities_with_utf16_offsets() -> None:
+    message = TelegramMessage(
+        message_id=1,
+        text="😀 see example.com/a?utm_medium=x and this",
+        entities=[
+            {"type": "url", "offset": 7, "length": 25},
+            {"type": "text_link", "offset": 37, "length": 4, "url": "https://www.other.org/b/"},
+        ],
+    )
+
+    keys = capture_keys(message, message.text, content=True)
+
+    assert keys[:2] == ["url:https://example.com/a", "url:https://other.org/b"]
+    assert keys[2].startswith("content:")
+    assert capture_keys(message, message.text) == keys[:2]
+
+
+def test_capture_keys_distinguish_attachments_with_same_caption() -> None:
+    first = TelegramMessage(
+        message_id=1,
+        caption="receipt",
+        photo=[{"file_id": "f1", "file_unique_id": "u1", "width": 1, "height": 1}],
+    )
+    second = TelegramMessage(
+        message_id=2,
+        caption="receipt",
+        photo=[{"file_id": "f2", "file_unique_id": "u2", "width": 1, "height": 1}],
+    )
+
+    assert capture_keys(first, "receipt", content=True) != capture_keys(second, "receipt", content=True)
+    assert capture_keys(None, "Buy  Milk", content=True) == capture_keys(None, "buy milk", content=True)
+    assert capture_keys(first, "receipt") == []
+
+
+def test_capture_index_expires_and_bounds_entries() -> None:
+    index = CaptureIndex(window_seconds=60, max_items=2)
+    index.remember(["a"], CapturedTask("1", None, 100.0))
+    index.remember(["b", "c"], CapturedTask("2", None, 110.0))
+
+    assert index.lookup(["a"], now=120.0) is None
+    assert index.lookup(["b", "c"], now=120.0).task_id == "2"
+    assert index.lookup(["x", "c"], now=120.0) is None
+    assert index.lookup([], now=120.0) is None
+    assert index.lookup(["b"], now=171.0) is None
+
+
+def test_capture_index_needs_every_key_on_the_same_task() -> None:
+    index = CaptureIndex(window_seconds=60, max_items=10)
+    index.remember(["url:a"], CapturedTask("1", None, 100.0))
+    index.remember(["url:b"], CapturedTask("2", None, 100.0))
+
+    assert index.lookup(["url:a"], now=110.0).task_id == "1"
+    assert index.lookup(["url:a", "url:b"], now=110.0) is None
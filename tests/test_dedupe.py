@@ -0,0 +1,98 @@
+import random
+from collections import deque
+
+import pytest
+
+from app.dedupe import DedupeRing
+
+
+def test_dedupe_ring_flags_repeats_within_ttl() -> None:
+    ring = DedupeRing(capacity=8, ttl_seconds=300)
+
+    assert ring.check_and_add(1, now=1000.0) is False
+    assert ring.check_and_add(1, now=1100.0) is True
+    assert ring.check_and_add(1, now=1400.5) is False
+    assert len(ring) == 1
+
+
+def test_dedupe_ring_evicts_oldest_when_full() -> None:
+    ring = DedupeRing(capacity=3, ttl_seconds=300)
+    for update_id in (1, 2, 3, 4):
+        ring.check_and_add(update_id, now=1000.0)
+
+    assert 1 not in ring
+    assert all(update_id in ring for update_id in (2, 3, 4))
+    assert len(ring) == 3
+
+
+def test_dedupe_ring_discard_allows_redelivery() -> None:
+    ring = DedupeRing(capacity=4, ttl_seconds=300)
+    ring.check_and_add(7, now=1000.0)
+
+    ring.discard(7)
+
+    assert 7 not in ring
+    assert ring.check_and_add(7, now=1001.0) is False
+    assert ring.check_and_add(7, now=1002.0) is True
+
+
+def test_dedupe_ring_matches_reference_model_under_random_load() -> None:
+    rng = random.Random(7)
+    ring = DedupeRing(capacity=64, ttl_seconds=50)
+    entries: deque[list] = deque()
+    index: dict[int, list] = {}
+
+    def pop_oldest() -> None:
+        entry = entries.popleft()
+        if index.get(entry[0]) is entry:
+            del index[entry[0]]
+
+    now = 0
+    for _ in range(5000):
+        now += rng.randrange(0, 2)
+        update_id = rng.randrange(-200, 200)
+        if rng.random() < 0.05:
+            ring.discard(update_id)
+            index.pop(update_id, None)
+            continue
+        while entries and entries[0][1] < now - 50:
+            pop_oldest()
+        expected = update_id in index
+        if not expected:
+            if len(entries) == 64:
+                pop_oldest()
+            entry = [update_id, now]
+            entries.append(entry)
+            index[update_id] = entry
+        assert ring.check_and_add(update_id, now=float(now)) is expected
+
+
+def test_dedupe_ring_rejects_empty_capacity() -> None:
+    with pytest.raises(ValueError):
+        DedupeRing(capacity=0, ttl_seconds=1)
+
+
+def test_dedupe_ring_spreads_sequential_ids_across_the_index() -> None:
+    # Telegram update ids are consecutive; they must not form one long probe run.
+    ring = DedupeRing(capacity=4096, ttl_seconds=300)
+    for update_id in range(1_000_000, 1_000_000 + 3 * 4096):
+        ring.check_and_add(update_id, now=1000.0)
+
+    occupied = [position != -1 for position in ring._index]
+    longest = run = 0
+    for taken in occupied + occupied:
+        run = run + 1 if taken else 0
+        longest = max(longest, run)
+    assert len(ring) == 4096
+    assert longest < 64
+
+
+def test_dedupe_ring_evicts_sequential_ids_from_a_full_ring() -> None:
+    # With identity hashing every eviction here walked one probe run the size of the ring
+    # and 30k inserts took minutes; the run-length test above guards the cause.
+    ring = DedupeRing(capacity=20_000, ttl_seconds=300)
+    for update_id in range(30_000):
+        ring.check_and_add(update_id, now=1000.0)
+
+    assert len(ring) == 20_000
+    assert 29_999 in ring and 9_999 not in ring
@@ -0,0 +1,94 @@
+import threading
+from typing import Optional
+
+from app.feedback import FeedbackAggregator, TokenBucket
+
+
+class FakeTelegram:
+    def __init__(self) -> None:
+        self.calls: list[tuple[Optional[int], str]] = []
+        self.fail_edits = False
+        self.gate: Optional[threading.Event] = None
+        self.entered = threading.Event()
+        self._next_id = 100
+
+    def deliver(self, chat_id: int, text: str, message_id: Optional[int]) -> Optional[int]:
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.calls.append((message_id, text))
+        if message_id is not None:
+            if self.fail_edits:
+                raise RuntimeError("message to edit not found")
+            return message_id
+        self._next_id += 1
+        return self._next_id
+
+
+def test_token_bucket_paces_after_burst() -> None:
+    bucket = TokenBucket(2.0, 2, now=0.0)
+
+    bucket.take(0.0)
+    bucket.take(0.0)
+
+    assert bucket.delay(0.0) == 0.5
+    assert bucket.delay(0.5) == 0.0
+    assert not bucket.full(0.5)
+    assert bucket.full(1.0)
+
+
+def test_burst_collapses_into_one_edited_status_message() -> None:
+    telegram = FakeTelegram()
+    telegram.gate = threading.Event()
+    feedback = FeedbackAggregator(telegram.deliver, rate_per_second=20, burst=1)
+
+    feedback.created(1, "https://todoist.com/showTask?id=0")
+    assert telegram.entered.wait(5)
+    for index in range(1, 12):
+        feedback.created(1, f"https://todoist.com/showTask?id={index}")
+    telegram.gate.set()
+
+    assert feedback.flush(timeout=5)
+    assert telegram.calls == [(None, "已创建 Todoist 任务：https://todoist.com/showTask?id=0"), (101, "已创建 12 个任务")]
+    feedback.close()
+
+
+def test_notices_go_out_before_the_status_update() -> None:
+    telegram = FakeTelegram()
+    feedback = FeedbackAggregator(telegram.deliver, workers=1)
+
+    feedback.notify(1, "创建失败：Todoist unavailable")
+    feedback.created(1, None)
+
+    assert feedback.flush(timeout=5)
+    assert telegram.calls == [(None, "创建失败：Todoist unavailable"), (None, "已创建 Todoist 任务。")]
+    feedback.close()
+
+
+def test_failed_edit_posts_a_fresh_status_message() -> None:
+    telegram = FakeTelegram()
+    feedback = FeedbackAggregator(telegram.deliver, rate_per_second=1000, burst=10)
+
+    feedback.created(1, None)
+    assert feedback.flush(timeout=5)
+    telegram.fail_edits = True
+    feedback.created(1, None)
+
+    assert feedback.flush(timeout=5)
+    assert telegram.calls == [(None, "已创建 Todoist 任务。"), (101, "已创建 2 个任务"), (None, "已创建 2 个任务")]
+    feedback.close()
+
+
+def test_quiet_chat_starts_a_new_status_message() -> None:
+    now = [0.0]
+    telegram = FakeTelegram()
+    feedback = FeedbackAggregator(telegram.deliver, window_seconds=10, clock=lambda: now[0])
+
+    feedback.created(1, None)
+    assert feedback.flush(timeout=5)
+    now[0] = 30.0
+    feedback.created(1, None)
+
+    assert feedback.flush(timeout=5)
+    assert telegram.calls == [(None, "已创建 Todoist 任务。"), (None, "已创建 Todoist 任务。")]
+    feedback.close()
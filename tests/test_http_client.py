@@ -0,0 +1,118 @@
+import importlib.util
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import httpx
+import pytest
+
+from app.http_client import (
+    HttpClientOptions,
+    PooledTransport,
+    _CachingBackend,
+    close_http_client,
+    get_http_client,
+    prewarm_http_client,
+)
+
+
+def test_get_http_client_reuses_pooled_client() -> None:
+    first = get_http_client()
+    second = get_http_client()
+
+    assert first is second
+    close_http_client()
+    assert get_http_client() is not first
+    close_http_client()
+
+
+def test_prewarm_http_client_counts_reachable_hosts() -> None:
+    seen: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url.host)
+        if request.url.host == "down.example.com":
+            raise httpx.ConnectError("unreachable")
+        return httpx.Response(404)
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    warmed = prewarm_http_client(
+        ["https://up.example.com/", "https://down.example.com/"],
+        client=client,
+    )
+
+    assert warmed == 1
+    assert sorted(seen) == ["down.example.com", "up.example.com"]
+
+
+def test_pooled_transport_caps_requests_per_host() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=b"ok")
+
+    transport = PooledTransport(
+        HttpClientOptions(max_connections_per_host=1),
+        transport=httpx.MockTransport(handler),
+    )
+    client = httpx.Client(transport=transport, timeout=httpx.Timeout(1.0, pool=0.05))
+
+    with client.stream("GET", "https://api.telegram.org/a"):
+        assert transport.stats()["in_flight"]["api.telegram.org"] == 1
+        with pytest.raises(httpx.PoolTimeout):
+            client.get("https://api.telegram.org/b")
+        assert client.get("https://api.todoist.com/c").status_code == 200
+
+    assert client.get("https://api.telegram.org/b").status_code == 200
+    assert transport.stats()["in_flight"] == {"api.telegram.org": 0, "api.todoist.com": 0}
+
+
+def test_pooled_transport_falls_back_to_http1_without_h2() -> None:
+    transport = PooledTransport(HttpClientOptions(http2=True, max_connections_per_host=2, max_streams_per_connection=10))
+
+    h2_installed = importlib.util.find_spec("h2") is not None
+    assert transport.http2 is h2_installed
+    assert transport.stats()["per_host_limit"] == (20 if h2_installed else 2)
+    transport.close()
+
+
+def test_caching_backend_resolves_each_host_once_per_ttl() -> None:
+    lookups: list[str] = []
+
+    def resolve(host: str, port: int, **_: object) -> list[tuple]:
+        lookups.append(host)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("203.0.113.7", port))]
+
+    backend = _CachingBackend(60, resolve=resolve)
+
+    assert backend._address("api.todoist.com", 443) == "203.0.113.7"
+    assert backend._address("api.todoist.com", 443) == "203.0.113.7"
+    assert lookups == ["api.todoist.com"]
+
+
+def test_pooled_transport_sends_through_the_caching_backend() -> None:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *_: object) -> None:
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    transport = PooledTransport(HttpClientOptions(dns_cache_seconds=60))
+    client = httpx.Client(transport=transport)
+    try:
+        url = f"http://localhost:{server.server_address[1]}/"
+        assert [client.get(url).text for _ in range(2)] == ["ok", "ok"]
+        assert transport.stats()["connections_opened"] == 1
+        with pytest.raises(httpx.ConnectError):
+            client.get("http://127.0.0.1:9/")
+    finally:
+        client.close()
+        server.shutdown()
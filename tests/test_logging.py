@@ -0,0 +1,100 @@
+import logging
+
+import pytest
+
+from app.logging import EventPolicy, RateLimitFilter, event_policies
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _logger(name: str, log_filter: RateLimitFilter, caplog: pytest.LogCaptureFixture) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.addFilter(log_filter)
+    caplog.set_level(logging.INFO, logger=name)
+    return logger
+
+
+def test_token_bucket_limits_an_event_and_reports_suppressed(caplog: pytest.LogCaptureFixture) -> None:
+    clock = _Clock()
+    log_filter = RateLimitFilter({"webhook_forbidden": EventPolicy(rate_per_second=1.0, burst=2)}, clock=clock)
+    logger = _logger("test.bucket", log_filter, caplog)
+
+    for _ in range(5):
+        logger.warning("webhook_forbidden")
+    logger.info("settings_loaded")  # no policy, never limited
+    clock.now = 1.0
+    logger.warning("webhook_forbidden")
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "webhook_forbidden",
+        "webhook_forbidden",
+        "settings_loaded",
+        "webhook_forbidden suppressed=3",
+    ]
+    assert log_filter.stats() == {"webhook_forbidden": {"emitted": 3, "suppressed": 3}}
+
+
+def test_sampling_keeps_one_in_n(caplog: pytest.LogCaptureFixture) -> None:
+    log_filter = RateLimitFilter({"validation_failed": EventPolicy.from_config({"sample": 0.25})})
+    logger = _logger("test.sample", log_filter, caplog)
+
+    for index in range(8):
+        logger.warning("validation_failed %d", index)
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "validation_failed 0",
+        "validation_failed 4 suppressed=3",
+    ]
+
+
+def test_dedupe_drops_repeats_of_a_key_within_the_window(caplog: pytest.LogCaptureFixture) -> None:
+    clock = _Clock()
+    policy = EventPolicy.from_config({"key": "chat_id", "dedupe_seconds": 60})
+    log_filter = RateLimitFilter({"webhook_denied": policy}, clock=clock, summary_interval_seconds=300)
+    logger = _logger("test.dedupe", log_filter, caplog)
+
+    for update_id in range(3):
+        logger.info("webhook_denied %d", update_id, extra={"chat_id": 1})
+    logger.info("webhook_denied 3", extra={"chat_id": 2})
+    clock.now = 61.0
+    logger.info("webhook_denied 4", extra={"chat_id": 1})
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "webhook_denied 0",
+        "webhook_denied 3 suppressed=2",
+        "webhook_denied 4",
+    ]
+
+
+def test_pending_counts_are_summarized_periodically(caplog: pytest.LogCaptureFixture) -> None:
+    clock = _Clock()
+    log_filter = RateLimitFilter(
+        {"webhook_forbidden": EventPolicy(rate_per_second=0.01, burst=1)},
+        clock=clock,
+        summary_interval_seconds=10,
+    )
+    logger = _logger("test.summary", log_filter, caplog)
+
+    for _ in range(4):
+        logger.warning("webhook_forbidden")
+    clock.now = 10.0
+    logger.warning("webhook_forbidden")
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "webhook_forbidden",
+        'log_suppressed {"webhook_forbidden":4}',
+    ]
+
+
+def test_event_policies_override_and_disable_defaults() -> None:
+    policies = event_policies({"webhook_forbidden": {}, "todoist_failed": {"rate": 2, "burst": 5}})
+
+    assert "webhook_forbidden" not in policies
+    assert "webhook_denied" in policies
+    assert policies["todoist_failed"] == EventPolicy(rate_per_second=2.0, burst=5)
@@ -0,0 +1,40 @@
+import sqlite3
+from pathlib import Path
+
+from app.message_index import IndexedMessage, MessageIndex
+
+
+def test_index_evicts_least_recently_used() -> None:
+    index = MessageIndex(max_items=2)
+    index.remember(1, 10, "task-10")
+    index.remember(1, 11, "task-11")
+
+    assert index.lookup(1, 10) == IndexedMessage("task-10")  # refreshes 10, so 11 is evicted next
+    index.remember(2, 10, "task-20")
+
+    assert index.lookup(1, 11) is None
+    assert index.lookup(1, 10) == IndexedMessage("task-10")
+    assert index.lookup(2, 10) == IndexedMessage("task-20")
+    assert index.stats() == {"size": 2, "hits": 3, "misses": 1}
+
+
+def test_persisted_index_survives_restarts_and_stays_bounded(tmp_path: Path) -> None:
+    path = tmp_path / "edits.db"
+    index = MessageIndex(max_items=3, path=str(path))
+    for message_id in range(1, 6):
+        index.remember(7, message_id, f"task-{message_id}")
+    other = MessageIndex(max_items=3, path=str(path))
+    index.remember(7, 6, "task-6", from_text=False)
+    index.close()
+
+    # Another worker finds captures written after it started on a memory miss.
+    assert other.lookup(7, 6) == IndexedMessage("task-6", from_text=False)
+    reopened = MessageIndex(max_items=3, path=str(path))
+    assert [reopened.lookup(7, message_id) for message_id in (3, 4, 5, 6)] == [
+        None,
+        IndexedMessage("task-4"),
+        IndexedMessage("task-5"),
+        IndexedMessage("task-6", from_text=False),
+    ]
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT COUNT(*) FROM message_tasks").fetchone()[0] == 3
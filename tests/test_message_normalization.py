@@ -117,3 +117,54 @@ def test_normalize_document_only_message_uses_document_prompt() -> None:
     )
 
     assert normalize_update(update) == DOCUMENT_ONLY_PROMPT
+
+
+def test_normalize_text_links_after_emoji_use_utf16_offsets() -> None:
+    update = TelegramUpdate(
+        update_id=9,
+        message={
+            "message_id": 107,
+            "text": "👍 𠀋 read this now",
+            "entities": [{"type": "text_link", "offset": 6, "length": 9, "url": "https://example.com"}],
+        },
+    )
+
+    assert normalize_update(update) == "👍 𠀋 read this (https://example.com) now"
+
+
+def test_normalize_renders_code_pre_and_nested_entities() -> None:
+    update = TelegramUpdate(
+        update_id=10,
+        message={
+            "message_id": 108,
+            "text": "run make test docs @bob #todo\nprint(1)",
+            "entities": [
+                {"type": "text_link", "offset": 4, "length": 14, "url": "https://docs.example.com"},
+                {"type": "code", "offset": 4, "length": 9},
+                {"type": "mention", "offset": 19, "length": 4},
+                {"type": "hashtag", "offset": 24, "length": 5},
+                {"type": "pre", "offset": 30, "length": 8, "language": "python"},
+            ],
+        },
+    )
+
+    assert normalize_update(update) == (
+        "run `make test` docs (https://docs.example.com) @bob #todo\n```python\nprint(1)\n```"
+    )
+
+
+def test_normalize_accepts_unsorted_and_overlapping_entities() -> None:
+    update = TelegramUpdate(
+        update_id=11,
+        message={
+            "message_id": 109,
+            "text": "one two three",
+            "entities": [
+                {"type": "text_link", "offset": 8, "length": 5, "url": "https://c.example"},
+                {"type": "code", "offset": 0, "length": 7},
+                {"type": "text_link", "offset": 4, "length": 6, "url": "https://b.example"},
+            ],
+        },
+    )
+
+    assert normalize_update(update) == "`one two (https://b.example)` three (https://c.example)"
@@ -0,0 +1,176 @@
+import cProfile
+import marshal
+import time
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import profiling
+from app.profiling import PROFILE_CPROFILE, PROFILE_SAMPLE, ProfilerBusyError, RequestProfiler
+
+ADMIN = {"X-Admin-Token": "admin-secret"}
+
+
+@pytest.fixture(autouse=True)
+def _fresh_profiler(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    monkeypatch.setattr(profiling, "_profiler", RequestProfiler())
+    monkeypatch.setattr(profiling, "_memory", profiling.MemoryTracker())
+    yield
+    profiling._memory.stop()
+
+
+def _busy(seconds: float) -> int:
+    deadline = time.monotonic() + seconds
+    total = 0
+    while time.monotonic() < deadline:
+        total += sum(range(100))
+    return total
+
+
+def test_cprofile_covers_the_next_n_requests() -> None:
+    profiler = RequestProfiler()
+    profiler.start(PROFILE_CPROFILE, requests=2)
+
+    for _ in range(3):
+        with profiler.request():
+            _busy(0.01)
+
+    status = profiler.status()
+    assert status["state"] == "finished"
+    assert status["profiled"] == 2
+    body, media_type = profiler.result("text")
+    assert media_type == "text/plain"
+    assert b"_busy" in body
+    raw, _ = profiler.result("pstats")
+    assert any(key[2] == "_busy" for key in marshal.loads(raw))
+
+
+class _ProcessWideProfile(cProfile.Profile):
+    # Mimics Python 3.12+, where only one profiler may be enabled per process.
+    active = False
+
+    def enable(self, *args: object, **kwargs: object) -> None:
+        if _ProcessWideProfile.active:
+            raise ValueError("Another profiling tool is already active")
+        _ProcessWideProfile.active = True
+        super().enable(*args, **kwargs)
+
+    def disable(self) -> None:
+        super().disable()
+        _ProcessWideProfile.active = False
+
+
+def test_overlapping_requests_skip_profiling_instead_of_failing(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cProfile, "Profile", _ProcessWideProfile)
+    profiler = RequestProfiler()
+    profiler.start(PROFILE_CPROFILE, requests=2)
+
+    first = profiler.request()
+    first.__enter__()
+    with profiler.request():  # overlaps the first; must not raise
+        _busy(0.001)
+    assert profiler.status()["in_progress"] == 1
+    first.__exit__(None, None, None)
+
+    # The skipped request gave its claim back, so the session waits for one more.
+    assert profiler.status() | {"elapsed_seconds": 0} == {
+        "state": "running",
+        "mode": PROFILE_CPROFILE,
+        "requests": 2,
+        "profiled": 1,
+        "in_progress": 0,
+        "samples": 0,
+        "elapsed_seconds": 0,
+    }
+    with profiler.request():
+        _busy(0.001)
+    assert profiler.status()["state"] == "finished"
+
+
+def test_profiler_rejects_a_second_session_and_unknown_modes() -> None:
+    profiler = RequestProfiler()
+    with pytest.raises(ValueError):
+        profiler.start("perf", requests=1)
+    profiler.start(PROFILE_CPROFILE, requests=1)
+
+    with pytest.raises(ProfilerBusyError):
+        profiler.start(PROFILE_SAMPLE, seconds=1)
+    assert profiler.result("text") is None
+    assert profiler.stop()["state"] == "finished"
+
+
+def test_time_window_closes_after_deadline() -> None:
+    now = [100.0]
+    profiler = RequestProfiler(clock=lambda: now[0])
+    profiler.start(PROFILE_CPROFILE, seconds=5)
+
+    with profiler.request():
+        now[0] = 106.0
+    with profiler.request():
+        pass
+
+    assert profiler.status()["profiled"] == 1
+    assert profiler.status()["state"] == "finished"
+
+
+def test_sampler_collects_collapsed_stacks_of_profiled_requests() -> None:
+    profiler = RequestProfiler()
+    profiler.start(PROFILE_SAMPLE, requests=1, interval_seconds=0.002)
+
+    with profiler.request():
+        _busy(0.2)
+
+    body, media_type = profiler.result("collapsed")
+    assert media_type == "text/plain"
+    first = body.decode().splitlines()[0]
+    stack, count = first.rsplit(" ", 1)
+    assert "test_profiling.py:_busy" in stack
+    assert int(count) > 0
+
+
+def test_debug_routes_need_admin_token(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    assert client.get("/debug/profile").status_code == 404
+
+    monkeypatch.setenv("ADMIN_TOKEN", "admin-secret")
+    from app.config import get_settings
+
+    get_settings.cache_clear()
+    assert client.get("/debug/profile", headers={"X-Admin-Token": "nope"}).status_code == 401
+    assert client.get("/debug/profile", headers=ADMIN).status_code == 404
+
+
+def test_profile_webhook_requests_over_http(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ADMIN_TOKEN", "admin-secret")
+
+    started = client.post("/debug/profile", json={"mode": "cprofile", "requests": 1}, headers=ADMIN)
+    assert started.json()["data"]["state"] == "running"
+    assert client.post("/debug/profile", json={"requests": 1}, headers=ADMIN).status_code == 409
+    assert client.get("/debug/profile", headers=ADMIN).status_code == 202
+
+    client.post(
+        "/webhook",
+        json={"update_id": 71, "message": {"message_id": 1, "chat": {"id": 5, "type": "private"}, "text": "hi"}},
+        headers={"X-Telegram-Bot-Api-Secret-Token": "test-secret"},
+    )
+
+    report = client.get("/debug/profile", headers=ADMIN)
+    assert report.status_code == 200
+    assert "_process_update" in report.text
+
+
+def test_memory_snapshots_report_growth(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ADMIN_TOKEN", "admin-secret")
+    assert client.get("/debug/memory", headers=ADMIN).status_code == 409
+
+    client.post("/debug/memory", headers=ADMIN)
+    first = client.get("/debug/memory", headers=ADMIN).json()["data"]
+    hoard = [bytearray(1024) for _ in range(500)]
+    second = client.get("/debug/memory?limit=5", headers=ADMIN).json()["data"]
+
+    assert first["growth"] is None
+    assert second["traced_bytes"] > 0
+    assert any(entry["size_diff_bytes"] >= 500 * 1024 for entry in second["growth"])
+    assert len(second["top"]) <= 5
+    assert client.delete("/debug/memory", headers=ADMIN).json()["data"] == {"tracing": False}
+    del hoard
@@ -0,0 +1,88 @@
+import json
+import subprocess
+import threading
+from typing import Callable, Dict, List
+
+from scripts.prune_cloud_run_artifacts import Deleter, build_plan
+
+PACKAGE = "us-docker.pkg.dev/proj/repo/gatchan"
+
+
+class FakeGcloud:
+    # Answers list/describe calls from canned output and records every command it is given.
+    def __init__(self, outputs: Dict[str, str], fail: Callable[[List[str]], bool] = lambda _: False) -> None:
+        self.outputs = outputs
+        self.fail = fail
+        self.calls: List[List[str]] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, cmd: List[str]) -> str:
+        with self._lock:
+            self.calls.append(cmd)
+        if self.fail(cmd):
+            raise subprocess.CalledProcessError(1, cmd, stderr="ERROR: (gcloud) NOT_FOUND\n")
+        return self.outputs.get(" ".join(cmd[1:4]), "")
+
+    def deletes(self) -> List[List[str]]:
+        return [cmd for cmd in self.calls if "delete" in cmd]
+
+
+def _images(count: int) -> str:
+    return json.dumps(
+        [
+            {"package": PACKAGE, "version": f"sha256:{index:04d}", "createTime": f"2026-01-01T00:{index:02d}:00Z"}
+            for index in range(count)
+        ]
+    )
+
+
+def _gcloud(**kwargs: Callable[[List[str]], bool]) -> FakeGcloud:
+    return FakeGcloud(
+        {
+            "run revisions list": "\n".join(f"svc-{index:05d}" for index in range(6, 0, -1)),
+            "run services describe": f"{PACKAGE}@sha256:0001",
+            "artifacts docker images": _images(6),
+        },
+        **kwargs,
+    )
+
+
+def test_plan_lists_everything_before_deleting() -> None:
+    gcloud = _gcloud()
+
+    plan = build_plan("svc", "asia-east1", PACKAGE, keep=2, run=gcloud)
+
+    assert plan.revisions == ["svc-00004", "svc-00003", "svc-00002", "svc-00001"]
+    # Newest two are kept, the serving digest is protected even though it is old.
+    assert plan.images == [f"{PACKAGE}@sha256:{index:04d}" for index in (3, 2, 0)]
+    assert plan.protected_version == "sha256:0001"
+    assert "images to delete: 3" in plan.describe()
+    assert gcloud.deletes() == []
+
+
+def test_deleter_batches_image_refs_and_reports_each_item() -> None:
+    gcloud = _gcloud()
+    refs = [f"{PACKAGE}@sha256:{index:04d}" for index in range(5)]
+    deleter = Deleter(region="asia-east1", run=gcloud, jobs=4, image_batch=2, sleep=lambda _: None)
+
+    deleter.delete_revisions(["svc-00001", "svc-00002"])
+    deleter.delete_images(refs)
+
+    image_calls = [cmd for cmd in gcloud.deletes() if "images" in cmd]
+    assert sorted(sum(arg.startswith(PACKAGE) for arg in cmd) for cmd in image_calls) == [1, 2, 2]
+    assert sorted(deleter.report.deleted) == sorted(refs + ["svc-00001", "svc-00002"])
+    assert deleter.report.failed == {}
+
+
+def test_failed_batch_is_split_and_retried_per_ref() -> None:
+    bad = f"{PACKAGE}@sha256:0002"
+    gcloud = _gcloud(fail=lambda cmd: "delete" in cmd and bad in cmd)
+    slept: List[float] = []
+    deleter = Deleter(region="asia-east1", run=gcloud, attempts=3, image_batch=3, sleep=slept.append)
+
+    deleter.delete_images([f"{PACKAGE}@sha256:{index:04d}" for index in range(3)])
+
+    assert deleter.report.failed == {bad: "ERROR: (gcloud) NOT_FOUND"}
+    assert len(deleter.report.deleted) == 2
+    assert slept == [1.0, 2.0]
+    assert sum(bad in cmd for cmd in gcloud.deletes()) == 4  # batch once, then three tries alone
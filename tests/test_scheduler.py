@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+from app.scheduler import ChatScheduler
+
+
+def test_scheduler_runs_chat_work_in_order_key_order() -> None:
+    scheduler = ChatScheduler(1)
+    gate = threading.Event()
+    order: list[int] = []
+
+    blocker = scheduler.submit("other", 0, gate.wait)
+    futures = [scheduler.submit(555, key, lambda key=key: order.append(key)) for key in (3, 1, 2)]
+    gate.set()
+    blocker.result(timeout=2)
+    for future in futures:
+        future.result(timeout=2)
+    scheduler.shutdown()
+
+    assert order == [1, 2, 3]
+
+
+def test_scheduler_round_robins_between_chats() -> None:
+    scheduler = ChatScheduler(1)
+    gate = threading.Event()
+    order: list[str] = []
+
+    blocker = scheduler.submit("blocker", 0, gate.wait)
+    futures = [scheduler.submit("noisy", key, lambda key=key: order.append(f"noisy-{key}")) for key in range(3)]
+    futures.append(scheduler.submit("quiet", 10, lambda: order.append("quiet")))
+    gate.set()
+    blocker.result(timeout=2)
+    for future in futures:
+        future.result(timeout=2)
+    scheduler.shutdown()
+
+    assert order.index("quiet") == 1
+
+
+def test_scheduler_caps_in_flight_per_chat() -> None:
+    scheduler = ChatScheduler(4, max_in_flight_per_chat=1)
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def work() -> None:
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        threading.Event().wait(0.01)
+        with lock:
+            state["running"] -= 1
+
+    futures = [scheduler.submit(555, key, work) for key in range(5)]
+    for future in futures:
+        future.result(timeout=2)
+    scheduler.shutdown()
+
+    assert state["peak"] == 1
+
+
+def test_scheduler_surfaces_exceptions_and_cancels_pending_on_shutdown() -> None:
+    scheduler = ChatScheduler(1)
+    gate = threading.Event()
+    started = threading.Event()
+
+    def blocking() -> None:
+        started.set()
+        gate.wait()
+
+    def boom() -> None:
+        raise ValueError("boom")
+
+    failing = scheduler.submit(1, 0, boom)
+    with pytest.raises(ValueError):
+        failing.result(timeout=2)
+
+    blocker = scheduler.submit(1, 1, blocking)
+    pending = scheduler.submit(1, 2, lambda: None)
+    started.wait(timeout=2)
+    cancelled = scheduler.shutdown(wait=False, cancel_pending=True)
+    gate.set()
+    blocker.result(timeout=2)
+
+    assert cancelled == 1
+    assert pending.cancelled()
+    with pytest.raises(RuntimeError):
+        scheduler.submit(1, 3, lambda: None)
+
+
+def test_scheduler_run_pending_runs_queued_work_on_the_caller() -> None:
+    scheduler = ChatScheduler(1)
+    gate = threading.Event()
+    started = threading.Event()
+
+    def blocking() -> None:
+        started.set()
+        gate.wait()
+
+    blocker = scheduler.submit(1, 0, blocking)
+    started.wait(timeout=2)
+    queued = [scheduler.submit(1, 2, threading.current_thread), scheduler.submit(2, 1, threading.current_thread)]
+
+    assert scheduler.run_pending() == 2
+    assert [future.result(timeout=0) for future in queued] == [threading.current_thread()] * 2
+    assert scheduler.stats()["queued"] == 0
+    gate.set()
+    blocker.result(timeout=2)
+    scheduler.shutdown()
@@ -0,0 +1,94 @@
+import multiprocessing
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.shared_state import SharedDedupeRing, SharedMap
+
+
+def _record(path: str, update_ids: list[int], results: Any) -> None:
+    ring = SharedDedupeRing(path, capacity=64, ttl_seconds=300)
+    for update_id in update_ids:
+        results.put((update_id, ring.check_and_add(update_id, now=1000.0)))
+
+
+def test_shared_dedupe_ring_is_seen_by_every_instance(tmp_path: Path) -> None:
+    path = tmp_path / "dedupe.bin"
+    first = SharedDedupeRing(path, capacity=4, ttl_seconds=300)
+    second = SharedDedupeRing(path, capacity=4, ttl_seconds=300)
+
+    assert first.check_and_add(1, now=1000.0) is False
+    assert second.check_and_add(1, now=1001.0) is True
+    for update_id in (2, 3, 4, 5):
+        second.check_and_add(update_id, now=1002.0)
+
+    assert 1 not in first
+    assert len(first) == 4
+    second.discard(5)
+    assert 5 not in first
+
+
+def test_shared_dedupe_ring_across_processes(tmp_path: Path) -> None:
+    path = str(tmp_path / "dedupe.bin")
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=_record, args=(path, list(range(20)), results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get(timeout=10) for _ in range(60)]
+    for worker in workers:
+        worker.join(timeout=10)
+
+    first_seen = [update_id for update_id, duplicate in outcomes if not duplicate]
+    assert sorted(first_seen) == list(range(20))
+
+
+def test_shared_dedupe_ring_resets_on_capacity_change(tmp_path: Path) -> None:
+    path = tmp_path / "dedupe.bin"
+    SharedDedupeRing(path, capacity=4, ttl_seconds=300).check_and_add(1, now=1000.0)
+
+    resized = SharedDedupeRing(path, capacity=8, ttl_seconds=300)
+
+    assert len(resized) == 0
+    assert resized.check_and_add(1, now=1000.0) is False
+
+
+def test_shared_map_round_trips_between_instances(tmp_path: Path) -> None:
+    path = tmp_path / "cache.bin"
+    writer = SharedMap(path)
+    reader = SharedMap(path)
+
+    writer["todo later"] = ("42", 739000)
+
+    assert reader.get("todo later") == ["42", 739000]
+    assert reader.pop("todo later") == ["42", 739000]
+    assert writer.get("todo later") is None
+
+
+def test_shared_map_rejects_values_over_its_size(tmp_path: Path) -> None:
+    shared = SharedMap(tmp_path / "cache.bin", size=64)
+
+    with pytest.raises(ValueError):
+        shared["key"] = "x" * 100
+
+
+def test_webhook_uses_shared_state_dir(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("SHARED_STATE_DIR", str(tmp_path))
+    monkeypatch.setattr("app.main._dedupe_store", None)
+    sibling = SharedDedupeRing(tmp_path / "dedupe.bin", capacity=100_000, ttl_seconds=300)
+    sibling.check_and_add(321, now=time.time())
+
+    response = client.post(
+        "/webhook",
+        json={"update_id": 321, "message": {"message_id": 1, "chat": {"id": 1, "type": "private"}, "text": "hi"}},
+        headers={"X-Telegram-Bot-Api-Secret-Token": "test-secret"},
+    )
+
+    assert response.json()["data"] == {"received": True, "duplicate": True}
@@ -0,0 +1,192 @@
+import asyncio
+import fcntl
+import threading
+from pathlib import Path
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.config import get_settings
+from app.main import app
+from app.models import TelegramUpdate
+from app.scheduler import ChatScheduler
+from app.spool import UpdateSpool
+
+HEADERS = {"X-Telegram-Bot-Api-Secret-Token": "test-secret"}
+
+
+def _update(update_id: int) -> dict[str, Any]:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "chat": {"id": 7, "type": "private"},
+            "from": {"id": 8},
+            "text": f"note {update_id}",
+        },
+    }
+
+
+def test_update_spool_round_trips_and_resumes_interrupted_replay(tmp_path: Path) -> None:
+    spool = UpdateSpool(tmp_path / "spool.jsonl")
+    spool.append({"update_id": 1})
+    # Left by a reader that died mid-replay: nobody holds its lock any more.
+    orphan = tmp_path / "spool.jsonl.replaying.host-1-0f0f"
+    orphan.write_text('{"update_id": 0}\nnot json\n', encoding="utf-8")
+
+    assert spool.take() == [{"update_id": 0}, {"update_id": 1}]
+    assert spool.take() == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_update_spool_leaves_files_a_live_reader_holds(tmp_path: Path) -> None:
+    spool = UpdateSpool(tmp_path / "spool.jsonl")
+    held = tmp_path / "spool.jsonl.replaying.other-1-abcd"
+    held.write_text('{"update_id": 0}\n', encoding="utf-8")
+    spool.append({"update_id": 1})
+
+    with held.open(encoding="utf-8") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        assert spool.take() == [{"update_id": 1}]
+    assert list(tmp_path.iterdir()) == [held]
+
+
+def test_update_spool_hands_each_update_to_exactly_one_instance(tmp_path: Path) -> None:
+    # Instances on a shared volume can all be pid 1; each take() still claims its own file.
+    writer = UpdateSpool(tmp_path / "spool.jsonl")
+    readers = [UpdateSpool(tmp_path / "spool.jsonl") for _ in range(4)]
+    taken: list[dict[str, Any]] = []
+    done = threading.Event()
+
+    def write() -> None:
+        for update_id in range(300):
+            writer.append({"update_id": update_id})
+        done.set()
+
+    def read(spool: UpdateSpool) -> None:
+        while not done.is_set():
+            taken.extend(spool.take())
+        taken.extend(spool.take())
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read, args=(r,)) for r in readers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    taken.extend(readers[0].take())
+
+    assert sorted(payload["update_id"] for payload in taken) == list(range(300))
+
+
+def test_draining_instance_sheds_new_updates(client: TestClient) -> None:
+    main._begin_drain(get_settings())
+
+    response = client.post("/webhook", headers=HEADERS, json=_update(300))
+
+    assert response.status_code == 503
+    assert main._admission.stats()["shed"]["draining"] == 1
+
+
+def test_updates_past_the_deadline_are_spooled_and_replayed(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    created: list[str] = []
+
+    def fake_create(content: str, *_: Any, **__: Any) -> dict[str, Any]:
+        created.append(content)
+        return {"id": "child-1"}
+
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+    monkeypatch.setenv("SHUTDOWN_SPOOL_PATH", str(tmp_path / "spool.jsonl"))
+    get_settings.cache_clear()
+    settings = get_settings()
+    update = TelegramUpdate.model_validate(_update(301))
+    assert not main._is_duplicate_update(301, settings)
+
+    monkeypatch.setattr("app.main._drain_deadline", 0.0)
+    deferred = main._process_or_defer(update, update.message, settings, "request-1")
+    monkeypatch.setattr("app.main._drain_deadline", None)
+    replayed = main._replay_spool(settings)
+    main._scheduler.shutdown()
+
+    assert deferred.status_code == 200
+    assert b'"deferred":true' in deferred.body
+    assert replayed == 1
+    assert created == ["note 301"]
+    assert main._replay_spool(settings) == 0
+
+
+def test_deferred_update_without_spool_is_left_for_redelivery(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    settings = get_settings()
+    update = TelegramUpdate.model_validate(_update(302))
+    assert not main._is_duplicate_update(302, settings)
+
+    monkeypatch.setattr("app.main._drain_deadline", 0.0)
+    response = main._process_or_defer(update, update.message, settings, "request-2")
+
+    assert response.status_code == 503
+    assert not main._is_duplicate_update(302, settings)
+
+
+def test_lifespan_shutdown_stops_admission(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("STARTUP_PREWARM", "false")
+    get_settings.cache_clear()
+
+    with TestClient(app) as running:
+        assert running.post("/webhook", headers=HEADERS, json=_update(303)).status_code == 200
+
+    assert main._admission.stats()["draining"] is True
+    assert main._admission.stats()["in_flight"] == 0
+
+
+def test_drain_spools_queued_updates_before_flushing_replies_within_the_budget(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    spool_path = tmp_path / "spool.jsonl"
+    monkeypatch.setenv("SHUTDOWN_SPOOL_PATH", str(spool_path))
+    monkeypatch.setenv("SHUTDOWN_DRAIN_SECONDS", "3")
+    monkeypatch.setenv("FEEDBACK_FLUSH_TIMEOUT_SECONDS", "5")
+    get_settings.cache_clear()
+    settings = get_settings()
+    monkeypatch.setattr("app.main._scheduler", ChatScheduler(1))
+    closed: list[tuple[float, str]] = []
+
+    class Feedback:
+        def close(self, timeout: float) -> bool:
+            closed.append((timeout, spool_path.read_text() if spool_path.exists() else ""))
+            return True
+
+        def stats(self) -> dict[str, int]:
+            return {}
+
+    monkeypatch.setattr("app.main._feedback", Feedback())
+    gate = threading.Event()
+    started = threading.Event()
+
+    def blocking() -> None:
+        started.set()
+        gate.wait()
+
+    update = TelegramUpdate.model_validate(_update(304))
+    blocker = main._scheduler.submit(7, 0, blocking)
+    started.wait(timeout=2)
+    queued = main._scheduler.submit(7, 304, lambda: main._process_or_defer(update, update.message, settings, "r"))
+    try:
+        asyncio.run(main._drain(settings))
+    finally:
+        gate.set()
+    blocker.result(timeout=2)
+
+    assert queued.result(timeout=0).status_code == 200
+    [(timeout, spooled)] = closed
+    assert 0 < timeout <= 3
+    assert '"update_id":304' in spooled
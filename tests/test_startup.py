@@ -0,0 +1,24 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+# Wall-clock budgets flake on loaded CI machines, so this only runs when asked for.
+@pytest.mark.skipif(not os.environ.get("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 to run benchmark tests")
+def test_cold_start_meets_time_to_first_response_budget() -> None:
+    result = subprocess.run(
+        [sys.executable, str(ROOT / "benchmarks" / "startup.py"), "--runs", "1"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    report = json.loads(result.stdout)
+    assert report["results"]["first_response_ms"]["median"] <= report["budget_ms"]
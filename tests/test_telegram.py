@@ -3,7 +3,12 @@ import json
 import httpx
 import pytest
 
-from app.telegram import download_telegram_file, get_telegram_file_url, send_telegram_message
+from app.telegram import (
+    download_telegram_file,
+    edit_telegram_message,
+    get_telegram_file_url,
+    send_telegram_message,
+)
 
 
 def test_send_telegram_message_posts_payload() -> None:
@@ -59,3 +64,24 @@ def test_download_telegram_file_fetches_bytes() -> None:
     data = download_telegram_file("https://files.example.com/voice.ogg", client=client)
 
     assert data == b"audio-bytes"
+
+
+def test_send_telegram_message_returns_message_id() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"ok": True, "result": {"message_id": 42}})
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    assert send_telegram_message(123, "hello", "test-token", client=client) == 42
+
+
+def test_edit_telegram_message_posts_payload() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url == httpx.URL("https://api.telegram.org/bottest-token/editMessageText")
+        body = json.loads(request.content.decode("utf-8"))
+        assert body == {"chat_id": 123, "message_id": 42, "text": "已创建 3 个任务"}
+        return httpx.Response(200, json={"ok": True})
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    edit_telegram_message(123, 42, "已创建 3 个任务", "test-token", client=client)
@@ -0,0 +1,209 @@
+import io
+import json
+from typing import Any
+
+import httpx
+import pytest
+
+from app.telegram_export import import_export, iter_export_messages, to_telegram_message
+from app.todoist import InMemoryCheckpointStore, TodoistServiceError
+
+CHAT = {"name": "Saved Messages", "type": "saved_messages", "id": 777}
+
+
+def _message(message_id: int, text: Any = None, **extra: Any) -> dict[str, Any]:
+    return {
+        "id": message_id,
+        "type": "message",
+        "date": "2026-01-01T00:00:00",
+        "date_unixtime": str(1767225600 + message_id),
+        "from": "Me",
+        "text": f"note {message_id}" if text is None else text,
+        **extra,
+    }
+
+
+def _export(messages: list[dict[str, Any]]) -> io.StringIO:
+    return io.StringIO(json.dumps({**CHAT, "messages": messages}, indent=1))
+
+
+def _make_client(handler):
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def _sync_handler(batches: list[list[dict[str, Any]]], fail: set[str] = frozenset()):
+    def handler(request: httpx.Request) -> httpx.Response:
+        commands = json.loads(request.content)["commands"]
+        batches.append(commands)
+        status = {
+            command["uuid"]: {"error": "boom"} if command["args"]["content"] in fail else "ok"
+            for command in commands
+        }
+        return httpx.Response(200, json={"sync_status": status})
+
+    return handler
+
+
+def test_iter_export_messages_streams_single_and_full_exports() -> None:
+    single = _export([_message(1), {"id": 2, "type": "service", "action": "pin_message"}, _message(3)])
+    full = io.StringIO(
+        json.dumps(
+            {
+                "about": "export",
+                "personal_information": {"first_name": "Me"},
+                "chats": {
+                    "about": "chats",
+                    "list": [
+                        {"name": "A", "type": "personal_chat", "id": 1, "messages": [_message(10)]},
+                        {"name": "B", "type": "private_group", "id": 2, "messages": [_message(20), _message(21)]},
+                    ],
+                },
+            }
+        )
+    )
+
+    # Tiny chunks force every value across window boundaries.
+    assert [(chat["id"], raw["id"]) for chat, raw in iter_export_messages(single, chunk_chars=7)] == [
+        (777, 1),
+        (777, 2),
+        (777, 3),
+    ]
+    assert [(chat["name"], raw["id"]) for chat, raw in iter_export_messages(full, chunk_chars=5)] == [
+        ("A", 10),
+        ("B", 20),
+        ("B", 21),
+    ]
+
+
+def test_to_telegram_message_maps_entities_and_media() -> None:
+    raw = _message(
+        5,
+        text=["see ", {"type": "text_link", "text": "🙂 docs", "href": "https://example.com"}],
+        text_entities=[
+            {"type": "plain", "text": "see "},
+            {"type": "text_link", "text": "🙂 docs", "href": "https://example.com"},
+        ],
+    )
+    message = to_telegram_message(CHAT, raw)
+
+    assert message is not None and message.text == "see 🙂 docs"
+    entity = message.entities[0]
+    # Offsets and lengths are UTF-16 code units, as in the Bot API.
+    assert (entity.type, entity.offset, entity.length, entity.url) == ("text_link", 4, 7, "https://example.com")
+
+    photo = to_telegram_message(CHAT, _message(6, text="caption", photo="photos/photo_6.jpg", width=10, height=20))
+    assert photo is not None and photo.caption == "caption" and photo.photo[0].file_id == "photos/photo_6.jpg"
+    assert to_telegram_message(CHAT, {"id": 7, "type": "service"}) is None
+
+
+def test_import_export_batches_commands_and_reports_failures() -> None:
+    batches: list[list[dict[str, Any]]] = []
+    client = _make_client(_sync_handler(batches, fail={"note 4"}))
+    stream = _export([_message(index) for index in range(1, 6)] + [{"id": 6, "type": "service"}])
+
+    report = import_export(stream, "parent-1", "token", batch_size=2, client=client, sleep=lambda _: None)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    first = batches[0][0]
+    assert first["type"] == "item_add" and first["args"]["parent_id"] == "parent-1"
+    assert first["args"]["description"].startswith("meta: source=telegram_export chat_id=777 message_id=1")
+    assert (report.read, report.imported, report.failed, report.skipped, report.batches) == (6, 4, 1, 1, 3)
+
+
+def test_import_export_checkpoint_stops_before_the_first_failed_item() -> None:
+    batches: list[list[dict[str, Any]]] = []
+    checkpoint = InMemoryCheckpointStore()
+    messages = [_message(index) for index in range(1, 6)]
+
+    first = import_export(
+        _export(messages),
+        "parent-1",
+        "token",
+        batch_size=2,
+        checkpoint=checkpoint,
+        client=_make_client(_sync_handler(batches, fail={"note 2"})),
+        sleep=lambda _: None,
+    )
+    assert (first.imported, first.failed) == (4, 1)
+    assert checkpoint.load("telegram_export:777") == "1"
+
+    rerun = import_export(
+        _export(messages),
+        "parent-1",
+        "token",
+        batch_size=2,
+        checkpoint=checkpoint,
+        client=_make_client(_sync_handler(batches)),
+        sleep=lambda _: None,
+    )
+    assert (rerun.resumed, rerun.imported) == (1, 4)
+    assert batches[3][0]["args"]["content"] == "note 2"
+    assert checkpoint.load("telegram_export:777") == "5"
+
+
+def test_import_export_resumes_from_checkpoint_with_stable_uuids() -> None:
+    batches: list[list[dict[str, Any]]] = []
+    calls = {"count": 0}
+    ok = _sync_handler(batches)
+
+    def flaky(request: httpx.Request) -> httpx.Response:
+        calls["count"] += 1
+        if calls["count"] == 2:
+            return httpx.Response(503)
+        return ok(request)
+
+    checkpoint = InMemoryCheckpointStore()
+    messages = [_message(index) for index in range(1, 5)]
+    slept: list[float] = []
+    with pytest.raises(TodoistServiceError):
+        import_export(
+            _export(messages),
+            "parent-1",
+            "token",
+            batch_size=2,
+            attempts=1,
+            checkpoint=checkpoint,
+            client=_make_client(flaky),
+            sleep=slept.append,
+        )
+    assert checkpoint.load("telegram_export:777") == "2"
+
+    report = import_export(
+        _export(messages),
+        "parent-1",
+        "token",
+        batch_size=2,
+        checkpoint=checkpoint,
+        client=_make_client(ok),
+        sleep=slept.append,
+    )
+    assert (report.resumed, report.imported) == (2, 2)
+    assert checkpoint.load("telegram_export:777") == "4"
+    # The retried batch reuses the uuids it would have had the first time.
+    again = import_export(
+        _export(messages), "parent-1", "token", batch_size=2, client=_make_client(ok), sleep=slept.append
+    )
+    assert again.imported == 4
+    assert batches[-1] == batches[1]
+
+
+def test_import_export_throttles_requests() -> None:
+    now = [0.0]
+    slept: list[float] = []
+
+    def sleep(seconds: float) -> None:
+        slept.append(seconds)
+        now[0] += seconds
+
+    import_export(
+        _export([_message(index) for index in range(1, 4)]),
+        "parent-1",
+        "token",
+        batch_size=1,
+        requests_per_minute=60,
+        client=_make_client(_sync_handler([])),
+        clock=lambda: now[0],
+        sleep=sleep,
+    )
+
+    assert slept == [1.0, 1.0]
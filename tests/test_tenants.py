@@ -0,0 +1,136 @@
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+from app.tenants import Tenant, TenantPool, TenantRegistry, _TenantTransport
+
+ALICE = Tenant("alice", "alice-token", "alice later")
+TEAM = Tenant("team", "team-token", "team inbox", captures_per_minute=1)
+
+
+def test_registry_maps_chats_before_users(tmp_path: Path) -> None:
+    registry = TenantRegistry(str(tmp_path / "tenants.db"))
+    registry.upsert(ALICE, [501])
+    registry.upsert(TEAM, [-100])
+
+    assert registry.lookup(501, 501) == ALICE
+    assert registry.lookup(-100, 501) == TEAM
+    assert registry.lookup(-200, 501) == ALICE
+    assert registry.lookup(-200, 999) is None
+
+    registry.remove("team")
+    assert registry.lookup(-100, 999) is None
+    assert "alice-token" not in repr(ALICE)
+
+
+def test_registry_picks_up_edits_from_other_connections(tmp_path: Path) -> None:
+    path = tmp_path / "tenants.db"
+    now = [0.0]
+    registry = TenantRegistry(str(path), reload_interval_seconds=5, clock=lambda: now[0])
+
+    with sqlite3.connect(path) as other:
+        other.execute("INSERT INTO tenants VALUES ('bob', 'bob-token', 'bob later', NULL)")
+        other.execute("INSERT INTO tenant_members VALUES (42, 'bob')")
+
+    assert registry.lookup(42, 42) is None  # not due for a reload yet
+    now[0] = 6.0
+    assert registry.lookup(42, 42) == Tenant("bob", "bob-token", "bob later")
+    reloads = registry.reloads
+    now[0] = 12.0
+    registry.lookup(42, 42)
+    assert registry.reloads == reloads  # nothing changed, nothing re-read
+
+
+def test_pool_reuses_sessions_and_enforces_budget() -> None:
+    pool = TenantPool(captures_per_minute=60, burst=2)
+
+    session = pool.session(ALICE)
+    assert pool.session(ALICE) is session
+    assert pool.session(Tenant("alice", "rotated", "alice later")) is not session
+
+    team = pool.session(TEAM)
+    assert team.try_acquire() and team.try_acquire()
+    assert not team.try_acquire()
+    assert pool.stats() == {"tenants": 2, "captures": 2, "throttled": 1}
+
+
+def test_tenant_transport_holds_its_slot_until_the_body_is_closed(monkeypatch: pytest.MonkeyPatch) -> None:
+    upstream = httpx.MockTransport(lambda request: httpx.Response(200, content=b"body"))
+    monkeypatch.setattr("app.tenants.get_http_transport", lambda: upstream)
+    transport = _TenantTransport(1)
+    client = httpx.Client(transport=transport)
+
+    with client.stream("GET", "https://api.todoist.com/a") as response:
+        assert response.status_code == 200
+        assert not transport._slots.acquire(blocking=False)
+    assert transport._slots.acquire(blocking=False)
+
+
+def _message(update_id: int, user_id: int) -> dict[str, Any]:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False},
+            "text": f"note {update_id}",
+        },
+    }
+
+
+def test_webhook_files_into_the_senders_account(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    path = tmp_path / "tenants.db"
+    registry = TenantRegistry(str(path))
+    registry.upsert(ALICE, [501])
+    registry.upsert(TEAM, [502])
+    registry.close()
+    calls: list[tuple[str, str, bool]] = []
+
+    def fake_ensure(task_name: str, api_token: str, *, client: Any = None) -> str:
+        return f"parent-{task_name}"
+
+    def fake_create(content: str, parent_id: str, api_token: str, *, description=None, client=None) -> dict:
+        calls.append((parent_id, api_token, client is not None))
+        return {"id": f"child-{len(calls)}"}
+
+    monkeypatch.setattr("app.main.ensure_todo_later_task", fake_ensure)
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+    monkeypatch.setattr("app.main.update_task_content", lambda task_id, *_, **__: {"id": task_id})
+    for key, value in {
+        "TELEGRAM_BOT_TOKEN": "test-telegram-token",
+        "TELEGRAM_WEBHOOK_SECRET": "test-secret",
+        "TODOIST_API_TOKEN": "owner-token",
+        "TODO_LATER_TASK_NAME": "todo later",
+        "TELEGRAM_ALLOWED_USER_IDS": "50",
+        "TELEGRAM_WHITELIST_REPLY": "false",
+        "TENANT_DB_PATH": str(path),
+        "TENANT_BURST": "1",
+    }.items():
+        monkeypatch.setenv(key, value)
+    get_settings.cache_clear()
+    client = TestClient(app)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": "test-secret"}
+
+    assert client.post("/webhook", json=_message(1, 501), headers=headers).status_code == 200
+    assert client.post("/webhook", json=_message(2, 50), headers=headers).status_code == 200
+    assert client.post("/webhook", json=_message(3, 502), headers=headers).status_code == 200
+    # TEAM allows one capture a minute: the next one is left for Telegram to redeliver.
+    assert client.post("/webhook", json=_message(4, 502), headers=headers).status_code == 503
+    # Editing the captured message is not a new capture, so the spent budget does not block it.
+    edit = {"update_id": 6, "edited_message": {**_message(3, 502)["message"], "text": "note 3 (fixed)"}}
+    assert client.post("/webhook", json=edit, headers=headers).status_code == 200
+    denied = client.post("/webhook", json=_message(5, 999), headers=headers)
+
+    assert denied.json()["data"]["authorized"] is False
+    assert calls == [
+        ("parent-alice later", "alice-token", True),
+        ("parent-todo later", "owner-token", False),
+        ("parent-team inbox", "team-token", True),
+    ]
+    assert client.get("/metrics").json()["data"]["tenants"]["throttled"] == 1
@@ -1,9 +1,18 @@
+import io
 import json
 
 import httpx
 import pytest
 
-from app.todoist import TodoistServiceError, create_subtask
+from app.telegram import TELEGRAM_STREAM_CHUNK_BYTES, TelegramFileStream
+from app.todoist import (
+    TodoistServiceError,
+    add_task_comment,
+    create_subtask,
+    get_task,
+    update_task_description,
+    upload_file,
+)
 
 
 def test_create_subtask_success() -> None:
@@ -71,3 +80,94 @@ def test_create_subtask_truncates_oversized_content() -> None:
     result = create_subtask(oversized_content, "123", "test-token", client=client)
 
     assert result["id"] == "1"
+
+
+def test_add_task_comment_posts_to_task() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path.endswith("/comments")
+        body = json.loads(request.content.decode("utf-8"))
+        assert body == {"task_id": "42", "content": "again"}
+        return httpx.Response(200, json={"id": "c1", "task_id": "42"})
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    assert add_task_comment("42", "again", "test-token", client=client)["id"] == "c1"
+
+
+def test_update_task_description_leaves_content_alone() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path.endswith("/tasks/42")
+        if request.method == "GET":
+            return httpx.Response(200, json={"id": "42", "description": "meta"})
+        assert json.loads(request.content.decode("utf-8")) == {"description": "meta\ncaption=draft"}
+        return httpx.Response(200, json={"id": "42"})
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    assert get_task("42", "test-token", client=client)["description"] == "meta"
+    assert update_task_description("42", "meta\ncaption=draft\n", "test-token", client=client)["id"] == "42"
+
+
+def test_add_task_comment_sends_attachment() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content.decode("utf-8"))
+        assert body["attachment"] == {"file_url": "https://files.todoist.com/a.pdf", "file_name": "a.pdf"}
+        return httpx.Response(200, json={"id": "c2", "task_id": "42"})
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    attachment = {"file_url": "https://files.todoist.com/a.pdf", "file_name": "a.pdf"}
+
+    assert add_task_comment("42", "a.pdf", "test-token", attachment=attachment, client=client)["id"] == "c2"
+
+
+class _StreamingUploads(httpx.BaseTransport):
+    # Unlike MockTransport this does not read the body up front, so the test sees it arrive.
+    def __init__(self, produced: list[int]) -> None:
+        self.produced = produced
+        self.seen: list[int] = []
+        self.largest = 0
+        self.headers: httpx.Headers = httpx.Headers()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.headers = request.headers
+        for chunk in request.stream:
+            self.largest = max(self.largest, len(chunk))
+            self.seen.append(self.produced[0])
+        return httpx.Response(200, json={"file_name": "photo.jpg", "file_url": "https://files.todoist.com/p.jpg"})
+
+
+def test_upload_file_streams_telegram_download_without_buffering() -> None:
+    produced = [0]
+    total_chunks = 32
+
+    def body():
+        for _ in range(total_chunks):
+            produced[0] += 1
+            yield b"x" * TELEGRAM_STREAM_CHUNK_BYTES
+
+    telegram = httpx.Client(transport=httpx.MockTransport(lambda _: httpx.Response(200, content=body())))
+    uploads = _StreamingUploads(produced)
+
+    with TelegramFileStream("https://api.telegram.org/file/botT/photos/photo.jpg", client=telegram) as stream:
+        result = upload_file(
+            stream,
+            stream.file_name,
+            "test-token",
+            content_type="image/jpeg",
+            client=httpx.Client(transport=uploads),
+        )
+
+    assert result["file_url"] == "https://files.todoist.com/p.jpg"
+    assert uploads.headers["transfer-encoding"] == "chunked"
+    assert "content-length" not in uploads.headers
+    assert stream.bytes_read == total_chunks * TELEGRAM_STREAM_CHUNK_BYTES
+    # The download advances one chunk at a time as the upload body is sent.
+    assert uploads.largest <= TELEGRAM_STREAM_CHUNK_BYTES
+    assert uploads.seen[0] <= 1 and uploads.seen[-1] == total_chunks
+
+
+def test_upload_file_wraps_failures() -> None:
+    client = httpx.Client(transport=httpx.MockTransport(lambda _: httpx.Response(413)))
+
+    with pytest.raises(TodoistServiceError):
+        upload_file(io.BytesIO(b"data"), "a.bin", "test-token", client=client)
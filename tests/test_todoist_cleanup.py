@@ -4,7 +4,13 @@ from datetime import datetime, timedelta, timezone
 import httpx
 import pytest
 
-from app.todoist import TodoistServiceError, cleanup_completed_subtasks
+from app.todoist import (
+    FileCheckpointStore,
+    InMemoryCheckpointStore,
+    TodoistServiceError,
+    cleanup_archived_subtasks,
+    cleanup_completed_subtasks,
+)
 
 
 def _make_client(handler):
@@ -84,3 +90,102 @@ def test_cleanup_completed_subtasks_raises_on_archive_failure() -> None:
 
     with pytest.raises(TodoistServiceError):
         cleanup_completed_subtasks("parent-1", "token", client=client)
+
+
+def test_cleanup_archived_subtasks_follows_cursors_and_chunks_deletes() -> None:
+    now = datetime(2026, 1, 27, tzinfo=timezone.utc)
+    old = (now - timedelta(days=30)).isoformat()
+    pages = {
+        None: {"items": [{"id": i, "completed_at": old} for i in range(5)], "has_more": True, "next_cursor": "c2"},
+        "c2": {"items": [{"id": i, "completed_at": old} for i in range(5, 8)], "has_more": False},
+    }
+    chunks: list[list[int]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/archive/items"):
+            return httpx.Response(200, json=pages[request.url.params.get("cursor")])
+        payload = json.loads(request.content.decode("utf-8"))
+        chunks.append([command["args"]["id"] for command in payload["commands"]])
+        return httpx.Response(200, json={"sync_status": {command["uuid"]: "ok" for command in payload["commands"]}})
+
+    checkpoint = InMemoryCheckpointStore()
+    report = cleanup_archived_subtasks(
+        "parent-1",
+        "token",
+        client=_make_client(handler),
+        now=now,
+        max_delete=100,
+        chunk_size=2,
+        checkpoint=checkpoint,
+    )
+
+    assert report.scanned == 8
+    assert report.deleted == 8
+    assert report.pages == 2
+    assert report.exhausted is True
+    assert report.deleted_per_second > 0
+    assert chunks == [[0, 1], [2, 3], [4], [5, 6], [7]]
+    assert checkpoint.load("parent-1") is None
+
+
+def test_cleanup_archived_subtasks_resumes_from_checkpoint(tmp_path) -> None:
+    now = datetime(2026, 1, 27, tzinfo=timezone.utc)
+    old = (now - timedelta(days=30)).isoformat()
+    requested: list[str | None] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/archive/items"):
+            cursor = request.url.params.get("cursor")
+            requested.append(cursor)
+            if cursor is None:
+                return httpx.Response(200, json={"items": [{"id": 1, "completed_at": old}], "next_cursor": "c2"})
+            return httpx.Response(500)
+        return httpx.Response(200, json={"sync_status": {}})
+
+    path = tmp_path / "checkpoint.json"
+    with pytest.raises(TodoistServiceError):
+        cleanup_archived_subtasks(
+            "parent-1",
+            "token",
+            client=_make_client(handler),
+            now=now,
+            checkpoint=FileCheckpointStore(path),
+        )
+
+    assert FileCheckpointStore(path).load("parent-1") == "c2"
+
+    requested.clear()
+    with pytest.raises(TodoistServiceError):
+        cleanup_archived_subtasks(
+            "parent-1",
+            "token",
+            client=_make_client(handler),
+            now=now,
+            checkpoint=FileCheckpointStore(path),
+        )
+    assert requested == ["c2"]
+
+
+def test_cleanup_archived_subtasks_stops_at_delete_budget_without_advancing() -> None:
+    now = datetime(2026, 1, 27, tzinfo=timezone.utc)
+    old = (now - timedelta(days=30)).isoformat()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/archive/items"):
+            items = [{"id": i, "completed_at": old} for i in range(4)]
+            return httpx.Response(200, json={"items": items, "next_cursor": "c2"})
+        return httpx.Response(200, json={"sync_status": {}})
+
+    checkpoint = InMemoryCheckpointStore()
+    report = cleanup_archived_subtasks(
+        "parent-1",
+        "token",
+        client=_make_client(handler),
+        now=now,
+        max_delete=2,
+        checkpoint=checkpoint,
+    )
+
+    assert report.deleted == 2
+    assert report.scanned == 2
+    assert checkpoint.load("parent-1") is None
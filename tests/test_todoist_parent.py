@@ -4,13 +4,14 @@ from datetime import date
 import httpx
 import pytest
 
-from app.todoist import TodoistServiceError, ensure_todo_later_task
+from app.todoist import TodoistServiceError, ensure_todo_later_task, find_todo_later_task
 
 
 def test_ensure_todo_later_task_returns_existing_task() -> None:
     def handler(request: httpx.Request) -> httpx.Response:
         assert request.headers["Authorization"] == "Bearer test-token"
-        assert request.url.path == "/api/v1/tasks"
+        assert request.url.path == "/api/v1/tasks/filter"
+        assert request.url.params["query"] == "search: todo later"
         return httpx.Response(
             200,
             json={"results": [{"id": "42", "content": "todo later", "due": {"date": date.today().isoformat()}}]},
@@ -74,3 +75,59 @@ def test_ensure_todo_later_task_rejects_missing_name() -> None:
         ensure_todo_later_task(" ", "test-token")
 
     assert excinfo.value.user_message == "Todo later task name is required"
+
+
+def test_ensure_todo_later_task_follows_cursor_until_match() -> None:
+    cursors: list[str | None] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        cursor = request.url.params.get("cursor")
+        cursors.append(cursor)
+        if cursor is None:
+            return httpx.Response(
+                200,
+                json={"results": [{"id": "1", "content": "todo later soon"}], "next_cursor": "page-2"},
+            )
+        if cursor == "page-2":
+            return httpx.Response(
+                200,
+                json={
+                    "results": [{"id": "42", "content": "todo later", "due": {"date": date.today().isoformat()}}],
+                    "next_cursor": "page-3",
+                },
+            )
+        raise AssertionError("lookup should stop at the first match")
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    task_id = ensure_todo_later_task("todo later", "test-token", client=client)
+
+    assert task_id == "42"
+    assert cursors == [None, "page-2"]
+
+
+def test_ensure_todo_later_task_lists_all_tasks_for_reserved_characters() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/api/v1/tasks"
+        assert "query" not in request.url.params
+        return httpx.Response(
+            200,
+            json={"results": [{"id": "7", "content": "read & watch", "due": {"date": date.today().isoformat()}}]},
+        )
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    assert ensure_todo_later_task("read & watch", "test-token", client=client) == "7"
+
+
+def test_find_todo_later_task_never_creates_or_reschedules() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.method == "GET"
+        if request.url.params["query"] == "search: todo later":
+            return httpx.Response(200, json={"results": [{"id": "42", "content": "todo later", "due": None}]})
+        return httpx.Response(200, json={"results": []})
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    assert find_todo_later_task("todo later", "test-token", client=client) == "42"
+    assert find_todo_later_task("someday", "test-token", client=client) is None
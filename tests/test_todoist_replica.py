@@ -0,0 +1,159 @@
+import json
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+
+from app.todoist_replica import TodoistReplica
+
+
+def _make_client(handler):
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def _sync_handler(responses: list[dict], tokens: list[str], commands: list[dict]):
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content.decode("utf-8"))
+        if "commands" in body:
+            commands.extend(body["commands"])
+            return httpx.Response(200, json={"sync_status": {}})
+        tokens.append(body["sync_token"])
+        return httpx.Response(200, json=responses.pop(0))
+
+    return handler
+
+
+def test_replica_tracks_parent_and_children_through_deltas() -> None:
+    today = date.today().isoformat()
+    tokens: list[str] = []
+    responses = [
+        {
+            "sync_token": "t1",
+            "full_sync": True,
+            "items": [
+                {"id": "c1", "content": "read", "parent_id": "p1"},
+                {"id": "p1", "content": "todo later", "parent_id": None, "due": {"date": today}},
+                {"id": "x1", "content": "unrelated", "parent_id": None},
+            ],
+        },
+        {
+            "sync_token": "t2",
+            "full_sync": False,
+            "items": [
+                {"id": "c2", "content": "watch", "parent_id": "p1"},
+                {"id": "c1", "is_deleted": True, "parent_id": "p1"},
+            ],
+        },
+    ]
+    client = _make_client(_sync_handler(responses, tokens, []))
+    replica = TodoistReplica("todo later", "token", sync_interval=0)
+
+    assert replica.ensure_parent(client=client) == "p1"
+    assert [child["id"] for child in replica.children()] == ["c1"]
+
+    replica.sync(client=client)
+
+    assert tokens == ["*", "t1"]
+    assert [child["id"] for child in replica.children()] == ["c2"]
+    assert replica.sync_token == "t2"
+
+
+def test_replica_throttles_syncs_within_interval() -> None:
+    tokens: list[str] = []
+    responses = [{"sync_token": "t1", "full_sync": True, "items": []}]
+    client = _make_client(_sync_handler(responses, tokens, []))
+    replica = TodoistReplica("todo later", "token", sync_interval=60)
+
+    assert replica.sync(client=client) is True
+    assert replica.sync(client=client) is False
+    assert tokens == ["*"]
+
+
+def test_replica_cleanup_deletes_from_the_completed_archive() -> None:
+    # Completed before the replica ever synced: only the archive knows about c1.
+    now = datetime(2026, 1, 27, tzinfo=timezone.utc)
+    old = (now - timedelta(days=10)).isoformat()
+    recent = (now - timedelta(days=1)).isoformat()
+    tokens: list[str] = []
+    commands: list[dict] = []
+    archive_params: list[dict] = []
+    responses = [
+        {
+            "sync_token": "t1",
+            "full_sync": True,
+            "items": [
+                {"id": "p1", "content": "todo later", "due": {"date": date.today().isoformat()}},
+                {"id": "c3", "parent_id": "p1", "checked": False},
+            ],
+        },
+        {"sync_token": "t2", "full_sync": False, "items": []},
+    ]
+    sync = _sync_handler(responses, tokens, commands)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/archive/items"):
+            archive_params.append(dict(request.url.params))
+            return httpx.Response(200, json=[{"id": "c1", "completed_at": old}, {"id": "c2", "completed_at": recent}])
+        return sync(request)
+
+    client = _make_client(handler)
+    replica = TodoistReplica("todo later", "token", sync_interval=60)
+
+    deleted = replica.cleanup_completed(client=client, now=now)
+
+    assert deleted == 1
+    assert archive_params[0]["item_id"] == "p1"
+    assert [command["args"]["id"] for command in commands] == ["c1"]
+    # Deletions mark the replica stale, so the next read fetches a delta.
+    assert replica.sync(client=client) is True
+    assert tokens == ["*", "t1"]
+
+
+def test_replica_persists_state_to_sqlite(tmp_path) -> None:
+    path = str(tmp_path / "replica.db")
+    responses = [
+        {
+            "sync_token": "t1",
+            "full_sync": True,
+            "items": [
+                {"id": "p1", "content": "todo later", "due": {"date": date.today().isoformat()}},
+                {"id": "c1", "parent_id": "p1", "content": "read"},
+            ],
+        }
+    ]
+    client = _make_client(_sync_handler(responses, [], []))
+    TodoistReplica("todo later", "token", path=path).sync(client=client)
+
+    restored = TodoistReplica("todo later", "token", path=path)
+
+    assert restored.sync_token == "t1"
+    assert restored.parent()["id"] == "p1"
+    assert [child["id"] for child in restored.children()] == ["c1"]
+
+
+def test_replica_reads_are_not_blocked_by_a_sync_in_flight() -> None:
+    started = threading.Event()
+    release = threading.Event()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        started.set()
+        release.wait(5)
+        return httpx.Response(
+            200,
+            json={"sync_token": "t1", "full_sync": True, "items": [{"id": "p1", "content": "todo later"}]},
+        )
+
+    replica = TodoistReplica("todo later", "token", sync_interval=0)
+    syncing = threading.Thread(target=replica.sync, kwargs={"client": _make_client(handler)})
+    syncing.start()
+    assert started.wait(5)
+
+    reader = threading.Thread(target=lambda: (replica.parent(), replica.children(), replica.sync_token))
+    reader.start()
+    reader.join(1)
+    blocked = reader.is_alive()
+    release.set()
+    syncing.join(5)
+
+    assert not blocked
+    assert replica.parent()["id"] == "p1"
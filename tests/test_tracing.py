@@ -0,0 +1,190 @@
+import contextvars
+import io
+import json
+from pathlib import Path
+from typing import Any, Iterator
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import tracing
+from app.telegram import send_telegram_message
+from app.tracing import BatchSpanProcessor, FlightRecorder, OtlpFileExporter, SpanExporter, StdoutExporter, span
+
+ADMIN = {"X-Admin-Token": "admin-secret"}
+
+
+def _record(recorder: FlightRecorder, update_id: int, chat_id: int, status: int, *, fail_stage: bool = False) -> None:
+    def handle() -> None:
+        trace = recorder.start(f"req-{update_id}", update_id, chat_id)
+        try:
+            with span("todoist.create_subtask"):
+                if fail_stage:
+                    raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+        recorder.finish(trace, status)
+        trace.duration_ms = float(update_id)
+
+    # Each request runs in its own context, as it does under the ASGI server.
+    contextvars.Context().run(handle)
+
+
+def test_flight_recorder_keeps_the_last_traces() -> None:
+    recorder = FlightRecorder(capacity=3)
+    for update_id in range(1, 6):
+        _record(recorder, update_id, chat_id=update_id % 2, status=200)
+
+    recent = recorder.query()
+
+    assert [trace["update_id"] for trace in recent] == [5, 4, 3]
+    assert recent[0]["spans"][0]["name"] == "todoist.create_subtask"
+
+
+def test_flight_recorder_queries_slowest_errors_and_chat() -> None:
+    recorder = FlightRecorder(capacity=10)
+    _record(recorder, 30, chat_id=1, status=200)
+    _record(recorder, 10, chat_id=2, status=502)
+    _record(recorder, 20, chat_id=1, status=200, fail_stage=True)
+
+    assert [trace["update_id"] for trace in recorder.query(order="slowest")] == [30, 20, 10]
+    assert [trace["update_id"] for trace in recorder.query(errors=True)] == [20, 10]
+    assert [trace["update_id"] for trace in recorder.query(chat_id=1, limit=1)] == [20]
+    with pytest.raises(ValueError):
+        recorder.query(order="oldest")
+
+
+def test_span_outside_a_request_is_a_noop() -> None:
+    recorder = FlightRecorder(capacity=0)
+
+    def run() -> None:
+        assert recorder.start("req", 1, None) is None
+        with span("anything"):
+            pass
+
+    contextvars.Context().run(run)
+    assert recorder.query() == []
+
+
+class _ListExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.batches: list[list[dict[str, Any]]] = []
+
+    def export(self, spans: list[dict[str, Any]]) -> None:
+        self.batches.append(spans)
+
+
+def test_span_exporter_requires_export() -> None:
+    class Incomplete(SpanExporter):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()  # type: ignore[abstract]
+
+
+@pytest.fixture
+def exporter() -> Iterator[_ListExporter]:
+    exporter = _ListExporter()
+    tracing.configure_tracing(exporter, flush_interval_seconds=60)
+    yield exporter
+    tracing.shutdown_tracing()
+
+
+def _traced_request(recorder: FlightRecorder, body: Any) -> None:
+    def handle() -> None:
+        trace = recorder.start("6f1c2d3e-0000-4000-8000-00000000abcd", 9, 3)
+        body()
+        recorder.finish(trace, 200)
+
+    contextvars.Context().run(handle)
+
+
+def test_exported_spans_nest_and_carry_request_ids(exporter: _ListExporter) -> None:
+    def body() -> None:
+        with span("webhook"):
+            with span("capture"):
+                with span("todoist.create_task"):
+                    pass
+            with pytest.raises(RuntimeError), span("feedback"):
+                raise RuntimeError("telegram down")
+
+    _traced_request(FlightRecorder(capacity=4), body)
+    assert tracing._processor is not None and tracing._processor.force_flush()
+
+    spans = {item["name"]: item for batch in exporter.batches for item in batch}
+    assert set(spans) == {"webhook", "capture", "todoist.create_task", "feedback"}
+    assert {item["traceId"] for item in spans.values()} == {"6f1c2d3e00004000800000000000abcd"}
+    assert "parentSpanId" not in spans["webhook"]
+    assert spans["capture"]["parentSpanId"] == spans["webhook"]["spanId"]
+    assert spans["todoist.create_task"]["parentSpanId"] == spans["capture"]["spanId"]
+    assert spans["todoist.create_task"]["kind"] == 3
+    assert spans["feedback"]["status"] == {"code": 2, "message": "telegram down"}
+    attributes = {item["key"]: item["value"] for item in spans["capture"]["attributes"]}
+    assert attributes["request_id"] == {"stringValue": "6f1c2d3e-0000-4000-8000-00000000abcd"}
+    assert attributes["update_id"] == {"intValue": "9"}
+    webhook = spans["webhook"]
+    assert int(webhook["startTimeUnixNano"]) <= int(spans["capture"]["startTimeUnixNano"])
+    assert int(webhook["endTimeUnixNano"]) >= int(spans["feedback"]["endTimeUnixNano"])
+
+
+def test_upstream_clients_emit_spans(exporter: _ListExporter) -> None:
+    client = httpx.Client(transport=httpx.MockTransport(lambda _: httpx.Response(200, json={"result": {}})))
+
+    _traced_request(FlightRecorder(capacity=4), lambda: send_telegram_message(5, "hi", "token", client=client))
+    assert tracing._processor is not None and tracing._processor.force_flush()
+
+    assert [item["name"] for batch in exporter.batches for item in batch] == ["telegram.send_message"]
+
+
+def test_batch_processor_bounds_the_queue_and_batches_exports() -> None:
+    exporter = _ListExporter()
+    processor = BatchSpanProcessor(exporter, max_queue_size=5, max_batch_size=2, flush_interval_seconds=60)
+    trace = tracing.Trace("req", 1, None)
+    processor._closed = True  # keep the worker from draining while the queue fills
+    processor._wake.set()
+    processor._thread.join()
+    for index in range(7):
+        processor.on_end((trace, f"span-{index}", index + 1, None, 0.0, 0.0, None, None))
+
+    assert processor.stats() == {"queued": 5, "exported": 0, "dropped": 2, "failed": 0}
+    processor._drain()
+    assert [len(batch) for batch in exporter.batches] == [2, 2, 1]
+    assert processor.stats()["exported"] == 5
+
+
+def test_file_and_stdout_exporters_write_otlp_json(tmp_path: Path) -> None:
+    spans = [{"traceId": "a" * 32, "spanId": "b" * 16, "name": "webhook"}]
+    path = tmp_path / "spans.jsonl"
+    OtlpFileExporter(path).export(spans)
+    OtlpFileExporter(path).export(spans)
+    stream = io.StringIO()
+    StdoutExporter(stream).export(spans)
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2
+    request = json.loads(lines[0])
+    [resource] = request["resourceSpans"]
+    assert resource["resource"]["attributes"][0]["value"] == {"stringValue": "gatchan"}
+    assert resource["scopeSpans"][0]["spans"] == spans
+    assert json.loads(stream.getvalue()) == spans[0]
+
+
+def test_debug_traces_show_webhook_stages(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ADMIN_TOKEN", "admin-secret")
+    client.post(
+        "/webhook",
+        json={"update_id": 81, "message": {"message_id": 1, "chat": {"id": 44, "type": "private"}, "text": "hi"}},
+        headers={"X-Telegram-Bot-Api-Secret-Token": "test-secret"},
+    )
+
+    response = client.get("/debug/traces?chat_id=44", headers=ADMIN)
+
+    [trace] = response.json()["data"]
+    assert trace["update_id"] == 81
+    assert trace["status"] == 200
+    names = [item["name"] for item in trace["spans"]]
+    assert names[0] == "dedupe"
+    assert names[-1] == "webhook"
+    assert {"parent", "cleanup", "capture", "feedback", "process"} <= set(names)
+    assert client.get("/debug/traces?order=oldest", headers=ADMIN).status_code == 400
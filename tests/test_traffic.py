@@ -0,0 +1,107 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import app
+from app.traffic import REDACTED, TrafficRecorder, read_recording, redact, replay_recording
+
+
+def _update(update_id: int, text: str = "hello") -> dict:
+    return {
+        "update_id": update_id,
+        "message": {"message_id": update_id, "chat": {"id": 7, "type": "private"}, "text": text},
+    }
+
+
+def test_redact_masks_secret_keys_bot_urls_and_literals() -> None:
+    payload = {
+        "api_token": "abc",
+        "nested": [{"url": "https://api.telegram.org/file/bot123:AA-bb_cc/photos/1.jpg"}],
+        "text": "my key is s3cr3t",
+    }
+
+    cleaned = redact(payload, ["s3cr3t"])
+
+    assert cleaned == {
+        "api_token": REDACTED,
+        "nested": [{"url": f"https://api.telegram.org/file/bot{REDACTED}/photos/1.jpg"}],
+        "text": f"my key is {REDACTED}",
+    }
+    assert redact({"message": {"text": "buy milk", "caption": "hi"}}, text_chars=3) == {
+        "message": {"text": "buyxxxxx", "caption": "hi"}
+    }
+
+
+def test_recorder_samples_and_rotates(tmp_path: Path) -> None:
+    rolls = iter([0.05, 0.5, 0.05, 0.05, 0.05])
+    path = tmp_path / "traffic.jsonl"
+    recorder = TrafficRecorder(path, sample_rate=0.1, max_bytes=300, backups=1, rng=lambda: next(rolls))
+
+    kept = 0
+    for update_id in range(5):
+        if recorder.sampled():
+            recorder.record(_update(update_id), status=200, duration_ms=1.5, timestamp=1000.0 + update_id)
+            kept += 1
+    assert recorder.close()
+
+    assert kept == 4
+    assert path.stat().st_size <= 300
+    assert (tmp_path / "traffic.jsonl.1").exists()
+    assert not (tmp_path / "traffic.jsonl.2").exists()
+    entries = read_recording([path, tmp_path / "traffic.jsonl.1"])
+    assert [entry["ts"] for entry in entries] == sorted(entry["ts"] for entry in entries)
+    assert entries[-1]["update"]["update_id"] == 4
+
+
+def test_webhook_records_sanitized_payload(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    path = tmp_path / "traffic.jsonl"
+    monkeypatch.setenv("TRAFFIC_RECORD_PATH", str(path))
+    payload = _update(501, text="token test-todoist-token leaked")
+
+    response = client.post("/webhook", json=payload, headers={"X-Telegram-Bot-Api-Secret-Token": "test-secret"})
+    assert main._recorder is not None and main._recorder.flush()
+
+    assert response.status_code == 200
+    [entry] = read_recording([path])
+    assert entry["status"] == 200
+    assert entry["duration_ms"] >= 0
+    assert entry["request_id"] == response.json()["meta"]["request_id"]
+    assert entry["update"]["message"]["text"] == "x" * len(payload["message"]["text"])
+    assert entry["update"]["message"]["chat"] == {"id": 7, "type": "private"}
+    assert "test-secret" not in path.read_text(encoding="utf-8")
+
+
+def test_recorder_drops_entries_while_the_queue_is_full(tmp_path: Path) -> None:
+    recorder = TrafficRecorder(tmp_path / "traffic.jsonl", max_queue_size=0)
+
+    recorder.record(_update(1), status=200, duration_ms=1.0)
+    assert recorder.close()
+
+    assert recorder.stats() == {"queued": 0, "recorded": 0, "dropped": 1, "failed": 0}
+    assert not (tmp_path / "traffic.jsonl").exists()
+
+
+def test_replay_recording_pushes_updates_into_app(client: TestClient, tmp_path: Path) -> None:
+    path = tmp_path / "traffic.jsonl"
+    lines = [
+        {"ts": 1000.0, "status": 200, "duration_ms": 4.0, "update": _update(601, "one")},
+        {"ts": 1000.02, "status": 200, "duration_ms": 6.0, "update": _update(602, "two")},
+        {"ts": 1000.02, "status": 200, "duration_ms": 5.0, "update": _update(601, "one")},
+    ]
+    path.write_text("".join(json.dumps(line) + "\n" for line in lines) + "not json\n", encoding="utf-8")
+
+    report = asyncio.run(replay_recording(app, read_recording([path]), secret="test-secret", speed=2.0))
+
+    summary = report.summary()
+    assert summary["requests"] == 3
+    assert summary["statuses"] == {"200": 3}
+    assert summary["recorded_latency_ms"]["max"] == 6.0
+    assert report.elapsed_seconds >= 0.01
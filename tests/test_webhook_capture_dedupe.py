@@ -0,0 +1,166 @@
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.config import get_settings
+
+
+def _post_link(client: TestClient, update_id: int, *urls: str) -> Any:
+    text = " ".join(urls)
+    entities = []
+    offset = 0
+    for url in urls:
+        entities.append({"type": "url", "offset": offset, "length": len(url)})
+        offset += len(url) + 1
+    return client.post(
+        "/webhook",
+        headers={"X-Telegram-Bot-Api-Secret-Token": "test-secret"},
+        json={
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "chat": {"id": update_id, "type": "private"},
+                "text": text,
+                "entities": entities,
+            },
+        },
+    )
+
+
+def test_webhook_skips_repeated_link_capture(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = {"create": 0}
+    messages: list[str] = []
+
+    def fake_create(*_: Any, **__: Any) -> dict[str, Any]:
+        calls["create"] += 1
+        return {"id": "child-1", "url": "https://todoist.com/showTask?id=child-1"}
+
+    def fake_send(chat_id: int, text: str, api_token: str, *, client: Any = None) -> None:
+        messages.append(text)
+
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+    monkeypatch.setattr("app.main.send_telegram_message", fake_send)
+    monkeypatch.setenv("CAPTURE_DEDUPE_MODE", "skip")
+    get_settings.cache_clear()
+
+    first = _post_link(client, 50, "https://example.com/post?utm_source=a")
+    second = _post_link(client, 51, "https://WWW.example.com/post/?utm_source=b")
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert calls["create"] == 1
+    assert second.json()["data"]["duplicate_of"] == "child-1"
+    main._feedback.flush(timeout=5)
+    assert messages[-1] == "已存在 Todoist 任务：https://todoist.com/showTask?id=child-1"
+
+
+def test_webhook_attaches_repeated_link_as_comment(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: dict[str, Any] = {"create": 0, "comments": []}
+
+    def fake_create(*_: Any, **__: Any) -> dict[str, Any]:
+        calls["create"] += 1
+        return {"id": "child-1"}
+
+    def fake_comment(task_id: str, content: str, api_token: str, *, client: Any = None) -> dict[str, Any]:
+        calls["comments"].append((task_id, content))
+        return {"id": "comment-1"}
+
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+    monkeypatch.setattr("app.main.add_task_comment", fake_comment)
+    monkeypatch.setenv("CAPTURE_DEDUPE_MODE", "attach")
+    get_settings.cache_clear()
+
+    _post_link(client, 60, "https://example.com/post")
+    second = _post_link(client, 61, "https://example.com/post")
+
+    assert second.status_code == 200
+    assert calls["create"] == 1
+    assert calls["comments"][0][0] == "child-1"
+    assert "update_id=61" in calls["comments"][0][1]
+
+
+def test_webhook_captures_repeated_plain_text_unless_content_matching_is_on(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls = {"create": 0}
+
+    def fake_create(*_: Any, **__: Any) -> dict[str, Any]:
+        calls["create"] += 1
+        return {"id": f"child-{calls['create']}"}
+
+    def post_note(update_id: int) -> None:
+        client.post(
+            "/webhook",
+            headers={"X-Telegram-Bot-Api-Secret-Token": "test-secret"},
+            json={
+                "update_id": update_id,
+                "message": {"message_id": update_id, "chat": {"id": 5, "type": "private"}, "text": "call mom"},
+            },
+        )
+
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+    post_note(80)
+    post_note(81)
+    assert calls["create"] == 2
+
+    monkeypatch.setenv("CAPTURE_DEDUPE_MODE", "skip")
+    monkeypatch.setenv("CAPTURE_DEDUPE_CONTENT", "true")
+    get_settings.cache_clear()
+    post_note(82)
+    post_note(83)
+    assert calls["create"] == 3
+
+
+def test_webhook_captures_a_message_that_adds_a_new_link(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    created: list[str] = []
+
+    def fake_create(content: str, *_: Any, **__: Any) -> dict[str, Any]:
+        created.append(content)
+        return {"id": f"child-{len(created)}"}
+
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+    monkeypatch.setenv("CAPTURE_DEDUPE_MODE", "skip")
+    get_settings.cache_clear()
+
+    _post_link(client, 90, "https://example.com/old")
+    both = _post_link(client, 91, "https://example.com/new", "https://example.com/old")
+    repeat = _post_link(client, 92, "https://example.com/old")
+
+    assert created == ["https://example.com/old", "https://example.com/new https://example.com/old"]
+    assert both.json()["data"].get("duplicate_of") is None
+    # The link now points at the newest task that carries it.
+    assert repeat.json()["data"]["duplicate_of"] == "child-2"
+
+
+def test_webhook_capture_dedupe_is_off_by_default(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = {"create": 0}
+
+    def fake_create(*_: Any, **__: Any) -> dict[str, Any]:
+        calls["create"] += 1
+        return {"id": f"child-{calls['create']}"}
+
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+
+    _post_link(client, 95, "https://example.com/post")
+    _post_link(client, 96, "https://example.com/post")
+
+    assert calls["create"] == 2
+
+
+def test_webhook_capture_dedupe_can_be_disabled(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = {"create": 0}
+
+    def fake_create(*_: Any, **__: Any) -> dict[str, Any]:
+        calls["create"] += 1
+        return {"id": f"child-{calls['create']}"}
+
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+    monkeypatch.setenv("CAPTURE_DEDUPE_MODE", "off")
+    get_settings.cache_clear()
+
+    _post_link(client, 70, "https://example.com/post")
+    _post_link(client, 71, "https://example.com/post")
+
+    assert calls["create"] == 2
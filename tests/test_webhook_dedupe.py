@@ -1,8 +1,13 @@
+import threading
 from typing import Any
 
 import pytest
 from fastapi.testclient import TestClient
 
+from app import main
+from app.admission import AdmissionController
+from app.config import get_settings
+
 
 def test_webhook_dedupes_same_update_id(
     client: TestClient,
@@ -22,9 +27,7 @@ def test_webhook_dedupes_same_update_id(
         return {"id": "child-1"}
 
     monkeypatch.setattr("app.main.create_subtask", fake_create)
-    from collections import OrderedDict
-
-    monkeypatch.setattr("app.main._dedupe_store", OrderedDict())
+    monkeypatch.setattr("app.main._dedupe_store", None)
     monkeypatch.setattr("app.main.time", type("T", (), {"time": staticmethod(lambda: 1000.0)}))
 
     payload = {
@@ -51,3 +54,59 @@ def test_webhook_dedupes_same_update_id(
     assert second.status_code == 200
     assert calls["create"] == 1
     assert second.json()["data"]["duplicate"] is True
+
+
+def test_webhook_sheds_before_marking_update_seen(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    creates: list[str] = []
+
+    def fake_create(content: str, *_: object, **__: object) -> dict:
+        creates.append(content)
+        return {"id": "child-1"}
+
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+    admission = AdmissionController(1, 10, 5.0)
+    held = admission.admit()
+    monkeypatch.setattr("app.main._admission", admission)
+    payload = {
+        "update_id": 501,
+        "message": {"message_id": 1, "chat": {"id": 1, "type": "private"}, "text": "later"},
+    }
+    headers = {"X-Telegram-Bot-Api-Secret-Token": "test-secret"}
+
+    shed = client.post("/webhook", headers=headers, json=payload)
+    admission.release(held)
+    retried = client.post("/webhook", headers=headers, json=payload)
+    metrics = client.get("/metrics").json()["data"]
+
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "5"
+    assert retried.status_code == 200
+    assert "duplicate" not in retried.json()["data"]
+    assert creates == ["later"]
+    assert metrics["admission"]["shed"]["in_flight"] == 1
+    assert metrics["admission"]["in_flight"] == 0
+
+
+def test_webhook_sheds_when_scheduler_backlog_reaches_queue_depth(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("ADMISSION_MAX_QUEUE_DEPTH", "2")
+    get_settings.cache_clear()
+    scheduler = main._get_scheduler(get_settings())
+    release = threading.Event()
+    blocked = [scheduler.submit("busy-chat", index, lambda: release.wait(5)) for index in range(3)]
+    payload = {
+        "update_id": 502,
+        "message": {"message_id": 1, "chat": {"id": 2, "type": "private"}, "text": "later"},
+    }
+
+    try:
+        shed = client.post("/webhook", headers={"X-Telegram-Bot-Api-Secret-Token": "test-secret"}, json=payload)
+    finally:
+        release.set()
+        for future in blocked:
+            future.result(timeout=5)
+
+    assert scheduler.queue_depth() == 0
+    assert shed.status_code == 503
+    assert main._admission.stats()["shed"]["queue_depth"] == 1
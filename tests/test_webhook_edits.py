@@ -0,0 +1,107 @@
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+HEADERS = {"X-Telegram-Bot-Api-Secret-Token": "test-secret"}
+
+
+def _message(message_id: int, text: str) -> dict[str, Any]:
+    return {"message_id": message_id, "chat": {"id": 555, "type": "private"}, "text": text}
+
+
+def test_edit_updates_the_captured_task(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    created: list[str] = []
+    updated: list[tuple[str, str]] = []
+    replies: list[int] = []
+
+    def fake_create(content: str, parent_id: str, api_token: str, *, description: Any = None, client: Any = None):
+        created.append(content)
+        return {"id": f"task-{len(created)}"}
+
+    def fake_update(task_id: str, content: str, api_token: str, *, client: Any = None) -> dict[str, Any]:
+        updated.append((task_id, content))
+        return {"id": task_id}
+
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+    monkeypatch.setattr("app.main.update_task_content", fake_update)
+    monkeypatch.setattr(
+        "app.main.FeedbackAggregator.created", lambda self, chat_id, *_, **__: replies.append(chat_id)
+    )
+    monkeypatch.setattr("app.main.FeedbackAggregator.notify", lambda self, chat_id, *_, **__: replies.append(chat_id))
+
+    client.post("/webhook", json={"update_id": 1, "message": _message(40, "buy milk")}, headers=HEADERS)
+    edit = client.post(
+        "/webhook",
+        json={"update_id": 2, "edited_message": _message(40, "buy oat milk")},
+        headers=HEADERS,
+    )
+    # An edit of a message that was never captured is captured as new.
+    client.post("/webhook", json={"update_id": 3, "edited_message": _message(41, "call mom")}, headers=HEADERS)
+
+    assert edit.status_code == 200
+    assert edit.json()["data"]["normalized_text"] == "buy oat milk"
+    assert created == ["buy milk", "call mom"]
+    assert updated == [("task-1", "buy oat milk")]
+    assert replies == [555, 555]  # one per created task, none for the edit
+    assert client.get("/metrics").json()["data"]["edits"]["hits"] == 1
+
+
+def test_edit_tracking_can_be_disabled(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    created: list[str] = []
+
+    def fake_create(content: str, parent_id: str, api_token: str, *, description: Any = None, client: Any = None):
+        created.append(content)
+        return {"id": f"task-{len(created)}"}
+
+    monkeypatch.setenv("EDIT_INDEX_MAX_ITEMS", "0")
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+    monkeypatch.setattr("app.main.update_task_content", lambda *_, **__: pytest.fail("edits are off"))
+    from app.config import get_settings
+
+    get_settings.cache_clear()
+    client.post("/webhook", json={"update_id": 1, "message": _message(40, "buy milk")}, headers=HEADERS)
+    client.post("/webhook", json={"update_id": 2, "edited_message": _message(40, "buy oat milk")}, headers=HEADERS)
+
+    assert created == ["buy milk", "buy oat milk"]
+
+
+def test_edit_of_a_file_capture_keeps_its_title(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    created: list[str] = []
+    descriptions: list[str] = []
+
+    def fake_create(content: str, parent_id: str, api_token: str, *, description: Any = None, client: Any = None):
+        created.append(content)
+        descriptions.append(description)
+        return {"id": "task-1"}
+
+    def fake_get(task_id: str, api_token: str, *, client: Any = None) -> dict[str, Any]:
+        return {"id": task_id, "description": descriptions[-1]}
+
+    def fake_describe(task_id: str, description: str, api_token: str, *, client: Any = None) -> dict[str, Any]:
+        descriptions.append(description)
+        return {"id": task_id}
+
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+    monkeypatch.setattr("app.main.get_task", fake_get)
+    monkeypatch.setattr("app.main.update_task_description", fake_describe)
+    monkeypatch.setattr("app.main.update_task_content", lambda *_, **__: pytest.fail("title must be kept"))
+    monkeypatch.setattr("app.main.get_telegram_file_url", lambda file_id, token: f"https://files/{file_id}")
+    document = {
+        "message_id": 42,
+        "chat": {"id": 555, "type": "private"},
+        "document": {"file_id": "doc-1", "file_unique_id": "u-1", "file_name": "report.pdf"},
+    }
+
+    client.post("/webhook", json={"update_id": 1, "message": document}, headers=HEADERS)
+    for update_id, caption in ((2, "first draft"), (3, "final draft")):
+        edit = client.post(
+            "/webhook",
+            json={"update_id": update_id, "edited_message": {**document, "caption": caption}},
+            headers=HEADERS,
+        )
+        assert edit.status_code == 200
+
+    assert created == ["File from Telegram: report.pdf"]
+    assert descriptions[-1] == f"{descriptions[0]}\ncaption=final draft"
+    assert "file_url=https://files/doc-1" in descriptions[-1]
@@ -3,6 +3,8 @@ from typing import Any
 import pytest
 from fastapi.testclient import TestClient
 
+from app import main
+from app.todoist import TodoistServiceError
 from app.telegram_normalizer import (
     DOCUMENT_ONLY_PROMPT,
     FORWARDED_EMPTY_PROMPT,
@@ -62,6 +64,7 @@ def test_webhook_creates_todoist_subtask(client: TestClient, monkeypatch: pytest
     assert calls["create"]["content"] == "hello"
     assert "update_id=10" in calls["create"]["description"]
     assert "message_id=12" in calls["create"]["description"]
+    main._feedback.flush(timeout=5)
     assert len(messages) == 1
     assert "https://todoist.com/showTask?id=child-1" in messages[0]
     assert calls["create"]["parent_id"] == "parent-123"
@@ -112,6 +115,7 @@ def test_webhook_creates_subtask_for_unsupported_message(
     assert "unsupported" in captured["content"].lower()
     assert prompt in captured["content"]
     assert "update_id=11" in captured["description"]
+    main._feedback.flush(timeout=5)
     assert len(messages) == 1
 
 
@@ -141,6 +145,7 @@ def test_webhook_sends_failure_message(client: TestClient, monkeypatch: pytest.M
     )
 
     assert response.status_code == 500
+    main._feedback.flush(timeout=5)
     assert len(messages) == 1
     assert messages[0].startswith("创建失败")
 
@@ -401,3 +406,116 @@ def test_webhook_document_uses_default_prompt_without_filename(
 
     assert response.status_code == 200
     assert captured["content"] == DOCUMENT_ONLY_PROMPT
+
+
+def test_webhook_caches_parent_task_until_todoist_failure(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls = {"ensure": 0, "create": 0}
+
+    def fake_ensure(task_name: str, api_token: str, *, client: Any = None) -> str:
+        calls["ensure"] += 1
+        return "parent-123"
+
+    def fake_create(*_: Any, **__: Any) -> dict[str, Any]:
+        calls["create"] += 1
+        if calls["create"] == 2:
+            raise TodoistServiceError("Todoist request failed")
+        return {"id": f"child-{calls['create']}"}
+
+    monkeypatch.setattr("app.main.ensure_todo_later_task", fake_ensure)
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+
+    statuses = []
+    for update_id in (40, 41, 42):
+        response = client.post(
+            "/webhook",
+            headers={"X-Telegram-Bot-Api-Secret-Token": "test-secret"},
+            json={
+                "update_id": update_id,
+                "message": {"message_id": update_id, "chat": {"id": 555, "type": "private"}, "text": f"hi {update_id}"},
+            },
+        )
+        statuses.append(response.status_code)
+
+    assert statuses == [200, 502, 200]
+    assert calls["ensure"] == 2
+
+
+def test_webhook_uploads_attachments_when_enabled(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    captured: dict[str, Any] = {"comments": []}
+
+    class FakeStream:
+        def __init__(self, file_url: str) -> None:
+            self.file_name = file_url.rsplit("/", 1)[-1]
+            self.bytes_read = 0
+
+        def __enter__(self) -> "FakeStream":
+            return self
+
+        def __exit__(self, *exc_info: object) -> None:
+            return None
+
+    def fake_upload(file: Any, file_name: str, api_token: str, *, content_type: Any = None, client: Any = None):
+        captured["upload"] = (file_name, content_type)
+        return {"file_name": file_name, "file_url": f"https://files.todoist.com/{file_name}"}
+
+    def fake_create(content: str, parent_id: str, api_token: str, *, description: Any = None, client: Any = None):
+        captured["description"] = description
+        return {"id": "child-doc"}
+
+    def fake_comment(task_id: str, content: str, api_token: str, *, attachment: Any = None, client: Any = None):
+        captured["comments"].append((task_id, content, attachment["file_url"]))
+        return {"id": "c1"}
+
+    monkeypatch.setenv("TODOIST_UPLOAD_ATTACHMENTS", "true")
+    main.get_settings.cache_clear()
+    monkeypatch.setattr("app.main.get_telegram_file_url", lambda *_, **__: "https://api.telegram.org/file/botT/a.pdf")
+    monkeypatch.setattr("app.main.TelegramFileStream", FakeStream)
+    monkeypatch.setattr("app.main.upload_file", fake_upload)
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+    monkeypatch.setattr("app.main.add_task_comment", fake_comment)
+
+    response = client.post(
+        "/webhook",
+        headers={"X-Telegram-Bot-Api-Secret-Token": "test-secret"},
+        json={
+            "update_id": 31,
+            "message": {
+                "message_id": 301,
+                "chat": {"id": 555, "type": "private"},
+                "caption": "pdf note",
+                "document": {"file_id": "doc-1", "file_name": "note.pdf", "mime_type": "application/pdf"},
+            },
+        },
+    )
+
+    assert response.status_code == 200
+    assert captured["upload"] == ("note.pdf", "application/pdf")
+    # The bot-token URL never reaches Todoist once the file itself is attached.
+    assert "file_url=" not in captured["description"]
+    assert captured["comments"] == [("child-doc", "note.pdf", "https://files.todoist.com/note.pdf")]
+
+
+def test_webhook_returns_502_when_todoist_fails_inside_the_bulkhead(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def fake_create(*_: Any, **__: Any) -> dict[str, Any]:
+        raise TodoistServiceError("Todoist request failed")
+
+    monkeypatch.setattr("app.main.ensure_todo_later_task", lambda *_, **__: "parent-123")
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+
+    response = client.post(
+        "/webhook",
+        headers={"X-Telegram-Bot-Api-Secret-Token": "test-secret"},
+        json={"update_id": 50, "message": {"message_id": 50, "chat": {"id": 555, "type": "private"}, "text": "hi"}},
+    )
+
+    assert response.status_code == 502
+    assert main._bulkhead is not None and main._bulkhead.stats()["text"]["active"] == 0
@@ -3,6 +3,8 @@ from typing import Any
 import pytest
 from fastapi.testclient import TestClient
 
+from app import main
+from app.config import get_settings
 from app.transcribe import TranscriptionError
 
 
@@ -111,6 +113,7 @@ def test_webhook_transcription_failure_sends_feedback(
 
     assert response.status_code == 200
     assert calls["create"] == 0
+    main._feedback.flush(timeout=5)
     assert messages
 
 
@@ -148,3 +151,38 @@ def test_webhook_voice_with_caption_skips_transcription(
     payload = response.json()
     assert payload["data"]["normalized_text"] == "use caption"
     assert calls["transcribe"] == 0
+
+
+def test_webhook_returns_busy_when_transcription_lane_full(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls = {"create": 0}
+
+    def fake_create(*_: Any, **__: Any) -> dict[str, Any]:
+        calls["create"] += 1
+        return {"id": "child-voice"}
+
+    monkeypatch.setattr("app.main.create_subtask", fake_create)
+    monkeypatch.setenv("BULKHEAD_TRANSCRIPTION_LIMIT", "0")
+    monkeypatch.setenv("BULKHEAD_TRANSCRIPTION_MAX_WAITING", "0")
+    get_settings.cache_clear()
+
+    payload = {
+        "update_id": 34,
+        "message": {
+            "message_id": 203,
+            "chat": {"id": 555, "type": "private"},
+            "voice": {"file_id": "voice-4", "mime_type": "audio/ogg", "duration": 3},
+        },
+    }
+    response = client.post(
+        "/webhook",
+        headers={"X-Telegram-Bot-Api-Secret-Token": "test-secret"},
+        json=payload,
+    )
+
+    assert response.status_code == 503
+    assert response.json()["error"] == "Service busy"
+    assert calls["create"] == 0
+    assert 34 not in main._dedupe_store